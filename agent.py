@@ -3,13 +3,23 @@
 1. get_agent_runnable()
 '''
 
+import asyncio
+import threading
+import time
+from collections import Counter
+from uuid import uuid4
+from concurrent.futures import FIRST_COMPLETED, wait
 from retriever import build_pinecone_retriever, fetch_facts_for_question 
+from context_pack import count_tokens, pack_tool_results
+from memory import build_checkpointer, compact_messages, with_summary
+import config as cfg
 from config import llm_gen
-from langchain_core.messages import SystemMessage, ToolMessage, BaseMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+from langchain_core.messages import SystemMessage, ToolMessage, BaseMessage, HumanMessage, AIMessage
 from langgraph.graph import StateGraph, add_messages, END
 from typing import TypedDict, Sequence
-from typing_extensions import Annotated
-from langgraph.checkpoint.memory import MemorySaver
+from typing_extensions import Annotated, NotRequired
 from langchain.tools import tool
 #####################################################################################
 # system_prompt = """
@@ -33,6 +43,9 @@ from langchain.tools import tool
 
 system_prompt = '''For each question: (1) call build_pinecone_retriever with the user query; (2) call fetch_facts_for_question with the same query. Do not produce the final answer until both tool results are available in this conversation. If either tool returns empty or errors, say so and ask for a refined query.'''
 
+# Prefetch mode: both tools already ran on the raw query before the first LLM call
+prefetch_system_prompt = '''The results of build_pinecone_retriever and fetch_facts_for_question for the latest user question are already in this conversation. Answer strictly from those tool results. Only call a tool again if the results are not enough, using a refined query. If both tools returned empty or errors, say so and ask for a refined query.'''
+
 
 #####################################################################################
 # Tools setup
@@ -53,14 +66,57 @@ model = llm_gen.bind_tools(tools)
 #####################################################################################
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]
+    summary: NotRequired[str]        # running summary of turns dropped by HISTORY_POLICY=summary
+    turn_start: NotRequired[int]     # index in messages of the current turn's HumanMessage (set by start_turn)
 
 tools_dict = {our_tool.name: our_tool for our_tool in tools}
+PREFETCH_TOOLS = [build_pinecone_retriever.name, fetch_facts_for_question.name]
 
 # --- Agent Nodes ---
+def start_turn(state: AgentState) -> AgentState:
+    '''Entry node: trim the thread to cfg.HISTORY_POLICY (bounded prompt + checkpoint size)
+    and record where this turn starts, so callers read only this turn's messages.'''
+    messages = state['messages']
+    update = compact_messages(messages, state.get('summary', ""))
+    # the new HumanMessage is at the end; walking back from there is O(1) for a normal /ask
+    last_human = next((i for i in range(len(messages) - 1, -1, -1) if isinstance(messages[i], HumanMessage)), 0)
+    update['turn_start'] = max(0, last_human - len(update.get('messages', [])))   # removals are all before it
+    return update
+
+
+def turn_messages(state) -> list:
+    '''Messages of the current turn (HumanMessage first) without scanning the thread history.'''
+    return list(state['messages'][state.get('turn_start', 0):])
+
+
+async def astart_turn(state: AgentState) -> AgentState:
+    '''start_turn for the async graph; only a summary fold (an LLM call) is moved off the event loop.'''
+    if cfg.HISTORY_POLICY == "summary":
+        return await asyncio.to_thread(start_turn, state)
+    return start_turn(state)
+
+
+def _llm_input(state: AgentState, prompt: str) -> list:
+    return [SystemMessage(content=with_summary(prompt, state.get('summary')))] + list(state['messages'])
+
+
 def call_llm_with_tools(state:AgentState) -> AgentState:
-    messages = list(state['messages'])
-    messages = [SystemMessage(content=system_prompt)] + messages
-    messages = model.invoke(messages)
+    messages = model.invoke(_llm_input(state, system_prompt))
+    return {'messages': [messages]}
+
+
+def call_llm_after_prefetch(state:AgentState) -> AgentState:
+    messages = model.invoke(_llm_input(state, prefetch_system_prompt))
+    return {'messages': [messages]}
+
+
+async def acall_llm_with_tools(state:AgentState) -> AgentState:
+    messages = await model.ainvoke(_llm_input(state, system_prompt))
+    return {'messages': [messages]}
+
+
+async def acall_llm_after_prefetch(state:AgentState) -> AgentState:
+    messages = await model.ainvoke(_llm_input(state, prefetch_system_prompt))
     return {'messages': [messages]}
 
 
@@ -70,47 +126,219 @@ def router(state: AgentState):
     return hasattr(result, 'tool_calls') and len(result.tool_calls) > 0
 
 
-def take_action(state: AgentState) -> AgentState:
-    '''Execute tool calls from LLM'sresponse'''
-
-    tool_calls = state['messages'][-1].tool_calls
-    results = []
-
-    for t in tool_calls:
-        print(f"Calling Tool: {t['name']} with query: {t['args'].get('query', 'No query provided')}")
-
-
-        if not t['name'] in tools_dict:          # check if tool exists
-            print(f"\nTool: {t['name']} does not exist.")
-            result = "Incorrect Tool Name. Please retry and select a tool from the list of available tools."
-        else:
-            result = tools_dict[t['name']].invoke(t['args'].get('query', ""))
-            # args = t.get('args', {})
-            # result = tools_dict[t['name']].invoke(args)
-            print(f"Result length: {len(str(result))}")
-
-        # append ToolMessage
-        results.append(
-            ToolMessage(
-                tool_call_id=t['id'],
-                name=t['name'],
-                content=str(result)
-            )
+# Shared pool for tool calls (copies contextvars so LangChain callbacks/tracing still work)
+_tool_executor = ContextThreadPoolExecutor(max_workers=cfg.TOOL_MAX_CONCURRENCY,
+                                           thread_name_prefix="agent-tool")
+# A timed-out tool keeps its thread until the backend call returns (the clients have their own
+# timeouts, see resource_pool.py). Those futures are tracked as abandoned, and once running +
+# queued calls reach the pool's capacity new calls are shed instead of queueing behind them.
+_TOOL_CAPACITY = cfg.TOOL_MAX_CONCURRENCY + cfg.TOOL_MAX_QUEUED
+_tool_lock = threading.Lock()
+_tool_counts = Counter()          # in_flight, shed, timed_out
+_abandoned = set()                # timed-out futures still holding a thread
+
+
+def _tool_done(fut) -> None:
+    with _tool_lock:
+        _tool_counts["in_flight"] -= 1
+        _abandoned.discard(fut)
+
+
+def _submit_tool(t, started: dict, i: int):
+    """Submit one call, or return None when the pool is saturated."""
+    with _tool_lock:
+        if _tool_counts["in_flight"] >= _TOOL_CAPACITY:
+            _tool_counts["shed"] += 1
+            return None
+        _tool_counts["in_flight"] += 1
+    fut = _tool_executor.submit(_invoke_tool, t, started, i)
+    fut.add_done_callback(_tool_done)
+    return fut
+
+
+def _abandon(fut) -> None:
+    if fut.cancel():                  # still queued: never runs, frees its slot
+        return
+    with _tool_lock:
+        _tool_counts["timed_out"] += 1
+        if not fut.done():
+            _abandoned.add(fut)
+
+
+def tool_pool_stats() -> dict:
+    with _tool_lock:
+        return {"capacity": _TOOL_CAPACITY, "in_flight": _tool_counts["in_flight"],
+                "abandoned": len(_abandoned), "timed_out": _tool_counts["timed_out"],
+                "shed": _tool_counts["shed"]}
+
+
+def _invoke_tool(t, started: dict, i: int):
+    started[i] = time.monotonic()
+    if not t['name'] in tools_dict:          # check if tool exists
+        print(f"\nTool: {t['name']} does not exist.")
+        return "Incorrect Tool Name. Please retry and select a tool from the list of available tools."
+    try:
+        result = tools_dict[t['name']].invoke(t['args'].get('query', ""))
+    except Exception as e:                   # one failing backend must not fail the whole turn
+        print(f"Tool {t['name']} failed: {e}")
+        return f"Tool error: {e}"
+    print(f"Result length: {len(str(result))}")
+    return result
+
+
+class _ToolRun:
+    """Bookkeeping of one round of tool calls; run_tool_calls / arun_tool_calls only differ in how they wait.
+    Each tool gets its own timeout (cfg.TOOL_TIMEOUTS), counted from when it starts running."""
+
+    def __init__(self, tool_calls):
+        self.tool_calls = tool_calls
+        self.started, self.results, self.pending = {}, {}, {}
+        self.submitted = time.monotonic()
+        self.timeouts = {i: cfg.TOOL_TIMEOUTS.get(t['name'], cfg.TOOL_TIMEOUT_S) for i, t in enumerate(tool_calls)}
+        for i, t in enumerate(tool_calls):
+            print(f"Calling Tool: {t['name']} with query: {t['args'].get('query', 'No query provided')}")
+            fut = _submit_tool(t, self.started, i)
+            if fut is None:
+                print(f"Tool {t['name']} shed: {_TOOL_CAPACITY} tool calls already running or queued")
+                self.results[i] = f"Tool error: {t['name']} not run, the tool pool is saturated. Try again shortly."
+                continue
+            self.pending[fut] = i
+
+    def expire(self):
+        """Give up on calls past their deadline; seconds until the next deadline (None when all are done)."""
+        now = time.monotonic()
+        for fut, i in list(self.pending.items()):
+            if now >= self.started.get(i, self.submitted) + self.timeouts[i]:
+                _abandon(fut)                # cancelled if queued, else tracked until its thread returns
+                del self.pending[fut]
+                name = self.tool_calls[i]['name']
+                print(f"Tool {name} timed out after {self.timeouts[i]:g}s")
+                self.results[i] = f"Tool error: {name} timed out after {self.timeouts[i]:g}s"
+        if not self.pending:
+            return None
+        next_deadline = min(self.started.get(i, self.submitted) + self.timeouts[i] for i in self.pending.values())
+        return max(0.0, next_deadline - now)
+
+    def collect(self, done) -> None:
+        for fut in done:
+            self.results[self.pending.pop(fut)] = fut.result()
+
+    def outputs(self) -> list:
+        return [self.results[i] for i in range(len(self.tool_calls))]
+
+
+def run_tool_calls(tool_calls) -> list:
+    """Run tool calls concurrently; results come back in tool_calls order."""
+    run = _ToolRun(tool_calls)
+    while (timeout := run.expire()) is not None:
+        done, _ = wait(run.pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        run.collect(done)
+    return run.outputs()
+
+
+async def arun_tool_calls(tool_calls) -> list:
+    """run_tool_calls for the async graph: the tools still run on the shared tool pool, but the
+    event loop awaits them instead of parking one more thread per request to wait."""
+    run = _ToolRun(tool_calls)
+    while (timeout := run.expire()) is not None:
+        waiting = {asyncio.wrap_future(fut): fut for fut in run.pending}
+        done, _ = await asyncio.wait(waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        run.collect(waiting[d] for d in done)
+    return run.outputs()
+
+
+def _turn_tool_tokens(state: AgentState) -> int:
+    # tokens of tool results already added in this turn (earlier tool rounds)
+    return sum(count_tokens(str(m.content)) for m in turn_messages(state) if isinstance(m, ToolMessage))
+
+
+def _tool_messages(tool_calls, outputs, budget: int = cfg.CONTEXT_TOKEN_BUDGET) -> list:
+    # one ToolMessage per call, same order as the tool calls;
+    # content is packed across ALL calls of the round (dedupe + token budget), raw output kept as artifact
+    if cfg.CONTEXT_PACKING:
+        contents = pack_tool_results(tool_calls, outputs, budget=budget)
+    else:
+        contents = [str(result) for result in outputs]
+    return [
+        ToolMessage(
+            tool_call_id=t['id'],
+            name=t['name'],
+            content=content,
+            artifact=result
         )
+        for t, content, result in zip(tool_calls, contents, outputs)
+    ]
+
+
+def _action_update(state: AgentState, tool_calls, outputs) -> AgentState:
+    # the budget is per user turn: later tool rounds only get what earlier ones left
+    budget = cfg.CONTEXT_TOKEN_BUDGET - _turn_tool_tokens(state) if cfg.CONTEXT_PACKING else 0
+    results = _tool_messages(tool_calls, outputs, budget=max(0, budget))
 
     print("Tools execution complete. Back to the model!")
     # print(type(results), results)   # should be <class 'list'>
     return {'messages': results}
 
 
+def take_action(state: AgentState) -> AgentState:
+    '''Execute tool calls from LLM'sresponse (concurrently, order preserved)'''
+
+    tool_calls = state['messages'][-1].tool_calls
+    return _action_update(state, tool_calls, run_tool_calls(tool_calls))
+
+
+async def atake_action(state: AgentState) -> AgentState:
+    tool_calls = state['messages'][-1].tool_calls
+    return _action_update(state, tool_calls, await arun_tool_calls(tool_calls))
+
+
+def _prefetch_calls(state: AgentState) -> list:
+    query = next((m.content for m in reversed(state['messages']) if isinstance(m, HumanMessage)), "")
+    return [
+        {"name": name, "args": {"query": query}, "id": f"prefetch_{uuid4().hex[:16]}", "type": "tool_call"}
+        for name in PREFETCH_TOOLS
+    ]
+
+
+def _prefetch_update(tool_calls, outputs) -> AgentState:
+    print("Prefetch complete. Calling the model once with both results!")
+    return {'messages': [AIMessage(content="", tool_calls=tool_calls), *_tool_messages(tool_calls, outputs)]}
+
+
+def prefetch_retrieval(state: AgentState) -> AgentState:
+    '''Run both retrievers on the raw user query before the first LLM call.
+    Recorded as an AIMessage with tool_calls + ToolMessages so the model sees normal tool results.'''
+
+    tool_calls = _prefetch_calls(state)
+    return _prefetch_update(tool_calls, run_tool_calls(tool_calls))
+
+
+async def aprefetch_retrieval(state: AgentState) -> AgentState:
+    tool_calls = _prefetch_calls(state)
+    return _prefetch_update(tool_calls, await arun_tool_calls(tool_calls))
+
+
 #####################################################################################
 # --- Compile the Agent Graph ---
 # import to fast api
-def get_agent_runnable():
-    """Compiles and returns the LangGraph agent."""
+def get_agent_runnable(prefetch: bool = cfg.AGENT_PREFETCH):
+    """Compiles and returns the LangGraph agent.
+
+    prefetch=False: llm -> tool calls -> llm (the model decides the tool calls)
+    prefetch=True : retrieval (both tools in parallel) -> llm (-> more tool calls if it asks)
+    Both start with start_turn (history policy + turn_start offset).
+
+    Every node has a sync and an async implementation: invoke() (/ask) runs the sync ones,
+    astream_events() (/ask/stream) the async ones, so a stream awaits the LLM (ainvoke) and
+    its tool calls on the event loop instead of holding an executor thread per node.
+    """
+    def node(func, afunc):
+        return RunnableLambda(func, afunc=afunc, name=func.__name__)
+
     graph = StateGraph(AgentState)
-    graph.add_node('llm_with_tool', call_llm_with_tools)
-    graph.add_node('take_action', take_action)
+    graph.add_node('llm_with_tool', node(call_llm_after_prefetch, acall_llm_after_prefetch) if prefetch
+                   else node(call_llm_with_tools, acall_llm_with_tools))
+    graph.add_node('take_action', node(take_action, atake_action))
 
     graph.add_conditional_edges(
         'llm_with_tool',
@@ -119,9 +347,14 @@ def get_agent_runnable():
     )
 
     graph.add_edge('take_action', 'llm_with_tool')
-    graph.set_entry_point('llm_with_tool')
-
-    memory = MemorySaver() 
+    if prefetch:
+        graph.add_node('prefetch', node(prefetch_retrieval, aprefetch_retrieval))
+        graph.add_edge('prefetch', 'llm_with_tool')
+    graph.add_node('start_turn', node(start_turn, astart_turn))
+    graph.add_edge('start_turn', 'prefetch' if prefetch else 'llm_with_tool')
+    graph.set_entry_point('start_turn')
+
+    memory = build_checkpointer()   # cfg.MEMORY_BACKEND: sqlite (persistent) or in-process, both with eviction
     rag_agent =graph.compile(checkpointer=memory)
 
     return rag_agent
@@ -0,0 +1,93 @@
+"""
+Benchmark: end-to-end /ask latency vs thread length (stub model, real graph + checkpointer)
+
+bench_turn_extraction times start_turn and the turn_start slice in isolation. This one runs
+main.ask() for many turns of ONE thread through the compiled agent graph: checkpoint load,
+start_turn (history policy), the model/tool loop, checkpoint writes and the turn extraction.
+The chat model is replaced by a stub that asks for one tool call per question and then
+answers, and the tool by a function returning a fixed passage, so nothing goes over the
+network and the numbers are the graph + checkpointer + history cost alone.
+
+Latency is reported per block of turns; with HISTORY_POLICY=window it should stay flat as
+the thread grows, with none it grows with the thread (checkpoint size).
+
+    python benchmarks/bench_agent_ask.py --policy window --backend sqlite --turns 500
+    python benchmarks/bench_agent_ask.py --policy none --backend memory --turns 500
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+class StubModel:
+    """One tool call per question, then an answer built from the tool result."""
+
+    def _reply(self, messages):
+        from langchain_core.messages import AIMessage, HumanMessage
+        last = messages[-1]
+        if isinstance(last, HumanMessage):
+            return AIMessage(content="", tool_calls=[
+                {"name": "lookup", "args": {"query": last.content}, "id": f"call-{len(messages)}", "type": "tool_call"}])
+        return AIMessage(content=f"answer from {str(last.content)[:40]}")
+
+    def invoke(self, messages):
+        return self._reply(messages)
+
+    async def ainvoke(self, messages):
+        return self._reply(messages)
+
+
+class StubTool:
+    name = "lookup"
+
+    def invoke(self, query):
+        return f"[1] passage about {query} " + "lorem ipsum " * 50
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--policy", choices=["window", "none"], default="window")
+    ap.add_argument("--max-turns", type=int, default=8, help="HISTORY_MAX_TURNS")
+    ap.add_argument("--backend", choices=["memory", "sqlite"], default="sqlite", help="MEMORY_BACKEND")
+    ap.add_argument("--turns", type=int, default=500, help="questions asked on the thread")
+    ap.add_argument("--block", type=int, default=100, help="turns per reported block")
+    args = ap.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ.update({"HISTORY_POLICY": args.policy, "HISTORY_MAX_TURNS": str(args.max_turns),
+                       "MEMORY_BACKEND": args.backend, "MEMORY_PATH": str(Path(tmp.name) / "checkpoints.sqlite"),
+                       "SEMANTIC_CACHE_ENABLED": "false", "CONTEXT_PACKING": "false"})
+
+    import agent
+    import main as app
+    agent.model = StubModel()
+    agent.tools_dict = {"lookup": StubTool()}
+    app.rag_agent = agent.get_agent_runnable(prefetch=False)
+
+    thread = "bench-thread"
+    times = []
+    for t in range(args.turns):
+        t0 = time.perf_counter()
+        resp = app.ask(app.AskRequest(query=f"question {t}", thread_id=thread))
+        times.append((time.perf_counter() - t0) * 1000)
+        assert resp.answer.startswith("answer from") and len(resp.tool_results) == 1
+
+    n_messages = len(app.rag_agent.get_state({"configurable": {"thread_id": thread}}).values["messages"])
+    print(f"policy={args.policy} max_turns={args.max_turns} backend={args.backend}: "
+          f"{args.turns} turns, {n_messages} messages left in the thread")
+    print(f"{'turns':>11} {'mean':>10} {'p95':>10}")
+    for start in range(0, len(times), args.block):
+        block = times[start:start + args.block]
+        p95 = sorted(block)[max(0, int(len(block) * 0.95) - 1)]
+        print(f"{start + 1:>5}-{start + len(block):<5} {statistics.mean(block):7.2f} ms {p95:7.2f} ms")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark: BM25 model load time + resident memory, JSON vs mmap'd binary
+
+Each load runs in a fresh subprocess so RSS numbers don't bleed into each other.
+
+    python benchmarks/bench_bm25_load.py                  # synthetic 1M-term vocabulary
+    python benchmarks/bench_bm25_load.py --json bm25_values.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def _rss_mb() -> float:
+    """Current resident set size (Linux /proc)."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _child(kind: str, path: str, queries: int) -> None:
+    from pinecone_text.sparse import BM25Encoder
+    from bm25_binary import load_bm25_binary
+
+    BM25Encoder()                      # import + tokenizer setup outside the timed region
+    rss0 = _rss_mb()
+    t0 = time.perf_counter()
+    enc = load_bm25_binary(path) if kind == "binary" else BM25Encoder().load(path)
+    t_load = time.perf_counter() - t0
+    rss1 = _rss_mb()
+
+    t0 = time.perf_counter()
+    for _ in range(queries):
+        enc.encode_queries("flood control projects contractor senate hearing contempt")
+    t_query = time.perf_counter() - t0
+    print(json.dumps({"load_ms": 1000 * t_load, "rss_mb": rss1 - rss0,
+                      "query_us": 1e6 * t_query / queries}))
+
+
+def _run(kind: str, path: Path, queries: int) -> dict:
+    out = subprocess.run([sys.executable, __file__, "--child", kind, str(path), "--queries", str(queries)],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--json", help="existing bm25_values.json (default: synthetic model)")
+    ap.add_argument("--terms", type=int, default=1_000_000)
+    ap.add_argument("--queries", type=int, default=1000)
+    ap.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        _child(args.child[0], args.child[1], args.queries)
+        return
+
+    from bm25_binary import convert_json_to_binary
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = Path(args.json) if args.json else Path(tmp) / "bm25_values.json"
+        if not args.json:
+            rng = np.random.default_rng(0)
+            idx = rng.choice(2**32 - 1, size=args.terms, replace=False)
+            params = {"avgdl": 120.0, "n_docs": 50_000,
+                      "doc_freq": {"indices": idx.tolist(),
+                                   "values": rng.integers(1, 500, args.terms).astype(float).tolist()},
+                      "b": 0.75, "k1": 1.2, "lower_case": True, "remove_punctuation": True,
+                      "remove_stopwords": True, "stem": True, "language": "english"}
+            json_path.write_text(json.dumps(params))
+        bin_path = Path(tmp) / "bm25_values.bin"
+        info = convert_json_to_binary(json_path, bin_path)
+
+        print(f"terms={info['n_terms']:,}  json={json_path.stat().st_size / 1e6:.1f} MB  "
+              f"bin={bin_path.stat().st_size / 1e6:.1f} MB")
+        for kind, path in (("json", json_path), ("binary", bin_path)):
+            r = _run(kind, path, args.queries)
+            print(f"{kind:<7} load={r['load_ms']:9.2f} ms   rss+={r['rss_mb']:8.1f} MB   "
+                  f"encode_queries={r['query_us']:7.1f} us")
+
+
+if __name__ == "__main__":
+    main()
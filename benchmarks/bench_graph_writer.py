@@ -0,0 +1,127 @@
+"""
+Benchmark: storing GraphDocuments — add_graph_documents (per document) vs graph_writer (batched UNWIND)
+
+Default: synthetic graph documents written to an in-process Neo4j stand-in that charges
+--rtt-ms per statement/transaction (what a cloud Neo4j costs) and counts round trips.
+With --neo4j both writers run against NEO4J_URI / NEO4J_USERNAME / NEO4J_PASSWORD
+(use a scratch database: the synthetic entities are written for real).
+
+    python benchmarks/bench_graph_writer.py --chunks 500 --rtt-ms 20
+    python benchmarks/bench_graph_writer.py --chunks 500 --neo4j
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from langchain_community.graphs.graph_document import GraphDocument, Node, Relationship
+from langchain_core.documents import Document
+
+TYPES = ["Person", "Organization", "Location", "Project", "Event"]
+RELS = ["works at", "located in", "funded", "testified about", "member of"]
+
+
+def make_graph_documents(n_chunks: int, entities_per_chunk: int, vocab: int, seed: int = 0):
+    rng = random.Random(seed)
+    docs = []
+    for c in range(n_chunks):
+        ids = rng.sample(range(vocab), entities_per_chunk)
+        nodes = [Node(id=f"entity {i}", type=TYPES[i % len(TYPES)], properties={"name": f"Entity {i}"})
+                 for i in ids]
+        rels = [Relationship(source=nodes[j], target=nodes[j + 1], type=rng.choice(RELS))
+                for j in range(len(nodes) - 1)]
+        docs.append(GraphDocument(nodes=nodes, relationships=rels,
+                                  source=Document(page_content=f"chunk {c} text", metadata={"source": "bench.pdf"})))
+    return docs
+
+
+class _StandInSession:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute_write(self, fn):
+        self.owner._round_trip()
+        return fn(self)
+
+    def run(self, cypher, **params):
+        return self
+
+    def consume(self):
+        return None
+
+
+class StandInGraph:
+    """Neo4jGraph / neo4j Driver look-alike: every query() / write transaction costs one simulated round trip."""
+
+    structured_schema = {"metadata": {"constraint": [{"labelsOrTypes": ["__Entity__"], "properties": ["id"]}]}}
+
+    def __init__(self, rtt_ms: float):
+        self.rtt = rtt_ms / 1000
+        self.round_trips = 0
+
+    def _round_trip(self):
+        self.round_trips += 1
+        time.sleep(self.rtt)
+
+    def _check_driver_state(self):
+        pass
+
+    def refresh_schema(self):
+        pass
+
+    def session(self, database=None):
+        return _StandInSession(self)
+
+    def query(self, cypher, params=None):
+        self._round_trip()
+        return []
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=300)
+    ap.add_argument("--entities", type=int, default=8, help="entities per chunk")
+    ap.add_argument("--vocab", type=int, default=2000, help="distinct entities across the corpus")
+    ap.add_argument("--rtt-ms", type=float, default=20.0)
+    ap.add_argument("--batch-size", type=int, default=1000)
+    ap.add_argument("--neo4j", action="store_true", help="use the real database from NEO4J_* env vars")
+    args = ap.parse_args()
+
+    from langchain_neo4j import Neo4jGraph
+    from graph_writer import write_graph_documents
+
+    docs = make_graph_documents(args.chunks, args.entities, args.vocab)
+    if args.neo4j:
+        from resource_pool import pool
+        driver, legacy_graph = pool.get_neo4j_driver(), pool.get_neo4j_graph()
+    else:
+        driver, legacy_graph = StandInGraph(args.rtt_ms), StandInGraph(args.rtt_ms)
+
+    t0 = time.perf_counter()
+    Neo4jGraph.add_graph_documents(legacy_graph, docs, include_source=True, baseEntityLabel=True)
+    legacy_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    report = write_graph_documents(driver, docs, include_source=True, batch_size=args.batch_size)
+    bulk_s = time.perf_counter() - t0
+
+    target = "neo4j" if args.neo4j else f"stand-in rtt={args.rtt_ms:.0f}ms"
+    print(f"{args.chunks} chunks, {report['nodes']} distinct nodes, {report['rels']} distinct rels ({target})")
+    trips = "" if args.neo4j else f", {legacy_graph.round_trips} round trips"
+    print(f"add_graph_documents : {legacy_s:7.2f} s{trips}")
+    trips = "" if args.neo4j else f", {driver.round_trips} round trips"
+    print(f"graph_writer        : {bulk_s:7.2f} s{trips}  "
+          f"({report['nodes_per_s']} nodes/s, {report['rels_per_s']} rels/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Benchmark: fetch_facts_for_question — two round trips (old) vs one (exact + relaxed combined)
+
+Misses (the exact query finds nothing, the OR fallback does) save a round trip. Hits cost the
+same as before (one round trip, one lookup): the combined Cypher only runs the relaxed lookup
+when the exact one has no facts, so the expected saving on hits is ~0, not a win.
+
+Both paths are timed through the same layer: build the params the way the tool does and call
+graph.query (no tool/callback overhead, no index check), so the difference is the query plan.
+
+Default: an in-process Neo4j stand-in that charges --rtt-ms per query (what a cloud Neo4j costs)
+plus --lookup-ms per fulltext lookup the query executes, and matches terms against a small
+entity list. For the combined query it runs the second (relaxed) subquery only under the
+conditions of the guard found in the Cypher text (size(exact) = 0, $q_relaxed <> '',
+$q_relaxed <> $q), so dropping a condition from retriever._FACTS_CYPHER shows up here. Use --neo4j to
+measure the real server-side cost against the database in NEO4J_URI / NEO4J_USERNAME /
+NEO4J_PASSWORD (e.g. a local docker Neo4j after an ingest).
+
+    python benchmarks/bench_kg_fallback.py --rtt-ms 40 --lookup-ms 5
+    python benchmarks/bench_kg_fallback.py --neo4j
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Queries where the AND-style exact query misses and only the OR fallback finds something
+MISS_QUERIES = [
+    "what happened with discaya and the senate budget",
+    "tell me about flood control contractors in bulacan",
+    "who testified about ghost projects",
+    "any news on the public works secretary resignation",
+]
+
+# Queries the exact query already answers
+HIT_QUERIES = [
+    "sarah discaya",
+    "senate blue ribbon committee",
+    "ghost projects",
+    "public works",
+]
+
+# The pre-change query: run once with $q, and again with the OR-joined terms when empty
+LEGACY_CYPHER = """
+CALL db.index.fulltext.queryNodes('entity_fulltext', $q)
+YIELD node, score
+WITH node, score
+ORDER BY score DESC
+LIMIT $top_nodes
+OPTIONAL MATCH (node)-[r]-(n2)
+WITH node, score, r, n2
+WHERE r IS NULL
+   OR (type(r) <> 'MENTIONS'
+       AND (n2 IS NULL OR NOT any(l IN labels(n2) WHERE l IN ['Chunk','Paragraph','Page','Span'])))
+WITH
+  coalesce(node.name, node.id, node.title, node.value) AS subject,
+  CASE WHEN r IS NULL THEN null ELSE type(r) END AS rel,
+  CASE WHEN n2 IS NULL THEN null ELSE coalesce(n2.name, n2.id, n2.title, n2.value) END AS object,
+  coalesce(r.source, node.source, CASE WHEN n2 IS NULL THEN null ELSE n2.source END) AS source,
+  score
+RETURN subject, rel, object, source, score
+ORDER BY score DESC
+LIMIT $max_facts
+"""
+
+
+class StandInGraph:
+    """Neo4jGraph look-alike: every query() costs one simulated network round trip,
+    every fulltext lookup it executes costs --lookup-ms."""
+
+    def __init__(self, entities, rtt_ms: float, lookup_ms: float):
+        self.entities = [e.lower() for e in entities]
+        self.rtt = rtt_ms / 1000
+        self.lookup = lookup_ms / 1000
+        self.round_trips = self.lookups = 0
+
+    def _match(self, q: str):
+        self.lookups += 1
+        time.sleep(self.lookup)
+        if " OR " in q:
+            terms = q.split(" OR ")
+            hit = lambda e: any(t in e for t in terms)          # noqa: E731
+        else:
+            terms = q.split()
+            hit = lambda e: all(t in e for t in terms)          # noqa: E731
+        return [{"subject": e, "rel": None, "object": None, "source": None, "score": 1.0}
+                for e in self.entities if hit(e)]
+
+    @staticmethod
+    def _relaxed_runs(cypher: str, exact, q: str, q_relaxed: str) -> bool:
+        """Evaluate the guard of the combined query's second CALL subquery (absent condition = true)."""
+        guard = cypher.split("$q_relaxed)", 1)[0].rsplit("CALL {", 1)[1]
+        return ((not exact or "size(exact) = 0" not in guard)
+                and (q_relaxed != "" or "$q_relaxed <> ''" not in guard)
+                and (q_relaxed != q or "$q_relaxed <> $q" not in guard))
+
+    def query(self, cypher, params=None):
+        self.round_trips += 1
+        time.sleep(self.rtt)
+        if "SHOW INDEXES" in cypher:
+            return [{"name": params["n"], "type": "FULLTEXT", "state": "ONLINE"}]
+        exact = self._match(params["q"])
+        if "$q_relaxed" not in cypher:         # legacy single lookup
+            return exact
+        relaxed = self._match(params["q_relaxed"]) if self._relaxed_runs(
+            cypher, exact, params["q"], params["q_relaxed"]) else []
+        return (exact + relaxed)[:params["max_facts"]]
+
+
+def _legacy(graph, query, top_nodes=3, max_facts=3):
+    from retriever import _normalize, _relaxed_query
+    q1 = _normalize(query)
+    params = {"q": q1, "top_nodes": top_nodes, "max_facts": max_facts}
+    rows = graph.query(LEGACY_CYPHER, params=params)
+    if not rows and q1.split():
+        rows = graph.query(LEGACY_CYPHER, params={**params, "q": _relaxed_query(q1)})
+    return rows
+
+
+def _combined(graph, query, top_nodes=3, max_facts=3):
+    # what fetch_facts_for_question sends, minus the tool wrapper and the (cached) index check
+    from retriever import _FACTS_CYPHER, _normalize, _relaxed_query
+    q1 = _normalize(query)
+    params = {"q": q1, "q_relaxed": _relaxed_query(q1), "top_nodes": top_nodes, "max_facts": max_facts}
+    return graph.query(_FACTS_CYPHER, params=params)
+
+
+def _time(fn, queries, repeats):
+    out = []
+    for _ in range(repeats):
+        for q in queries:
+            t0 = time.perf_counter()
+            fn(q)
+            out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rtt-ms", type=float, default=40.0)
+    ap.add_argument("--lookup-ms", type=float, default=5.0, help="stand-in cost of one fulltext lookup")
+    ap.add_argument("--repeats", type=int, default=5)
+    ap.add_argument("--neo4j", action="store_true", help="use the real database from NEO4J_* env vars")
+    args = ap.parse_args()
+
+    import retriever
+    from resource_pool import pool
+
+    if args.neo4j:
+        graph = pool.get_neo4j_graph()
+    else:
+        graph = StandInGraph(["Sarah Discaya", "Senate Blue Ribbon Committee", "Bulacan",
+                              "Department of Public Works and Highways", "Ghost projects"],
+                             args.rtt_ms, args.lookup_ms)
+        pool._items["neo4j_graph"] = graph          # let the tool use the stand-in
+
+    retriever.fetch_facts_for_question.invoke(MISS_QUERIES[0])      # warm: index check + connection
+    for q in MISS_QUERIES + HIT_QUERIES:                             # both plans return the same facts
+        assert [r["subject"] for r in _legacy(graph, q)] == [r["subject"] for r in _combined(graph, q)], q
+    target = "neo4j" if args.neo4j else f"stand-in rtt={args.rtt_ms:.0f}ms lookup={args.lookup_ms:.0f}ms"
+    print(f"{target}, {args.repeats} repeats, median per query")
+    print(f"{'':7} {'two round trips':>16} {'combined':>10} {'saved':>8}")
+    for label, queries in (("misses", MISS_QUERIES), ("hits", HIT_QUERIES)):
+        legacy = statistics.median(_time(lambda q: _legacy(graph, q), queries, args.repeats))
+        single = statistics.median(_time(lambda q: _combined(graph, q), queries, args.repeats))
+        print(f"{label:<7} {legacy:13.1f} ms {single:7.1f} ms {legacy - single:5.1f} ms")
+    print("(hits: one round trip and one lookup either way, so ~0 saved is the expected result)")
+
+
+if __name__ == "__main__":
+    main()
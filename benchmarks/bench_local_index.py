@@ -0,0 +1,68 @@
+"""
+Benchmark: LocalHybridIndex upsert + query latency (synthetic vectors, no network)
+
+    python benchmarks/bench_local_index.py --n 20000 --dim 1024 --queries 200
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from local_index import LocalHybridIndex  # noqa: E402
+
+
+def _sparse(rng, vocab, nnz):
+    idx = rng.choice(vocab, size=nnz, replace=False)
+    return {"indices": idx.tolist(), "values": rng.random(nnz).tolist()}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=20000)
+    ap.add_argument("--dim", type=int, default=1024)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--top-k", type=int, default=5)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    vocab = 50_000
+    with tempfile.TemporaryDirectory() as tmp:
+        index = LocalHybridIndex(tmp)
+
+        dense = rng.normal(size=(args.n, args.dim)).astype(np.float32)
+        dense /= np.linalg.norm(dense, axis=1, keepdims=True)
+        t0 = time.perf_counter()
+        for i in range(0, args.n, 256):
+            index.upsert([{"id": f"doc-{j}", "values": dense[j].tolist(),
+                           "sparse_values": _sparse(rng, vocab, 60),
+                           "metadata": {"context": f"chunk {j}"}}
+                          for j in range(i, min(i + 256, args.n))], namespace="docs")
+        t_upsert = time.perf_counter() - t0
+
+        q_dense = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+        q_dense /= np.linalg.norm(q_dense, axis=1, keepdims=True)
+        q_sparse = [_sparse(rng, vocab, 8) for _ in range(args.queries)]
+
+        index.query(vector=q_dense[0].tolist(), sparse_vector=q_sparse[0], namespace="docs")  # build postings
+        t0 = time.perf_counter()
+        for qd, qs in zip(q_dense, q_sparse):
+            index.query(vector=qd.tolist(), sparse_vector=qs, top_k=args.top_k,
+                        include_metadata=True, namespace="docs")
+        t_single = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        index.hybrid_query_batch(q_dense, q_sparse, alpha=0.7, top_k=args.top_k, namespace="docs")
+        t_batch = time.perf_counter() - t0
+
+    print(f"vectors={args.n} dim={args.dim}")
+    print(f"upsert : {args.n / t_upsert:,.0f} vectors/s")
+    print(f"query  : {1000 * t_single / args.queries:.2f} ms/query (one at a time)")
+    print(f"batch  : {1000 * t_batch / args.queries:.2f} ms/query ({args.queries} queries per call)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Benchmark: rerank latency and ranking agreement — Cohere rerank-v3.5 vs the local fusion reranker
+
+The sample corpus (sample_documents/PDFs_parsed) is chunked, embedded (EMBED_MODEL, through
+the embedding cache) and loaded into a temporary LocalHybridIndex with a BM25 model fitted
+on the chunks. With --no-cohere nothing goes over the network: chunks and queries are
+embedded with a local hashed bag-of-words (HashEmbeddings) instead of EMBED_MODEL, so the
+local timings are the same but the dense scores are cruder than the real model's. For every query the SAME top-k hybrid candidates go to:
+
+    cohere : CohereRerank.rerank (network; needs COHERE_API_KEY)
+    local  : rerank.local_rerank (dense cosine + BM25 fusion)
+    local+mmr (with --mmr)
+
+and the script reports rerank latency and agreement with Cohere (top-1 match, overlap@n).
+
+    python benchmarks/bench_rerank.py --top-k 10 --top-n 3 --mmr 0.7
+    python benchmarks/bench_rerank.py --no-cohere --mmr 0.7     # offline
+"""
+import argparse
+import hashlib
+import re
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+ROOT = Path(__file__).resolve().parents[1]
+
+QUERIES = [
+    "who owns St. Gerrard Construction",
+    "what did the Discayas say in the senate hearing",
+    "how much was allocated to flood control projects",
+    "which contractors got the most flood control contracts",
+    "what are ghost flood control projects",
+    "what happened to the public works secretary",
+    "which lawmakers were accused of receiving kickbacks",
+    "what did the president say about the flood control scandal",
+    "where were the substandard flood control projects located",
+    "what is the independent commission for infrastructure",
+]
+
+
+def hash_embeddings(dim: int = 256):
+    """Offline stand-in for EMBED_MODEL: L2-normalized hashed bag of lowercase words."""
+    import numpy as np
+    from langchain_core.embeddings import Embeddings
+
+    class HashEmbeddings(Embeddings):
+        def embed_query(self, text):
+            v = np.zeros(dim, dtype=np.float32)
+            for w in re.findall(r"\w+", text.lower()):
+                v[int.from_bytes(hashlib.blake2b(w.encode(), digest_size=4).digest(), "little") % dim] += 1.0
+            return (v / (np.linalg.norm(v) or 1.0)).tolist()
+
+        def embed_documents(self, texts):
+            return [self.embed_query(t) for t in texts]
+
+    return HashEmbeddings()
+
+
+def build_index(folder: Path, tmp: Path, offline: bool = False):
+    import config as cfg
+    from data_process import iter_markdown_chunks
+    from local_index import LocalHybridIndex
+    from pinecone_text.sparse import BM25Encoder
+    from resource_pool import pool
+    from retriever import ChunkStoreHybridRetriever
+    from vector_pipeline import chunk_id
+
+    parsed = [{"markdown_path": str(p), "source_pdf": p.stem + ".pdf"} for p in sorted(folder.glob("*.md"))]
+    chunks = list(iter_markdown_chunks(parsed))
+    texts = [c.page_content for c in chunks]
+    bm25 = BM25Encoder().fit(texts)
+    embeddings = hash_embeddings() if offline else cfg.embeddings
+    dense = (embeddings if offline else pool.get_document_embeddings()).embed_documents(texts)
+    sparse = bm25.encode_documents(texts)
+
+    index = LocalHybridIndex(tmp / "index")
+    index.upsert([{"id": chunk_id(c), "values": d, "sparse_values": s,
+                   "metadata": {"source": str(c.metadata.get("source", "")), "context": c.page_content}}
+                  for c, d, s in zip(chunks, dense, sparse)], namespace="bench")
+    retriever = ChunkStoreHybridRetriever(embeddings=embeddings, sparse_encoder=bm25, index=index,
+                                          namespace="bench", alpha=0.7, top_k=5)
+    return retriever, len(chunks)
+
+
+def timed(fn, repeat: int):
+    out, times = None, []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return out, times
+
+
+def summary(name: str, times, agree=None) -> str:
+    p95 = sorted(times)[max(0, int(len(times) * 0.95) - 1)]
+    line = f"{name:<10} mean {statistics.mean(times):8.2f} ms   p95 {p95:8.2f} ms"
+    if agree:
+        line += (f"   top-1 agreement {statistics.mean(a[0] for a in agree):.0%}"
+                 f"   overlap@n {statistics.mean(a[1] for a in agree):.2f}")
+    return line
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--folder", default=str(ROOT / "sample_documents" / "PDFs_parsed"))
+    ap.add_argument("--top-k", type=int, default=10, help="hybrid candidates per query")
+    ap.add_argument("--top-n", type=int, default=3)
+    ap.add_argument("--dense-weight", type=float, default=0.7)
+    ap.add_argument("--mmr", type=float, default=None, help="also run local with MMR lambda")
+    ap.add_argument("--repeat", type=int, default=3, help="timed runs per query and backend")
+    ap.add_argument("--no-cohere", action="store_true", help="local only, hashed embeddings (offline)")
+    args = ap.parse_args()
+
+    from rerank import local_rerank
+
+    with tempfile.TemporaryDirectory() as tmp:
+        retriever, n_chunks = build_index(Path(args.folder), Path(tmp), offline=args.no_cohere)
+        retriever.top_k = args.top_k
+        cohere = None
+        if not args.no_cohere:
+            from langchain_cohere import CohereRerank
+            cohere = CohereRerank(model="rerank-v3.5", top_n=args.top_n)
+
+        variants = {"local": None, **({"local+mmr": args.mmr} if args.mmr is not None else {})}
+        times = {name: [] for name in ["cohere", *variants]}
+        agree = {name: [] for name in variants}
+
+        for q in QUERIES:
+            docs, vectors = retriever.search(q, include_values=True)
+            ref = None
+            if cohere is not None:
+                ranked, t = timed(lambda: cohere.rerank(docs, q, top_n=args.top_n), args.repeat)
+                times["cohere"] += t
+                ref = [r["index"] for r in ranked]
+            for name, lam in variants.items():
+                ranked, t = timed(lambda: local_rerank(docs, vectors, retriever.sparse_encoder, args.top_n,
+                                                       dense_weight=args.dense_weight, mmr_lambda=lam), args.repeat)
+                times[name] += t
+                order = [i for i, _ in ranked]
+                if ref:
+                    agree[name].append((order[0] == ref[0], len(set(order) & set(ref)) / len(ref)))
+
+    print(f"{n_chunks} chunks, {len(QUERIES)} queries, top-k {args.top_k} -> top-n {args.top_n}, "
+          f"{args.repeat} runs each (rerank stage only; same candidates for every backend)")
+    for name, t in times.items():
+        if t:
+            print(summary(name, t, agree.get(name)))
+
+
+if __name__ == "__main__":
+    main()
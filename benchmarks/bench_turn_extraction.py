@@ -0,0 +1,90 @@
+"""
+Benchmark: per-request overhead of finding this turn's messages vs thread length
+
+Before: /ask scanned the whole response["messages"] twice (find the last HumanMessage,
+then collect tool messages after it), so the cost grew with the conversation.
+Now the agent's start_turn node records turn_start and /ask slices from there.
+
+A synthetic thread of N turns (question, tool-call message, 2 tool results, answer) is
+built for each N; both versions run on it, plus the start_turn node itself (with
+HISTORY_POLICY=none so the thread is not trimmed and the full length is measured).
+
+    python benchmarks/bench_turn_extraction.py --turns 10 100 1000
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ["HISTORY_POLICY"] = "none"
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+
+def make_thread(turns: int) -> List:
+    msgs = []
+    for t in range(turns):
+        calls = [{"name": n, "args": {"query": f"q{t}"}, "id": f"{n}-{t}", "type": "tool_call"}
+                 for n in ("build_pinecone_retriever", "fetch_facts_for_question")]
+        msgs += [HumanMessage(content=f"question {t}", id=f"h{t}"),
+                 AIMessage(content="", tool_calls=calls, id=f"c{t}"),
+                 *[ToolMessage(tool_call_id=c["id"], name=c["name"], content="[1] passage", id=f"{c['id']}-r")
+                   for c in calls],
+                 AIMessage(content=f"answer {t}", id=f"a{t}")]
+    return msgs
+
+
+def legacy_extract(resp: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # the pre-turn_start main.extract_tool_messages_last_turn (two passes over the thread)
+    msgs = resp.get("messages", []) or []
+    last_human_idx = -1
+    for i, m in enumerate(msgs):
+        t = m.get("type") if isinstance(m, dict) else getattr(m, "type", None)
+        if t == "human" or isinstance(m, HumanMessage):
+            last_human_idx = i
+    if last_human_idx == -1:
+        return []
+    out = []
+    for m in msgs[last_human_idx + 1:]:
+        t = m.get("type") if isinstance(m, dict) else getattr(m, "type", None)
+        if t == "tool":
+            out.append({"name": getattr(m, "name", None) or "unknown_tool", "content": m.content or ""})
+    return out
+
+
+def per_call_us(fn, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000])
+    ap.add_argument("--repeat", type=int, default=2000)
+    args = ap.parse_args()
+
+    from agent import start_turn
+    from main import extract_tool_messages_last_turn
+
+    print(f"{'turns':>6} {'messages':>9} {'legacy scan':>13} {'start_turn':>12} {'turn_start slice':>17}")
+    for n in args.turns:
+        thread = make_thread(n)
+        # state as it looks when start_turn runs: history + the new question
+        entry = {"messages": thread[:-4]}
+        turn_start = start_turn(entry)["turn_start"]
+        resp = {"messages": thread, "turn_start": turn_start}
+        assert extract_tool_messages_last_turn(resp) == legacy_extract(resp)
+
+        legacy = per_call_us(lambda: legacy_extract(resp), args.repeat)
+        node = per_call_us(lambda: start_turn(entry), args.repeat)
+        sliced = per_call_us(lambda: extract_tool_messages_last_turn(resp), args.repeat)
+        print(f"{n:>6} {len(thread):>9} {legacy:>10.1f} us {node:>9.1f} us {sliced:>14.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: vector ingest — sequential embed-all / encode-all / upsert loop (old) vs vector_pipeline
+(size-aware upsert batches: --max-bytes / --max-vectors)
+
+Stand-ins charge a fixed latency per remote call so the comparison is about overlap:
+--embed-ms per embedding request of --embed-batch chunks, --upsert-ms per upsert request
+of 32 vectors. BM25 encoding is real CPU work on the chunk text (a hashed term counter).
+
+    python benchmarks/bench_vector_pipeline.py --chunks 2000 --embed-ms 300 --upsert-ms 80
+"""
+import argparse
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from langchain_core.documents import Document
+
+
+class StandInEmbeddings:
+    def __init__(self, ms: float, dim: int = 1024):
+        self.delay, self.dim = ms / 1000, dim
+
+    def embed_documents(self, texts):
+        time.sleep(self.delay)
+        return [[0.001 * (len(t) % 97)] * self.dim for t in texts]
+
+
+class StandInBM25:
+    def encode_documents(self, texts):
+        out = []
+        for t in texts:
+            tf = Counter(hash(w) & 0xFFFFFFFF for w in t.lower().split())
+            out.append({"indices": list(tf), "values": [float(v) for v in tf.values()]})
+        return out
+
+
+class StandInIndex:
+    def __init__(self, ms: float):
+        self.delay = ms / 1000
+        self.requests = 0
+
+    def upsert(self, vectors, namespace=None):
+        time.sleep(self.delay)
+        self.requests += 1
+
+
+def sequential(index, chunks, embedder, bm25, embed_batch):
+    """What create_and_upsert_vectors did before: one stage after another."""
+    texts = [d.page_content for d in chunks]
+    dense = []
+    for i in range(0, len(texts), embed_batch):            # the API batches internally too
+        dense.extend(embedder.embed_documents(texts[i:i + embed_batch]))
+    sparse = bm25.encode_documents(texts)
+    records = [{"id": str(i), "values": d, "sparse_values": s, "metadata": {"context": t}}
+               for i, (t, d, s) in enumerate(zip(texts, dense, sparse))]
+    for i in range(0, len(records), 32):
+        index.upsert(vectors=records[i:i + 32], namespace="bench")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=1000)
+    ap.add_argument("--embed-ms", type=float, default=300.0)
+    ap.add_argument("--upsert-ms", type=float, default=80.0)
+    ap.add_argument("--embed-batch", type=int, default=64)
+    ap.add_argument("--max-bytes", type=int, default=2_000_000, help="UPSERT_MAX_BYTES")
+    ap.add_argument("--max-vectors", type=int, default=100, help="UPSERT_MAX_VECTORS")
+    args = ap.parse_args()
+
+    from vector_pipeline import upsert_chunks_pipelined
+
+    words = "flood control project contractor senate budget hearing district engineer".split()
+    chunks = [Document(page_content=" ".join(words[(i + j) % len(words)] for j in range(300)),
+                       metadata={"source": "bench.pdf"}) for i in range(args.chunks)]
+
+    t0 = time.perf_counter()
+    sequential(StandInIndex(args.upsert_ms), chunks, StandInEmbeddings(args.embed_ms), StandInBM25(), args.embed_batch)
+    seq_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    report = upsert_chunks_pipelined(StandInIndex(args.upsert_ms), chunks, embedder=StandInEmbeddings(args.embed_ms),
+                                     bm25=StandInBM25(), namespace="bench", embed_batch_size=args.embed_batch,
+                                     max_batch_bytes=args.max_bytes, max_batch_vectors=args.max_vectors)
+    pipe_s = time.perf_counter() - t0
+
+    print(f"{args.chunks} chunks, embed {args.embed_ms:.0f} ms/request, upsert {args.upsert_ms:.0f} ms/request")
+    print(f"sequential : {seq_s:7.2f} s  ({args.chunks / seq_s:7.1f} vectors/s)")
+    print(f"pipelined  : {pipe_s:7.2f} s  ({args.chunks / pipe_s:7.1f} vectors/s)  busy per stage {report['stage_busy_s']}")
+    print(f"upserts    : {report['requests']} requests, {report['bytes'] / 1e6:.1f} MB "
+          f"(max {report['max_request_bytes'] / 1e6:.2f} MB/request, {report['mb_per_s']} MB/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Compact binary BM25 model (bm25_values.bin) with memory-mapped loading
+
+bm25_values.json keeps doc_freq as two JSON lists that json.load turns into one
+Python int/float per term on every load. The binary file keeps them as sorted
+uint32 arrays that are mmap'd and searched with np.searchsorted — load time and
+memory no longer grow with the vocabulary.
+
+Layout (little-endian, version 1):
+    header  64 bytes  magic "BM25", version u16, flags u16, n_docs u64, avgdl f64,
+                      b f64, k1 f64, n_terms u64, language 16s
+    indices uint32[n_terms]   sorted mmh3 term hashes
+    counts  uint32[n_terms]   document frequency of indices[i]
+
+Convert an existing model:
+    python bm25_binary.py bm25_values.json bm25_values.bin
+"""
+
+import json
+import os
+import struct
+import sys
+import tempfile
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterator
+
+import numpy as np
+from pinecone_text.sparse import BM25Encoder
+
+MAGIC = b"BM25"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHQdddQ16s")          # 64 bytes
+_FLAGS = ("lower_case", "remove_punctuation", "remove_stopwords", "stem")
+
+
+# ============================================
+# doc_freq view over the mmap'd arrays
+# ============================================
+class MmapDocFreq(Mapping):
+    """Read-only {term_hash: doc_freq} backed by two sorted uint32 arrays."""
+
+    def __init__(self, indices: np.ndarray, counts: np.ndarray):
+        self.indices = indices
+        self.counts = counts
+
+    def lookup(self, keys, default: int = 1) -> np.ndarray:
+        """Vectorized get(): doc_freq for every key, `default` where missing."""
+        keys = np.asarray(keys, dtype=np.uint32)
+        if len(self.indices) == 0:
+            return np.full(len(keys), default, dtype=np.float64)
+        pos = np.minimum(np.searchsorted(self.indices, keys), len(self.indices) - 1)
+        found = self.indices[pos] == keys
+        return np.where(found, self.counts[pos], default).astype(np.float64)
+
+    def __getitem__(self, key: int) -> int:
+        pos = int(np.searchsorted(self.indices, key))
+        if pos < len(self.indices) and self.indices[pos] == key:
+            return int(self.counts[pos])
+        raise KeyError(key)
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __iter__(self) -> Iterator[int]:
+        return (int(i) for i in self.indices)
+
+
+class MmapBM25Encoder(BM25Encoder):
+    """BM25Encoder whose doc_freq lives in a mmap'd binary model."""
+
+    def _encode_single_query(self, text: str):
+        indices, _ = self._tf(text)
+        df = self.doc_freq.lookup(indices, default=1)
+        idf = np.log((self.n_docs + 1) / (df + 0.5))
+        idf_norm = idf / idf.sum()
+        return {"indices": indices, "values": idf_norm.tolist()}
+
+
+# ============================================
+# Write / load / convert
+# ============================================
+def write_bm25_binary(params: Dict, path: str | Path) -> Path:
+    """Write BM25Encoder.get_params()-style params to the binary format (atomic replace)."""
+    path = Path(path)
+    idx = np.asarray(params["doc_freq"]["indices"], dtype=np.uint32)
+    cnt = np.asarray(params["doc_freq"]["values"], dtype=np.float64).round().astype(np.uint32)
+    order = np.argsort(idx, kind="stable")
+    idx, cnt = idx[order], cnt[order]
+
+    flags = sum(1 << i for i, name in enumerate(_FLAGS) if params.get(name, True))
+    header = _HEADER.pack(MAGIC, VERSION, flags, int(params["n_docs"]), float(params["avgdl"]),
+                          float(params.get("b", 0.75)), float(params.get("k1", 1.2)), len(idx),
+                          params.get("language", "english").encode("utf-8")[:16])
+
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(header)
+        f.write(idx.astype("<u4").tobytes())
+        f.write(cnt.astype("<u4").tobytes())
+    os.replace(tmp, path)
+    return path
+
+
+def read_bm25_header(path: str | Path) -> Dict:
+    with open(path, "rb") as f:
+        raw = f.read(_HEADER.size)
+    if len(raw) < _HEADER.size:
+        raise ValueError(f"{path}: truncated BM25 binary header")
+    magic, version, flags, n_docs, avgdl, b, k1, n_terms, lang = _HEADER.unpack(raw)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: not a BM25 binary model")
+    if version != VERSION:
+        raise ValueError(f"{path}: unsupported BM25 binary version {version}")
+    return {"n_docs": n_docs, "avgdl": avgdl, "b": b, "k1": k1, "n_terms": n_terms,
+            "language": lang.rstrip(b"\0").decode("utf-8"),
+            **{name: bool(flags & (1 << i)) for i, name in enumerate(_FLAGS)}}
+
+
+def load_bm25_binary(path: str | Path) -> MmapBM25Encoder:
+    """mmap the model; no per-term Python objects are created."""
+    h = read_bm25_header(path)
+    n = h["n_terms"]
+    indices = np.memmap(path, dtype="<u4", mode="r", offset=_HEADER.size, shape=(n,)) if n else np.zeros(0, "<u4")
+    counts = np.memmap(path, dtype="<u4", mode="r", offset=_HEADER.size + 4 * n, shape=(n,)) if n else np.zeros(0, "<u4")
+
+    enc = MmapBM25Encoder(b=h["b"], k1=h["k1"], lower_case=h["lower_case"],
+                          remove_punctuation=h["remove_punctuation"],
+                          remove_stopwords=h["remove_stopwords"], stem=h["stem"], language=h["language"])
+    enc.n_docs = h["n_docs"]
+    enc.avgdl = h["avgdl"]
+    enc.doc_freq = MmapDocFreq(indices, counts)
+    return enc
+
+
+def convert_json_to_binary(json_path: str | Path, bin_path: str | Path) -> Dict:
+    """Convert a BM25Encoder.dump() JSON model to the binary format."""
+    with open(json_path, "r", encoding="utf-8") as f:
+        params = json.load(f)
+    write_bm25_binary(params, bin_path)
+    return read_bm25_header(bin_path)
+
+
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else "bm25_values.json"
+    dst = sys.argv[2] if len(sys.argv) > 2 else str(Path(src).with_suffix(".bin"))
+    info = convert_json_to_binary(src, dst)
+    print(f"Wrote {dst}: {info['n_terms']} terms, n_docs={info['n_docs']}, avgdl={info['avgdl']:.3f}")
@@ -0,0 +1,229 @@
+"""
+Incremental, mergeable BM25 corpus statistics
+
+BM25Encoder().fit(texts) only knows the chunks of the PDF being ingested, so every
+ingest overwrote bm25_values.json with the stats of ONE document. This store keeps
+the corpus-wide numbers and updates them with only the new chunks' counts:
+
+    n_docs      += chunks in the upload
+    sum_doc_len += their token counts        (avgdl = sum_doc_len / n_docs)
+    doc_freq[t] += number of new chunks containing t
+
+The running totals are persisted in cfg.BM25_STATS_PATH together with an index of the
+known sources; each source's own contribution lives in one small file under
+cfg.BM25_SOURCES_DIR, so a document can be subtracted again (remove_source) or replaced
+on re-ingest. load() reads only the totals and save() rewrites the totals plus the
+files of the sources touched since load — not every document's counts.
+bm25_values.json stays in the BM25Encoder.dump() format; bm25_values.bin is written
+next to it for the mmap loader (bm25_binary.py).
+
+A bm25_values.json from the old fit-and-overwrite ingest is NOT adopted: it holds the
+stats of whichever document was ingested last, with no record of which one, so merging
+it would double-count that document when it is ingested again. Re-ingest the documents
+to build the corpus stats.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from pinecone_text.sparse import BM25Encoder
+
+import config as cfg
+from bm25_binary import write_bm25_binary
+
+_lock = threading.Lock()       # one writer per process (load -> merge -> save)
+
+
+def _atomic_write_json(path: Path, obj) -> None:
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+
+def _pack(counter: Dict[int, int]) -> Dict[str, List]:
+    items = list(counter.items())
+    return {"indices": [int(i) for i, _ in items], "values": [int(v) for _, v in items]}
+
+
+def _unpack(d: Optional[Dict[str, List]]) -> Counter:
+    if not d:
+        return Counter()
+    return Counter({int(i): int(v) for i, v in zip(d["indices"], d["values"])})
+
+
+def _source_file(source: str) -> str:
+    """A fresh file name per write, so the totals never point at a half-replaced file."""
+    return f"{hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]}-{uuid.uuid4().hex[:8]}.json"
+
+
+class BM25Stats:
+    """Corpus-wide BM25 statistics that can be merged and subtracted per source."""
+
+    def __init__(self, b: float = 0.75, k1: float = 1.2, sources_dir: Path = cfg.BM25_SOURCES_DIR,
+                 **tokenizer_params):
+        self.b = b
+        self.k1 = k1
+        self.tokenizer_params = {"lower_case": True, "remove_punctuation": True,
+                                 "remove_stopwords": True, "stem": True, "language": "english",
+                                 **tokenizer_params}
+        self.n_docs = 0
+        self.sum_doc_len = 0.0
+        self.doc_freq: Counter = Counter()
+        self.sources_dir = Path(sources_dir)
+        self.sources: Dict[str, str] = {}                 # source -> file name in sources_dir
+        self._loaded: Dict[str, Dict] = {}                # source -> {"n_docs", "sum_doc_len", "doc_freq": Counter}
+        self._dirty: Dict[str, Optional[Dict]] = {}       # touched since load (None = removed)
+        self._stale_files: List[str] = []                 # replaced / removed, deleted after the next save
+        self._tf_encoder = None                           # BM25Encoder, tokenizer/hash only (built on first add)
+
+    def _contrib(self, source: str) -> Dict:
+        """A source's counts, read from its file the first time they are needed."""
+        if source not in self._loaded:
+            with open(self.sources_dir / self.sources[source], "r", encoding="utf-8") as f:
+                c = json.load(f)
+            self._loaded[source] = {"n_docs": c["n_docs"], "sum_doc_len": c["sum_doc_len"],
+                                    "doc_freq": _unpack(c["doc_freq"])}
+        return self._loaded[source]
+
+    # ------------------------------------------------------------------
+    # Merge / subtract
+    # ------------------------------------------------------------------
+    def _apply(self, contrib: Dict, sign: int) -> None:
+        self.n_docs += sign * contrib["n_docs"]
+        self.sum_doc_len += sign * contrib["sum_doc_len"]
+        for idx, c in contrib["doc_freq"].items():
+            v = self.doc_freq[idx] + sign * c
+            if v > 0:
+                self.doc_freq[idx] = v
+            else:
+                self.doc_freq.pop(idx, None)
+
+    def add_texts(self, texts: Iterable[str], source: str) -> Dict[str, int]:
+        """Count only the new texts and merge them in. Re-adding a source replaces it."""
+        if self._tf_encoder is None:
+            self._tf_encoder = BM25Encoder(b=self.b, k1=self.k1, **self.tokenizer_params)
+        n_docs, sum_len, df = 0, 0, Counter()
+        for text in texts:
+            indices, tf = self._tf_encoder._tf(text)
+            if not indices:
+                continue
+            n_docs += 1
+            sum_len += sum(tf)
+            df.update(indices)
+
+        if source in self.sources:
+            self.remove_source(source)
+        contrib = {"n_docs": n_docs, "sum_doc_len": float(sum_len), "doc_freq": df}
+        self.sources[source] = _source_file(source)
+        self._loaded[source] = self._dirty[source] = contrib
+        self._apply(contrib, +1)
+        return {"source_docs": n_docs, "new_terms": len(df), "corpus_docs": self.n_docs}
+
+    def remove_source(self, source: str) -> bool:
+        """Subtract a document's counts (e.g. when it is deleted from the index)."""
+        if source not in self.sources:
+            return False
+        self._apply(self._contrib(source), -1)
+        self._stale_files.append(self.sources.pop(source))
+        self._loaded.pop(source, None)
+        self._dirty[source] = None
+        return True
+
+    # ------------------------------------------------------------------
+    # Encoder view
+    # ------------------------------------------------------------------
+    @property
+    def avgdl(self) -> float:
+        return self.sum_doc_len / self.n_docs if self.n_docs else 0.0
+
+    def to_params(self) -> Dict:
+        """Same dict as BM25Encoder.get_params() (the bm25_values.json format)."""
+        return {"avgdl": self.avgdl, "n_docs": self.n_docs,
+                "doc_freq": {"indices": [int(i) for i in self.doc_freq],
+                             "values": [float(v) for v in self.doc_freq.values()]},
+                "b": self.b, "k1": self.k1, **self.tokenizer_params}
+
+    def encoder(self) -> BM25Encoder:
+        if not self.n_docs:
+            raise ValueError("BM25 stats are empty; ingest at least one document first")
+        return BM25Encoder().set_params(**self.to_params())
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    @classmethod
+    def load(cls, stats_path: Path = cfg.BM25_STATS_PATH, model_path: Path = cfg.BM25_PATH,
+             sources_dir: Path = cfg.BM25_SOURCES_DIR) -> "BM25Stats":
+        stats_path, model_path = Path(stats_path), Path(model_path)
+        if not stats_path.exists():
+            if model_path.exists():
+                print(f"BM25 stats: {stats_path.name} not found; {model_path.name} has no per-source "
+                      f"history and is not merged (re-ingest the documents to rebuild the corpus stats)")
+            return cls(sources_dir=sources_dir)
+
+        with open(stats_path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        stats = cls(b=raw["b"], k1=raw["k1"], sources_dir=sources_dir, **raw["tokenizer"])
+        stats.n_docs = raw["n_docs"]
+        stats.sum_doc_len = raw["sum_doc_len"]
+        stats.doc_freq = _unpack(raw["doc_freq"])
+        stats.sources = dict(raw["sources"])
+        return stats
+
+    def save(self, stats_path: Path = cfg.BM25_STATS_PATH, model_path: Path = cfg.BM25_PATH) -> None:
+        """Write the touched sources' files, then the totals that point at them, then drop replaced files."""
+        self.sources_dir.mkdir(parents=True, exist_ok=True)
+        for source, contrib in self._dirty.items():
+            if contrib is not None:
+                _atomic_write_json(self.sources_dir / self.sources[source], {
+                    "source": source, "n_docs": contrib["n_docs"], "sum_doc_len": contrib["sum_doc_len"],
+                    "doc_freq": _pack(contrib["doc_freq"])})
+        self._dirty.clear()
+
+        _atomic_write_json(stats_path, {
+            "b": self.b, "k1": self.k1, "tokenizer": self.tokenizer_params,
+            "n_docs": self.n_docs, "sum_doc_len": self.sum_doc_len, "doc_freq": _pack(self.doc_freq),
+            "sources": self.sources,
+        })
+        for name in self._stale_files:
+            (self.sources_dir / name).unlink(missing_ok=True)
+        self._stale_files.clear()
+        if self.n_docs:
+            params = self.to_params()
+            _atomic_write_json(model_path, params)   # what the retriever loads
+            if cfg.BM25_FORMAT == "binary":
+                write_bm25_binary(params, Path(model_path).with_suffix(".bin"))
+
+
+# ======================================================
+# Ingest helpers
+# ======================================================
+def update_bm25_stats(texts_by_source: Dict[str, List[str]]) -> BM25Encoder:
+    """Merge new chunks into the persisted stats, save, and return the updated encoder."""
+    with _lock:
+        stats = BM25Stats.load()
+        for source, texts in texts_by_source.items():
+            info = stats.add_texts(texts, source)
+            print(f"BM25 stats: +{info['source_docs']} chunks from {source} "
+                  f"(corpus now {info['corpus_docs']} chunks)")
+        stats.save()
+        return stats.encoder()
+
+
+def remove_bm25_source(source: str) -> bool:
+    """Subtract a removed document from the persisted stats."""
+    with _lock:
+        stats = BM25Stats.load()
+        removed = stats.remove_source(source)
+        if removed:
+            stats.save()
+        return removed
@@ -0,0 +1,101 @@
+"""
+Local chunk store: chunk texts live here instead of in the vector metadata
+
+Every Pinecone record used to carry the whole chunk in metadata["context"], so the text
+was paid for three times: index storage, upsert payloads, and every query response.
+Now records keep only {"chunk_id", "source"} and the text is stored locally in SQLite
+under the same sha256 chunk id, with its token count from the chunker. The retriever reads the texts of all top-k matches in
+one batched SELECT before reranking (see retriever.ChunkStoreHybridRetriever).
+
+Records written before this change still have metadata["context"]; the retriever falls
+back to it, so old and new vectors can live in the same index.
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import config as cfg
+
+
+class ChunkStore:
+    """SQLite table of chunk texts keyed by chunk id.
+
+    Every reading thread gets its own connection, so queries read concurrently with each
+    other and, in WAL mode, with an ingest writing new chunks. All writes go through one
+    shared connection under a lock: ingest writes from a new thread each time, and a
+    per-thread writer connection would stay open for the life of the process.
+    """
+
+    def __init__(self, path: str | Path = cfg.CHUNK_STORE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._conns_lock = threading.Lock()
+        self._conns: List[sqlite3.Connection] = []
+        self._writer = self._open()                       # used only under _write_lock
+        conn = self._writer
+        conn.execute("PRAGMA journal_mode=WAL")           # persistent: readers don't block the writer
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id     TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                text   TEXT NOT NULL,
+                tokens INTEGER
+            ) WITHOUT ROWID
+        """)
+        if "tokens" not in {row[1] for row in conn.execute("PRAGMA table_info(chunks)")}:
+            conn.execute("ALTER TABLE chunks ADD COLUMN tokens INTEGER")     # stores from before the column
+        conn.execute("CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source)")
+        conn.commit()
+
+    def _open(self) -> sqlite3.Connection:
+        # check_same_thread=False: the writer is shared under a lock, and close() reaches every reader
+        conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conns_lock:
+            self._conns.append(conn)
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        """This thread's read connection (opened on first use)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+    def put_many(self, rows: Iterable[Tuple[str, str, str, Optional[int]]]) -> None:
+        """rows: (chunk_id, source, text, tokens); tokens may be None."""
+        with self._write_lock:
+            conn = self._writer
+            conn.executemany("INSERT OR REPLACE INTO chunks (id, source, text, tokens) VALUES (?, ?, ?, ?)", rows)
+            conn.commit()
+
+    def get_many(self, ids: List[str]) -> Dict[str, Tuple[str, Optional[int]]]:
+        """{chunk_id: (text, tokens)} for the ids that exist, in one query."""
+        unique = list(dict.fromkeys(i for i in ids if i))
+        if not unique:
+            return {}
+        rows = self._conn().execute(
+            f"SELECT id, text, tokens FROM chunks WHERE id IN ({','.join('?' * len(unique))})", unique
+        ).fetchall()
+        return {cid: (text, tokens) for cid, text, tokens in rows}
+
+    def delete_source(self, source: str) -> int:
+        with self._write_lock:
+            conn = self._writer
+            cur = conn.execute("DELETE FROM chunks WHERE source = ?", (source,))
+            conn.commit()
+            return cur.rowcount
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def close(self) -> None:
+        with self._conns_lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns.clear()
+        self._local = threading.local()
@@ -21,6 +21,10 @@ embeddings = DeepInfraEmbeddings(
 # --- PATHS ---
 BASE_DIR = Path(__file__).resolve().parent # pointed to E:\0_AI_2025\railway\rag_082025
 BM25_PATH = BASE_DIR / "bm25_values.json"
+BM25_STATS_PATH = BASE_DIR / "bm25_stats.json"   # corpus-wide BM25 totals + source index (see bm25_stats.py)
+BM25_SOURCES_DIR = BASE_DIR / "bm25_sources"     # one file of BM25 counts per ingested source
+BM25_BIN_PATH = BASE_DIR / "bm25_values.bin"     # mmap-able BM25 model (see bm25_binary.py)
+BM25_FORMAT = os.getenv("BM25_FORMAT", "binary").lower()  # "binary" (falls back to JSON if no .bin) or "json"
 
 DATA_DIR = BASE_DIR / "sample_documents" / "PDFs"
 TMP_DIR  = BASE_DIR / "sample_documents" / "PDFs_parsed"
@@ -37,6 +41,74 @@ PINECONE_CLOUD = "aws"
 PINECONE_REGION = "us-east-1"
 PINECONE_NAMESPACE = "docs"
 
+# "pinecone" (default) or "local" -> in-process LocalHybridIndex (local_index.py), no network hop
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").lower()
+LOCAL_INDEX_DIR = Path(os.getenv("LOCAL_INDEX_DIR", BASE_DIR / "local_index"))
+
+# Reranking of the hybrid candidates (rerank.py): "cohere" (API), "local" (dense cosine + BM25 fusion, no network) or "none"
+RERANK_BACKEND = os.getenv("RERANK_BACKEND", "cohere").lower()
+RERANK_DENSE_WEIGHT = float(os.getenv("RERANK_DENSE_WEIGHT", "0.7"))     # local: weight of cosine vs BM25
+RERANK_MMR_LAMBDA = float(os.environ["RERANK_MMR_LAMBDA"]) if os.getenv("RERANK_MMR_LAMBDA") else None  # local: e.g. 0.7 -> MMR
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "1000"))          # cached (query, candidates) rankings; 0 = off
+
+# Chunk texts live in a local SQLite store (chunk_store.py); vector metadata keeps only chunk_id + source
+CHUNK_STORE_ENABLED = os.getenv("CHUNK_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+CHUNK_STORE_PATH = Path(os.getenv("CHUNK_STORE_PATH", BASE_DIR / "chunk_store.sqlite"))
+
+
+# --- AGENT TOOL EXECUTION ---
+TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", "16"))   # tool threads per process
+TOOL_MAX_QUEUED = int(os.getenv("TOOL_MAX_QUEUED", TOOL_MAX_CONCURRENCY))  # waiting calls before new ones are shed
+TOOL_TIMEOUT_S = float(os.getenv("TOOL_TIMEOUT_S", "30"))             # default per-tool timeout
+TOOL_TIMEOUTS = {                                                     # per-tool overrides
+    "build_pinecone_retriever": float(os.getenv("PINECONE_TOOL_TIMEOUT_S", TOOL_TIMEOUT_S)),
+    "fetch_facts_for_question": float(os.getenv("KG_TOOL_TIMEOUT_S", TOOL_TIMEOUT_S)),
+}
+
+# Run both retrievers on the raw query before the first LLM call (saves one LLM round trip)
+AGENT_PREFETCH = os.getenv("AGENT_PREFETCH", "false").lower() in ("1", "true", "yes")
+
+# Tool results are deduped, ordered by score and packed into this many tokens per user turn (context_pack.py)
+CONTEXT_PACKING = os.getenv("CONTEXT_PACKING", "true").lower() in ("1", "true", "yes")
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+
+# --- CONVERSATION MEMORY (memory.py) ---
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "sqlite").lower()     # "sqlite" (persistent) or "memory"
+MEMORY_PATH = Path(os.getenv("MEMORY_PATH", BASE_DIR / ".cache" / "checkpoints.sqlite"))
+MEMORY_THREAD_TTL_S = float(os.getenv("MEMORY_THREAD_TTL_S", str(7 * 24 * 3600)))  # idle threads are deleted after this; 0 = never
+MEMORY_MAX_THREADS = int(os.getenv("MEMORY_MAX_THREADS", "10000"))    # least recently used threads above this are deleted; 0 = no cap
+MEMORY_SWEEP_INTERVAL_S = float(os.getenv("MEMORY_SWEEP_INTERVAL_S", "300"))
+MEMORY_KEEP_CHECKPOINTS = int(os.getenv("MEMORY_KEEP_CHECKPOINTS", "2"))   # per thread (sqlite); 0 = keep all
+HISTORY_POLICY = os.getenv("HISTORY_POLICY", "window").lower()        # "window", "summary" or "none"
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "8"))          # user turns kept in the thread / prompt
+
+
+# --- SEMANTIC ANSWER CACHE (semantic_cache.py) ---
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))  # cosine similarity
+SEMANTIC_CACHE_MAX_SIZE = int(os.getenv("SEMANTIC_CACHE_MAX_SIZE", "1000"))
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH")   # e.g. ./cache/semantic -> persisted to disk
+
+
+# --- INGEST JOBS (jobs.py) ---
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))            # pipelines running at once
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "20"))   # queued + running before 429
+INGEST_JOBS_DIR = Path(os.getenv("INGEST_JOBS_DIR", BASE_DIR / ".cache" / "ingest_jobs"))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))   # bytes read per upload chunk
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "2"))   # marker processes for parse_folder_to_md (each loads the models)
+CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", "0"))   # >1: chunk markdown files on a process pool
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+EMBED_CACHE_PATH = Path(os.getenv("EMBED_CACHE_PATH", BASE_DIR / ".cache" / "embeddings.sqlite"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))        # chunks per embedding request
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "2"))       # embedding requests in flight
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", "4"))     # upsert requests in flight
+UPSERT_MAX_BYTES = int(os.getenv("UPSERT_MAX_BYTES", "2000000"))   # serialized bytes per upsert request
+UPSERT_MAX_VECTORS = int(os.getenv("UPSERT_MAX_VECTORS", "100"))   # vectors per upsert request
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))   # batches buffered between stages
+VECTOR_RETRIES = int(os.getenv("VECTOR_RETRIES", "3"))             # retries for embed/upsert calls
+VECTOR_BACKOFF_S = float(os.getenv("VECTOR_BACKOFF_S", "1"))
+
 
 # --- NEO4J CONFIG ---
 NEO4J_URI = os.getenv("NEO4J_URI")
@@ -44,3 +116,16 @@ NEO4J_USERNAME = os.getenv("NEO4J_USERNAME")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
 NEO4J_DATABASE = os.getenv("NEO4J_DATABASE", "neo4j")
 USE_KNOWLEDGE_GRAPH = all([NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD])
+KG_EXTRACT_WORKERS = int(os.getenv("KG_EXTRACT_WORKERS", "4"))          # concurrent LLM extraction calls
+KG_EXTRACT_RETRIES = int(os.getenv("KG_EXTRACT_RETRIES", "3"))
+KG_EXTRACT_BACKOFF_S = float(os.getenv("KG_EXTRACT_BACKOFF_S", "2"))
+KG_CACHE_DIR = Path(os.getenv("KG_CACHE_DIR", BASE_DIR / ".cache" / "kg_extract"))
+KG_WRITE_BATCH_SIZE = int(os.getenv("KG_WRITE_BATCH_SIZE", "1000"))     # rows per UNWIND statement/transaction
+NEO4J_DRIVER_CONFIG = {   # one pooled driver per process (resource_pool.get_neo4j_graph)
+    "max_connection_pool_size": int(os.getenv("NEO4J_MAX_POOL_SIZE", "50")),
+    "max_connection_lifetime": int(os.getenv("NEO4J_MAX_CONN_LIFETIME_S", "3600")),
+    "keep_alive": True,
+    "connection_timeout": float(os.getenv("NEO4J_CONNECT_TIMEOUT_S", "10")),
+    "connection_acquisition_timeout": TOOL_TIMEOUTS["fetch_facts_for_question"],
+}
+NEO4J_QUERY_TIMEOUT_S = TOOL_TIMEOUTS["fetch_facts_for_question"]   # server-side transaction timeout
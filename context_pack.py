@@ -0,0 +1,148 @@
+"""
+Token-budgeted context packing for tool results
+
+take_action used to send every tool result to the LLM as str(result): Python-repr'd
+dicts, duplicate passages, KG facts that only restate a passage — and all of it is
+re-sent on every later turn of the thread. pack_tool_results() sits between the tools
+and the ToolMessages:
+
+    1. collect passages (build_pinecone_retriever) and facts (fetch_facts_for_question)
+    2. normalize scores per tool to [0, 1] (Cohere relevance vs Lucene scores)
+    3. dedupe: identical / contained passages, repeated (subject, rel, object) facts,
+       facts whose subject and object already appear together in a kept passage
+    4. take items best-first until cfg.CONTEXT_TOKEN_BUDGET tokens (the last passage may be cut)
+    5. serialize compactly, one block per tool call
+
+The raw results stay available as ToolMessage.artifact.
+"""
+
+import re
+from typing import Any, Dict, List
+
+import config as cfg
+
+_ENCODING = None
+_WS = re.compile(r"\s+")
+MIN_PASSAGE_TOKENS = 40        # don't bother sending a passage cut shorter than this
+
+
+def count_tokens(text: str) -> int:
+    global _ENCODING
+    if _ENCODING is None:
+        import tiktoken
+        _ENCODING = tiktoken.get_encoding("cl100k_base")
+    return len(_ENCODING.encode(text, disallowed_special=()))
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    count_tokens("")                                   # make sure the encoding is loaded
+    ids = _ENCODING.encode(text, disallowed_special=())
+    return _ENCODING.decode(ids[:max_tokens]).rstrip() + " …"
+
+
+def _norm(text: str) -> str:
+    return _WS.sub(" ", str(text or "")).strip().lower()
+
+
+def _normalize_scores(items: List[Dict[str, Any]]) -> None:
+    """Min-max per tool -> item["norm"] in [0, 1] (missing scores rank last)."""
+    scores = [i["score"] for i in items if isinstance(i.get("score"), (int, float))]
+    lo, hi = (min(scores), max(scores)) if scores else (0.0, 0.0)
+    for i in items:
+        s = i.get("score")
+        if not isinstance(s, (int, float)):
+            i["norm"] = 0.0
+        elif hi > lo:
+            i["norm"] = (s - lo) / (hi - lo)
+        else:
+            i["norm"] = 1.0
+
+
+def _fact_line(f: Dict[str, Any]) -> str:
+    if f.get("rel") and f.get("object"):
+        line = f"{f['subject']} -{f['rel']}-> {f['object']}"
+    else:
+        line = str(f.get("subject"))
+    return f"{line} [{f['source']}]" if f.get("source") else line
+
+
+# ============================================
+# Packing
+# ============================================
+def pack_tool_results(tool_calls: List[Dict[str, Any]], outputs: List[Any],
+                      budget: int = cfg.CONTEXT_TOKEN_BUDGET) -> List[str]:
+    """Compact, deduped, budgeted content for each tool call (same order as tool_calls)."""
+    items: List[Dict[str, Any]] = []
+    passthrough: Dict[int, str] = {}          # errors / unexpected shapes are kept verbatim
+
+    for call_i, result in enumerate(outputs):
+        if not isinstance(result, list) or not all(isinstance(r, dict) for r in result):
+            passthrough[call_i] = str(result)
+            continue
+        tool_items = []
+        for r in result:
+            if "content" in r:
+                tool_items.append({"kind": "passage", "call": call_i, "text": str(r["content"]), "score": r.get("score"),
+                                   "tokens": r.get("tokens")})
+            elif "subject" in r and r.get("subject"):
+                tool_items.append({"kind": "fact", "call": call_i, "fact": r, "score": r.get("score")})
+        _normalize_scores(tool_items)
+        items.extend(tool_items)
+
+    # passages before facts at equal scores: a kept passage can make a fact redundant
+    items.sort(key=lambda i: (-i["norm"], i["kind"] != "passage"))
+
+    kept: Dict[int, List[str]] = {i: [] for i in range(len(outputs))}
+    kept_passages: List[str] = []              # normalized text of kept passages
+    seen_facts = set()
+    used, dropped_dup, dropped_budget = 0, 0, 0
+
+    for it in items:
+        if it["kind"] == "passage":
+            norm = _norm(it["text"])
+            if not norm or any(norm in p or p in norm for p in kept_passages):
+                dropped_dup += 1
+                continue
+            line = it["text"].strip()
+            # ingest already counted the chunk (chunk store); only other passages are tokenized here
+            cost = int(it["tokens"]) if isinstance(it["tokens"], (int, float)) else count_tokens(line)
+            if used + cost > budget:
+                room = budget - used
+                if room < MIN_PASSAGE_TOKENS:
+                    dropped_budget += 1
+                    continue
+                line, cost = _truncate(line, room - 2), room
+            kept_passages.append(norm)
+        else:
+            f = it["fact"]
+            key = (_norm(f.get("subject")), _norm(f.get("rel")), _norm(f.get("object")))
+            subj, obj = key[0], key[2]
+            covered = any(subj in p and (not obj or obj in p) for p in kept_passages)
+            if key in seen_facts or covered:
+                dropped_dup += 1
+                continue
+            seen_facts.add(key)
+            line = _fact_line(f)
+            cost = count_tokens(line)
+            if used + cost > budget:
+                dropped_budget += 1
+                continue
+        used += cost
+        kept[it["call"]].append(line)
+
+    contents = []
+    for call_i, call in enumerate(tool_calls):
+        if call_i in passthrough:
+            contents.append(passthrough[call_i])
+            continue
+        lines = kept[call_i]
+        if not lines:
+            contents.append("No results." if not outputs[call_i] else "No new results (duplicates or over the context budget).")
+        elif call["name"] == "fetch_facts_for_question":
+            contents.append("\n".join(f"- {l}" for l in lines))
+        else:
+            contents.append("\n\n".join(f"[{n}] {l}" for n, l in enumerate(lines, 1)))
+
+    print(f"Context pack: {sum(len(v) for v in kept.values())} items, {used}/{budget} tokens "
+          f"(dropped {dropped_dup} duplicates, {dropped_budget} over budget)")
+    return contents
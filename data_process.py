@@ -1,27 +1,87 @@
 # data_process.py
 # 1. marker_parse (helper to parse_folder_to_md)
-# 2. parse_single_pdf_to_md/parse_folder_to_md
-# 3. load_markdown_to_documents
-# 4. chunk_documents
+# 2. parse_single_pdf_to_md/parse_folder_to_md (cached by PDF hash + parser version)
+# 3. load_markdown_to_documents / iter_markdown_documents (lazy)
+# 4. chunk_documents / iter_chunks / iter_markdown_chunks (generators, optional process pool)
 
 ##############################
 # Using Marker
 ##############################
-# from marker.converters.pdf import PdfConverter
-# from marker.models import create_model_dict
-# from marker.output import text_from_rendered
-from typing import List, Dict, Optional
+# marker-pdf is optional (heavy: torch + models). It is imported on first use, and the
+# converter (all models) is built ONCE per process, not per PDF.
+import hashlib
+import os
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from typing import List, Dict, Optional, Iterable, Iterator
 from pathlib import Path
 
-###################################################################################
-# initialize once (uncomment for marker enabled)
-# _PDF_CONVERTER = PdfConverter(artifact_dict=create_model_dict())
+import config as cfg
+
+_PDF_CONVERTER = None
+
+PARSE_CACHE_SUBDIR = ".parse_cache"
+_PARSE_CACHE_FORMAT = 1   # bump when marker_parse output handling changes
+
+
+def _get_converter():
+    global _PDF_CONVERTER
+    if _PDF_CONVERTER is None:
+        from marker.converters.pdf import PdfConverter
+        from marker.models import create_model_dict
+        _PDF_CONVERTER = PdfConverter(artifact_dict=create_model_dict())
+    return _PDF_CONVERTER
+
+
+def parser_version() -> str:
+    """Part of the parse cache key: a new marker release (or output format) re-parses."""
+    try:
+        from importlib.metadata import version
+        marker = version("marker-pdf")
+    except Exception:
+        marker = "unknown"
+    return f"marker-{marker}.f{_PARSE_CACHE_FORMAT}"
+
 
 # helper 
 def marker_parse(pdf_path: str) -> str:
-    rendered = _PDF_CONVERTER(pdf_path)
+    from marker.output import text_from_rendered
+    rendered = _get_converter()(pdf_path)
     md, meta, images = text_from_rendered(rendered)
     return md
+
+# ============================================
+# Parse cache (TMP_DIR/.parse_cache/<sha256 of pdf>-<parser version>.md)
+# ============================================
+def file_sha256(path: str | Path, block: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for b in iter(lambda: f.read(block), b""):
+            h.update(b)
+    return h.hexdigest()
+
+
+def _cache_path(cache_dir: Path, digest: str, version: str) -> Path:
+    return cache_dir / f"{digest}-{version}.md"
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def _publish(pdf_p: Path, cached: Path, out_dir: Path) -> Dict[str, str]:
+    """Copy the cached markdown to out_dir/<stem>.md (the path the rest of the pipeline reads)."""
+    md_p = out_dir / f"{pdf_p.stem}.md"
+    shutil.copyfile(cached, md_p)
+    return {"source_pdf": str(pdf_p), "markdown_path": str(md_p)}
+
 ####################################################################################    
 def parse_single_pdf_to_md(pdf_path: str | Path, #  must be either a string (str) or a pathlib.Path object pointing to the PDF file to process.
                            out_dir: str | Path) -> [Dict[str, str]]:
@@ -30,30 +90,92 @@ def parse_single_pdf_to_md(pdf_path: str | Path, #  must be either a string (str
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    md = marker_parse(str(pdf_p))
+    # Same PDF bytes + same parser version -> reuse the earlier markdown
+    cached = _cache_path(out_dir / PARSE_CACHE_SUBDIR, file_sha256(pdf_p), parser_version())
+    if not cached.exists():
+        _write_atomic(cached, marker_parse(str(pdf_p)))
 
-    md_p = out_dir / f"{pdf_p.stem}.md"
-    md_p.write_text(md, encoding="utf-8")
-    
-    return [{"source_pdf": str(pdf_p),
-             "markdown_path": str(md_p)}]
+    return [_publish(pdf_p, cached, out_dir)]
+
+# ============================================
+# Folder / batch parsing on a process pool
+# ============================================
+def _init_parse_worker():
+    _get_converter()          # load marker models once per worker process
+
+
+def _parse_worker(pdf_path: str) -> str:
+    return marker_parse(pdf_path)
+
+
+def parse_folder_to_md(pdfs: str | Path | Iterable[str | Path],
+                       out_dir: str | Path = cfg.TMP_DIR,
+                       max_workers: int = cfg.PARSE_WORKERS) -> List[Dict[str, str]]:
+    """Parse a folder (or list) of PDFs to markdown in out_dir, in parallel.
+
+    PDFs whose (content hash, parser version) is already in the parse cache are not parsed
+    again. The rest are spread over `max_workers` processes, each loading marker once.
+    Raises RuntimeError at the end if some PDFs failed; the successful ones are cached.
+    """
+    if isinstance(pdfs, (str, Path)) and Path(pdfs).is_dir():
+        pdf_paths = sorted(Path(pdfs).glob("*.pdf"))
+    elif isinstance(pdfs, (str, Path)):
+        pdf_paths = [Path(pdfs)]
+    else:
+        pdf_paths = [Path(p) for p in pdfs]
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cache_dir = out_dir / PARSE_CACHE_SUBDIR
+    version = parser_version()
+
+    cached: Dict[Path, Path] = {}
+    todo: Dict[Path, Path] = {}
+    for pdf_p in pdf_paths:
+        c = _cache_path(cache_dir, file_sha256(pdf_p), version)
+        (cached if c.exists() else todo)[pdf_p] = c
+    print(f"Parsing {len(pdf_paths)} PDFs: {len(cached)} cached, {len(todo)} to parse on {max_workers} workers")
+
+    errors: Dict[str, str] = {}
+    if todo:
+        # spawn: marker/torch state must not be forked
+        with ProcessPoolExecutor(max_workers=max(1, min(max_workers, len(todo))),
+                                 mp_context=get_context("spawn"),
+                                 initializer=_init_parse_worker) as ex:
+            futures = {ex.submit(_parse_worker, str(p)): p for p in todo}
+            for fut in as_completed(futures):
+                pdf_p = futures[fut]
+                try:
+                    _write_atomic(todo[pdf_p], fut.result())
+                    cached[pdf_p] = todo[pdf_p]
+                    print(f"Parsed {pdf_p.name}")
+                except Exception as e:
+                    errors[str(pdf_p)] = str(e)
+                    print(f"Failed to parse {pdf_p.name}: {e}")
+
+    if errors:
+        raise RuntimeError(f"{len(errors)}/{len(pdf_paths)} PDFs failed to parse "
+                           f"(parsed ones are cached; rerun to retry): {errors}")
+    return [_publish(p, cached[p], out_dir) for p in pdf_paths]
 
 ###################################################################################
 # ============================================
 # Build Documents 
 # ============================================
 from langchain_core.documents import Document
-def load_markdown_to_documents(parsed_data: List[Dict[str, str]]) -> List[Document]:
-    """Loads parsed Markdown files into LangChain Document objects."""
-    docs = []
+def iter_markdown_documents(parsed_data: Iterable[Dict[str, str]]) -> Iterator[Document]:
+    """Yield one Document per parsed markdown file, reading each file only when it is needed."""
     for item in parsed_data:
         with open(item["markdown_path"], "r", encoding="utf-8") as f:
             text = f.read()
-        docs.append(Document(
+        yield Document(
             page_content=text,
             metadata={"source": item["source_pdf"], "md": item["markdown_path"]}
-        ))
-    return docs
+        )
+
+
+def load_markdown_to_documents(parsed_data: List[Dict[str, str]]) -> List[Document]:
+    """Loads parsed Markdown files into LangChain Document objects."""
+    return list(iter_markdown_documents(parsed_data))
 
 ###################################################################################
 # ============================================
@@ -62,34 +184,101 @@ def load_markdown_to_documents(parsed_data: List[Dict[str, str]]) -> List[Docume
 import tiktoken
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
-from typing import List
+from typing import List, Iterator
+
+# Built once per process (tiktoken encoding + splitter), not per call
+_ENCODING = None
+_SPLITTER = None
+
+
+def _get_encoding():
+    global _ENCODING
+    if _ENCODING is None:
+        _ENCODING = tiktoken.get_encoding("cl100k_base")
+    return _ENCODING
+
+
+def _get_splitter() -> RecursiveCharacterTextSplitter:
+    global _SPLITTER
+    if _SPLITTER is None:
+        _SPLITTER = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            encoding_name=_get_encoding().name,
+            chunk_size=400,
+            chunk_overlap=0,
+            separators=[
+                "\n```",    # Fenced code blocks
+                "\n# ",     # H1
+                "\n## ",    # H2
+                "\n### ",   # H3
+                "\n#### ",  # H4
+                "\n\n",     # Paragraphs
+                "\n- ", "\n* ", "\n1. ", # Lists
+                "\n|",      # Table rows
+                "\n",       # Line breaks
+                ". ",       # Sentences
+                " ", ""
+            ],
+        )
+    return _SPLITTER
+
+
+def _split_document(doc: Document) -> List[Document]:
+    """Split one Document; every chunk gets metadata["tokens"] (kept in the chunk store, so context
+    packing counts a retrieved passage without re-tokenizing it)."""
+    enc = _get_encoding()
+    chunks = _get_splitter().split_documents([doc])
+    for c in chunks:
+        c.metadata["tokens"] = len(enc.encode(c.page_content, disallowed_special=()))
+    return chunks
+
+
+def _chunk_markdown_item(item: Dict[str, str]) -> List[Document]:
+    # process-pool worker: reads and splits one markdown file (only the path is pickled in)
+    return [c for doc in iter_markdown_documents([item]) for c in _split_document(doc)]
+
+
+def iter_chunks(docs: Iterable[Document]) -> Iterator[Document]:
+    """Yield chunks document by document (only one document's text in memory at a time)."""
+    for doc in docs:
+        yield from _split_document(doc)
+
+
+def iter_markdown_chunks(parsed_data: Iterable[Dict[str, str]],
+                         max_workers: int = cfg.CHUNK_WORKERS) -> Iterator[Document]:
+    """Read + chunk parsed markdown files lazily, in order.
+
+    max_workers > 1 spreads files over a process pool (each worker keeps its own tokenizer).
+    At most 2 * max_workers files are in flight: the next one is submitted only as the
+    oldest is consumed, so a slow consumer doesn't pile chunked files up in memory.
+    """
+    if max_workers <= 1:
+        yield from iter_chunks(iter_markdown_documents(parsed_data))
+        return
+    window = 2 * max_workers
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=get_context("spawn")) as ex:
+        try:
+            for item in parsed_data:
+                pending.append(ex.submit(_chunk_markdown_item, item))
+                if len(pending) >= window:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            for fut in pending:                      # consumer stopped early: drop queued files
+                fut.cancel()
+
 
 def chunk_documents(docs: List[Document]) -> List[Document]:
     """Splits a list of Documents into smaller chunks."""
-    encoding = tiktoken.get_encoding("cl100k_base")
-
-    splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-        encoding_name=encoding.name,
-        chunk_size=400,
-        chunk_overlap=0,
-        separators=[
-            "\n```",    # Fenced code blocks
-            "\n# ",     # H1
-            "\n## ",    # H2
-            "\n### ",   # H3
-            "\n#### ",  # H4
-            "\n\n",     # Paragraphs
-            "\n- ", "\n* ", "\n1. ", # Lists
-            "\n|",      # Table rows
-            "\n",       # Line breaks
-            ". ",       # Sentences
-            " ", ""
-        ],
-    )
-    
-    chunks = splitter.split_documents(docs)
+    chunks = list(iter_chunks(docs))
     print(f"Split {len(docs)} documents into {len(chunks)} chunks.")
     return chunks
 
-
-
+if __name__ == "__main__":
+    # Bulk-parse a backlog:  python data_process.py <pdf folder> [out_dir]
+    import sys
+    src = sys.argv[1] if len(sys.argv) > 1 else str(cfg.DATA_DIR)
+    dst = sys.argv[2] if len(sys.argv) > 2 else str(cfg.TMP_DIR)
+    parsed = parse_folder_to_md(src, dst)
+    print(f"{len(parsed)} markdown files in {dst}")
@@ -0,0 +1,121 @@
+"""
+Persistent, content-addressed embedding cache for ingest
+
+create_and_upsert_vectors sent every chunk to the remote embedding model on every
+ingest, even chunks it had embedded before. CachedEmbeddings wraps the LangChain
+Embeddings object and keeps float32 vectors in SQLite keyed by
+
+    (sha256(chunk text), embedding model id)
+
+so re-ingesting a document — or a slightly edited one — only embeds chunks whose text
+changed. Hits and misses are kept in the same input order; misses go out in one
+embed_documents call.
+"""
+
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import config as cfg
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def embedding_model_id(embeddings) -> str:
+    """Stable id of the embedding model (a different model or normalization -> different vectors)."""
+    name = (getattr(embeddings, "model_id", None) or getattr(embeddings, "model", None)
+            or getattr(embeddings, "model_name", None) or type(embeddings).__name__)
+    normalize = getattr(embeddings, "normalize", None)
+    return f"{name}|normalize={normalize}" if normalize is not None else str(name)
+
+
+class EmbeddingCache:
+    """SQLite store of float32 vectors keyed by (content hash, model id)."""
+
+    def __init__(self, path: str | Path = cfg.EMBED_CACHE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                hash  TEXT NOT NULL,
+                model TEXT NOT NULL,
+                dim   INTEGER NOT NULL,
+                vec   BLOB NOT NULL,
+                PRIMARY KEY (hash, model)
+            ) WITHOUT ROWID
+        """)
+        self._conn.commit()
+
+    def get_many(self, hashes: List[str], model: str) -> Dict[str, List[float]]:
+        out: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            for i in range(0, len(unique), 500):          # stay under SQLite's variable limit
+                part = unique[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT hash, vec FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(part))})",
+                    [model, *part],
+                ).fetchall()
+                for h, blob in rows:
+                    out[h] = np.frombuffer(blob, dtype="<f4").tolist()
+        return out
+
+    def put_many(self, items: Dict[str, List[float]], model: str) -> None:
+        rows = [(h, model, len(v), np.asarray(v, dtype="<f4").tobytes()) for h, v in items.items()]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (hash, model, dim, vec) VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def count(self, model: Optional[str] = None) -> int:
+        with self._lock:
+            if model is None:
+                return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings WHERE model = ?", (model,)).fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings:
+    """embed_documents() through the cache; everything else is delegated to the wrapped model."""
+
+    def __init__(self, embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = embedding_model_id(embeddings)
+        self.last_stats = {"hits": 0, "misses": 0}
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [content_hash(t) for t in texts]
+        found = self.cache.get_many(hashes, self.model)
+
+        missing: Dict[str, str] = {}                      # hash -> text, deduped
+        for h, t in zip(hashes, texts):
+            if h not in found:
+                missing.setdefault(h, t)
+        if missing:
+            vecs = self.embeddings.embed_documents(list(missing.values()))
+            new = dict(zip(missing.keys(), vecs))
+            self.cache.put_many(new, self.model)
+            found.update(new)
+
+        self.last_stats = {"hits": len(texts) - sum(1 for h in hashes if h in missing), "misses": len(missing)}
+        print(f"Embedding cache: {self.last_stats['hits']} hits, {self.last_stats['misses']} embedded")
+        return [found[h] for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def __getattr__(self, name):
+        return getattr(self.embeddings, name)
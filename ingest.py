@@ -11,10 +11,10 @@
 # api/main.py (FastAPI) → glue: call producer → pass chunks to consumer → return counts
 
 from pinecone import Pinecone, ServerlessSpec
-from pinecone_text.sparse import BM25Encoder
+from bm25_stats import update_bm25_stats
+from resource_pool import pool
 import config
-import hashlib
-from tqdm import tqdm
+from vector_pipeline import upsert_chunks_pipelined
 from typing import List
 from langchain_core.documents import Document
 from config import PINECONE_API_KEY, PINECONE_INDEX_NAME, PINECONE_CLOUD, PINECONE_REGION, embeddings
@@ -24,7 +24,10 @@ from config import PINECONE_API_KEY, PINECONE_INDEX_NAME, PINECONE_CLOUD, PINECO
 
 # import to fast api
 def get_pinecone_index():
-    """Initializes and returns a Pinecone index."""
+    """Initializes and returns a Pinecone index (or the local index when VECTOR_BACKEND=local)."""
+    if config.VECTOR_BACKEND == "local":
+        return pool.get_pinecone_index()   # share the same in-process store the retriever reads
+
     pc = Pinecone(api_key=config.PINECONE_API_KEY)
     existing_indexes = [ix["name"] for ix in pc.list_indexes()]
     
@@ -40,38 +43,29 @@ def get_pinecone_index():
 
 
 # import to fast api
-def create_and_upsert_vectors(index, chunks: List[Document]):
+def create_and_upsert_vectors(index, chunks: List[Document], namespace: str = None):
     """Creates dense and sparse vectors and upserts them to Pinecone."""
-
-    texts = [d.page_content for d in chunks]
-    dense_vecs = embeddings.embed_documents(texts)
-    print("Dense embeddings created...")   
-
-    bm25 = BM25Encoder()
-    bm25.fit(texts)
-    bm25.dump(str(config.BM25_PATH)) # Save for later use
-    sparse_vecs = bm25.encode_documents(texts)
-    print("BM25 encoder created...")
-
-    # Prepare vectors for upsert
-    to_upsert = []
-    for doc, dense, sparse in zip(chunks, dense_vecs, sparse_vecs):
-        doc_id = hashlib.sha256(f"{doc.metadata.get('source', '')}|{doc.page_content}".encode("utf-8")).hexdigest()[:32]
-        metadata = {**doc.metadata, "context": doc.page_content}
-        to_upsert.append({
-            "id": doc_id,
-            "values": dense,
-            "sparse_values": sparse,
-            "metadata": metadata,
-        })
-    
-    # Batch upsert to Pinecone
-    print(f"Upserting {len(to_upsert)} vectors to Pinecone...")
-    batch_size = 32
-    for i in tqdm(range(0, len(to_upsert), batch_size)):
-        batch = to_upsert[i:i+batch_size]
-        index.upsert(vectors=batch, namespace=config.PINECONE_NAMESPACE)
+    namespace = namespace or config.PINECONE_NAMESPACE
+
+    # Merge only the new chunks into the corpus-wide BM25 stats (also rewrites BM25_PATH)
+    texts_by_source = {}
+    for d in chunks:
+        texts_by_source.setdefault(d.metadata.get("source", ""), []).append(d.page_content)
+    bm25 = update_bm25_stats(texts_by_source)
+    print("BM25 encoder updated...")
+
+    # Embed -> BM25 encode -> upsert as overlapping stages with bounded queues (see vector_pipeline.py).
+    # Chunks embedded before (same text + model) come from the local cache, only new ones hit the API.
+    print(f"Upserting {len(chunks)} vectors to Pinecone...")
+    report = upsert_chunks_pipelined(
+        index, chunks,
+        embedder=pool.get_document_embeddings(),
+        bm25=bm25,
+        namespace=namespace,
+        chunk_store=pool.get_chunk_store(),   # texts stored locally; vectors carry only chunk_id + source
+    )
     print("Upsert complete.")
+    return report
 
 ################################################################################################
 from langchain_neo4j import Neo4jGraph
@@ -83,29 +77,89 @@ from typing import List, Optional, Dict, Any
 from langchain_core.documents import Document
 from langchain_neo4j import Neo4jGraph
 from langchain_experimental.graph_transformers import LLMGraphTransformer
+from kg_extract import extract_graph_documents
+from graph_writer import BASE_ENTITY_LABEL, ensure_graph_schema, write_graph_documents
+
+
+# Helper
+def _fulltext_coverage(graph: Neo4jGraph, index_name: str) -> Optional[Dict[str, Any]]:
+    """Labels/properties the fulltext index already covers (None if it doesn't exist)."""
+    rows = graph.query(
+        "SHOW INDEXES YIELD name, type, labelsOrTypes, properties, state "
+        "WHERE name = $n RETURN labelsOrTypes, properties, state",
+        params={"n": index_name},
+    )
+    if not rows:
+        return None
+    return {"labels": set(rows[0]["labelsOrTypes"] or []), "props": list(rows[0]["properties"] or []),
+            "state": rows[0]["state"]}
+
+
+def _labels_from_graph_documents(graph_documents, base_entity_label: Optional[str],
+                                 include_source: bool) -> List[set]:
+    """Label set of every node the new graph documents write (no database scan)."""
+    labelsets = []
+    for gd in graph_documents:
+        for node in gd.nodes:
+            labelsets.append({node.type, base_entity_label} - {None})
+    if include_source and graph_documents:
+        labelsets.append({"Document"})
+    return labelsets
 
 
 # Helper
 def ensure_fulltext_auto(graph: Neo4jGraph,
                          index_name: str = "entity_fulltext",
-                         props = ("name","id","title","value","md","description")) -> Dict[str, Any]:
-    rows = graph.query("""
-    WITH $props AS props
-    UNWIND props AS p
-    MATCH (n)
-    WHERE n[p] IS NOT NULL
-    WITH collect(DISTINCT labels(n)) AS labelsets
-    UNWIND labelsets AS ls
-    UNWIND ls AS label
-    RETURN DISTINCT label
-    ORDER BY label
-    """, params={"props": list(props)})
-
-    labels = [r["label"] for r in rows]
+                         props = ("name","id","title","value","md","description"),
+                         graph_documents = None,
+                         base_entity_label: Optional[str] = BASE_ENTITY_LABEL,
+                         include_source: bool = True) -> Dict[str, Any]:
+    """Make sure the fulltext index covers the nodes just written.
+
+    With `graph_documents`, only the labels of those nodes are checked against the labels the
+    index already covers (SHOW INDEXES); the index is dropped and recreated only if some new
+    node carries no covered label. A node with the base entity label is covered once that
+    label is, so new entity types don't trigger rebuilds.
+    Without `graph_documents`, falls back to scanning every node for labels (full rebuild).
+    """
+    if graph_documents is None:
+        rows = graph.query("""
+        WITH $props AS props
+        UNWIND props AS p
+        MATCH (n)
+        WHERE n[p] IS NOT NULL
+        WITH collect(DISTINCT labels(n)) AS labelsets
+        UNWIND labelsets AS ls
+        UNWIND ls AS label
+        RETURN DISTINCT label
+        ORDER BY label
+        """, params={"props": list(props)})
+        labels = [r["label"] for r in rows]
+        if not labels:
+            return {"index": index_name, "labels": [], "props": list(props), "note": "No labels had target props"}
+        return _create_fulltext(graph, index_name, labels, props)
+
+    current = _fulltext_coverage(graph, index_name)
+    covered = current["labels"] if current else set()
+    props_ok = current is not None and set(props) <= set(current["props"])
+    # a FAILED index covers its labels on paper but serves no queries: recreate it
+    usable = current is not None and current["state"] in ("ONLINE", "POPULATING")
+
+    uncovered = [ls for ls in _labels_from_graph_documents(graph_documents, base_entity_label, include_source)
+                 if not (ls & covered)]
+    if usable and props_ok and not uncovered:
+        return {"index": index_name, "labels": sorted(covered), "props": current["props"], "rebuilt": False}
+
+    # Grow the index: keep what it covers, add one label per uncovered node (prefer the base label)
+    new_labels = {base_entity_label if base_entity_label in ls else sorted(ls)[0] for ls in uncovered}
+    labels = sorted(covered | new_labels)
     if not labels:
         return {"index": index_name, "labels": [], "props": list(props), "note": "No labels had target props"}
+    return _create_fulltext(graph, index_name, labels, props)
 
-    # Recreate to ensure coverage of all detected labels
+
+def _create_fulltext(graph: Neo4jGraph, index_name: str, labels, props) -> Dict[str, Any]:
+    # Recreate to ensure coverage of all labels
     graph.query(f"DROP INDEX {index_name} IF EXISTS;")
     label_union = "|".join(f"`{l}`" for l in labels)
     prop_list   = ",".join(f"n.{p}" for p in props)
@@ -114,7 +168,7 @@ def ensure_fulltext_auto(graph: Neo4jGraph,
     FOR (n:{label_union})
     ON EACH [{prop_list}];
     """)
-    return {"index": index_name, "labels": labels, "props": list(props)}
+    return {"index": index_name, "labels": list(labels), "props": list(props), "rebuilt": True}
 
 
 # import to fast api
@@ -130,37 +184,31 @@ def upsert_knowledge_graph_from_chunks(
     if not all(os.getenv(k) for k in required):
         return {"enabled": False, "reason": "NEO4J_* env vars not set"}
 
-    graph = Neo4jGraph(
-        url=os.environ["NEO4J_URI"],
-        username=os.environ["NEO4J_USERNAME"],
-        password=os.environ["NEO4J_PASSWORD"],
-        database=os.environ.get("NEO4J_DATABASE", "neo4j"),
-        refresh_schema=False,
-    )
+    graph = pool.get_neo4j_graph()   # shared pooled driver (same one the KG tool uses)
 
-    # Minimal constraint so MERGE behaves like upsert
-    graph.query("CREATE CONSTRAINT IF NOT EXISTS FOR (e:Entity) REQUIRE e.id IS UNIQUE;")
+    # Constraint/index so the bulk MERGEs are index lookups
+    ensure_graph_schema(graph)
 
+    # One LLM call per chunk -> bounded concurrency + retries, cached on disk per (model, chunk text)
     transformer = LLMGraphTransformer(llm=llm)
-    graph_documents = transformer.convert_to_graph_documents(chunks)
+    graph_documents, extract_report = extract_graph_documents(transformer, chunks, llm=llm)
 
-    # Store with explicit source metadata and a base label
-    graph.add_graph_documents(
-        graph_documents,
+    # Store with explicit source metadata and the base entity label, in batched UNWIND transactions
+    write_report = write_graph_documents(pool.get_neo4j_driver(), graph_documents, include_source=True)
+
+    # Only the labels of the new graph documents are checked; rebuild only if the index must grow
+    ft = ensure_fulltext_auto(
+        graph,
+        index_name=fulltext_index_name,
+        graph_documents=graph_documents,
+        base_entity_label=BASE_ENTITY_LABEL if base_entity_label else None,
         include_source=True,
-        baseEntityLabel=base_entity_label
     )
+    if ft.get("rebuilt"):
+        pool.mark_fulltext_stale(fulltext_index_name)   # KG tool re-checks ONLINE on its next call
 
-    ft = ensure_fulltext_auto(graph, index_name=fulltext_index_name)
-
-    # best-effort counts (GraphDocument has nodes/relationships)
-    try:
-        node_count = sum(len(gd.nodes) for gd in graph_documents)
-        rel_count  = sum(len(gd.relationships) for gd in graph_documents)
-    except Exception:
-        node_count = rel_count = None
-
-    return {"enabled": True, "nodes": node_count, "rels": rel_count, **ft}
+    return {"enabled": True, "nodes": write_report["nodes"], "rels": write_report["rels"],
+            "extraction": extract_report, "write": write_report, **ft}
 
 
 
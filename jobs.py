@@ -0,0 +1,261 @@
+"""
+Background ingest jobs
+
+POST /ingest used to run the whole pipeline inside the request (marker parse, chunking,
+embeddings, BM25, Pinecone upsert, LLM graph extraction), so large PDFs hit HTTP timeouts
+and held an API worker for minutes. Now the request only saves the upload and queues a job:
+
+    save -> parse -> chunk -> vectors -> graph
+
+- a bounded thread pool (cfg.INGEST_WORKERS) runs the stages; cfg.INGEST_MAX_PENDING caps
+  queued + running jobs (submit raises QueueFull -> HTTP 429)
+- every job is a JSON file in cfg.INGEST_JOBS_DIR with per-stage status / timings / details,
+  rewritten after each stage, so GET /ingest/jobs/{id} can be polled
+- stage outputs needed later (parsed files, chunks) are persisted next to it, so a failed
+  job resumes from the first stage that did not finish (resume())
+- jobs that were created/queued/running when the process stopped are marked failed on
+  startup and can be resumed the same way
+- find_or_create() dedupes byte-identical uploads and registers the new job under one lock,
+  so two concurrent uploads of the same PDF share a job
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import uuid4
+
+from langchain_core.documents import Document
+
+import config as cfg
+
+STAGES = ["save", "parse", "chunk", "vectors", "graph"]
+
+
+class QueueFull(Exception):
+    """Too many ingest jobs queued or running."""
+
+
+class JobNotFound(KeyError):
+    pass
+
+
+def _now() -> float:
+    return round(time.time(), 3)
+
+
+def _atomic_write_json(path: Path, obj) -> None:
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, default=str)
+    os.replace(tmp, path)
+
+
+# ============================================
+# Job manager
+# ============================================
+class IngestJobManager:
+    """Queue + bounded worker pool for the ingest pipeline, with job state persisted on disk."""
+
+    def __init__(self, run_stage: Callable[[str, Dict[str, Any], Path], Dict[str, Any]],
+                 jobs_dir: Path = cfg.INGEST_JOBS_DIR, max_workers: int = cfg.INGEST_WORKERS,
+                 max_pending: int = cfg.INGEST_MAX_PENDING):
+        self.run_stage = run_stage            # (stage, job, job_dir) -> details dict for that stage
+        self.jobs_dir = Path(jobs_dir)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="ingest")
+        self._lock = threading.RLock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def job_dir(self, job_id: str) -> Path:
+        return self.jobs_dir / job_id
+
+    def _save(self, job: Dict[str, Any]) -> None:
+        job["updated"] = _now()
+        d = self.job_dir(job["id"])
+        d.mkdir(parents=True, exist_ok=True)
+        _atomic_write_json(d / "job.json", job)
+
+    def _load(self) -> None:
+        for path in self.jobs_dir.glob("*/job.json"):
+            try:
+                job = json.loads(path.read_text(encoding="utf-8"))
+            except Exception as e:
+                print(f"Ingest jobs: skipping unreadable {path} ({e})")
+                continue
+            if job["status"] in ("created", "queued", "running"):
+                # the process stopped mid-job; the finished stages are kept for resume()
+                job["status"] = "failed"
+                job["error"] = "interrupted (server restarted)"
+                for st in job["stages"].values():
+                    if st["status"] == "running":
+                        st["status"] = "failed"
+                self._save(job)
+            self._jobs[job["id"]] = job
+
+    # ------------------------------------------------------------------
+    # Submit / resume / status
+    # ------------------------------------------------------------------
+    def _pending(self) -> int:
+        return sum(1 for j in self._jobs.values() if j["status"] in ("queued", "running"))
+
+    def create(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Register a job (status "created"); the caller records the saved upload (complete_stage), then submit()."""
+        with self._lock:
+            if self._pending() >= self.max_pending:
+                raise QueueFull(f"{self.max_pending} ingest jobs already queued or running")
+            job_id = uuid4().hex
+            job = {"id": job_id, "status": "created", "params": params, "error": None, "result": None,
+                   "created": _now(), "updated": _now(),
+                   "stages": {s: {"status": "pending", "started": None, "seconds": None, "details": {}}
+                              for s in STAGES}}
+            self._jobs[job_id] = job
+            self._save(job)
+            return self.status(job_id)
+
+    def complete_stage(self, job_id: str, stage: str, seconds: float, details: Dict[str, Any]) -> None:
+        """Record a stage that ran outside the worker (the upload save runs in the request)."""
+        with self._lock:
+            job = self._get(job_id)
+            job["stages"][stage].update(status="done", started=_now() - seconds,
+                                        seconds=round(seconds, 3), details=details)
+            self._save(job)
+
+    def submit(self, job_id: str) -> Dict[str, Any]:
+        with self._lock:
+            job = self._get(job_id)
+            job["status"], job["error"] = "queued", None
+            self._save(job)
+        self._executor.submit(self._run, job_id)
+        return self.status(job_id)
+
+    def resume(self, job_id: str) -> Dict[str, Any]:
+        """Re-queue a failed job; it restarts at its first stage that is not done."""
+        with self._lock:
+            job = self._get(job_id)
+            if job["status"] != "failed":
+                raise ValueError(f"job {job_id} is {job['status']}; only failed jobs can be resumed")
+            if self._pending() >= self.max_pending:
+                raise QueueFull(f"{self.max_pending} ingest jobs already queued or running")
+        return self.submit(job_id)
+
+    def fail(self, job_id: str, error: str) -> None:
+        with self._lock:
+            job = self._get(job_id)
+            job["status"], job["error"] = "failed", error
+            self._save(job)
+
+    def find_by_content(self, sha256: str, namespace: str, enable_graph: bool) -> Optional[Dict[str, Any]]:
+        """Earlier job for byte-identical content in the same namespace (done > in flight > failed)."""
+        rank = {"done": 0, "created": 1, "queued": 1, "running": 1, "failed": 2}
+        with self._lock:
+            matches = [j for j in self._jobs.values()
+                       if j["params"].get("sha256") == sha256 and j["params"]["namespace"] == namespace
+                       and (j["params"]["enable_graph"] or not enable_graph)   # a graph-less run can't stand in
+                       and j["status"] in rank
+                       and (j["status"] == "created" or j["stages"]["save"]["status"] == "done")]
+            if not matches:
+                return None
+            best = min(matches, key=lambda j: (rank[j["status"]], -j["created"]))
+            return self.status(best["id"])
+
+    def find_or_create(self, params: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """(earlier job for the same content, False) or (new "created" job, True), atomically."""
+        with self._lock:
+            earlier = self.find_by_content(params["sha256"], params["namespace"], params["enable_graph"])
+            if earlier is not None:
+                return earlier, False
+            return self.create(params), True
+
+    def _get(self, job_id: str) -> Dict[str, Any]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise JobNotFound(job_id)
+        return job
+
+    def status(self, job_id: str) -> Dict[str, Any]:
+        with self._lock:
+            job = json.loads(json.dumps(self._get(job_id), default=str))   # snapshot
+        done = sum(1 for st in job["stages"].values() if st["status"] in ("done", "skipped"))
+        job["progress"] = f"{done}/{len(STAGES)}"
+        job["current_stage"] = next((s for s in STAGES if job["stages"][s]["status"] == "running"), None)
+        return job
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            ids = sorted(self._jobs, key=lambda i: self._jobs[i]["created"], reverse=True)[:limit]
+        return [self.status(i) for i in ids]
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+    def _run(self, job_id: str) -> None:
+        with self._lock:
+            job = self._get(job_id)
+            job["status"] = "running"
+            self._save(job)
+
+        for stage in STAGES:
+            with self._lock:
+                st = job["stages"][stage]
+                if st["status"] in ("done", "skipped"):
+                    continue                                  # finished in an earlier attempt
+                st.update(status="running", started=_now(), seconds=None, details={})
+                self._save(job)
+
+            t0 = time.perf_counter()
+            try:
+                details = self.run_stage(stage, job, self.job_dir(job_id)) or {}
+            except Exception as e:
+                print(f"Ingest job {job_id}: stage {stage} failed: {e}")
+                with self._lock:
+                    st.update(status="failed", seconds=round(time.perf_counter() - t0, 3),
+                              details={"traceback": traceback.format_exc(limit=5)})
+                    job["status"], job["error"] = "failed", f"{stage}: {e}"
+                    self._save(job)
+                return
+
+            with self._lock:
+                st.update(status="skipped" if details.pop("skipped", False) else "done",
+                          seconds=round(time.perf_counter() - t0, 3), details=details)
+                self._save(job)
+
+        with self._lock:
+            job["status"] = "done"
+            job["result"] = {s: job["stages"][s]["details"] for s in STAGES}
+            self._save(job)
+        print(f"Ingest job {job_id} done in "
+              f"{sum(job['stages'][s]['seconds'] or 0 for s in STAGES):.1f}s")
+
+
+# ============================================
+# Stage artifacts (what resume needs from earlier stages)
+# ============================================
+def save_chunks(chunks: Iterable[Document], path: Path) -> int:
+    """Write chunks as JSONL while they are produced (works with a generator); returns the count."""
+    n = 0
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        for c in chunks:
+            f.write(json.dumps({"page_content": c.page_content, "metadata": c.metadata}, ensure_ascii=False) + "\n")
+            n += 1
+    os.replace(tmp, path)
+    return n
+
+
+def load_chunks(path: Path) -> List[Document]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [Document(**json.loads(line)) for line in f if line.strip()]
@@ -0,0 +1,150 @@
+"""
+Concurrent, cached LLM graph extraction for knowledge-graph ingest
+
+LLMGraphTransformer.convert_to_graph_documents(chunks) makes one LLM call per chunk,
+one after another. extract_graph_documents() runs them on a bounded thread pool with
+retry + exponential backoff, and caches every successful result on disk keyed by
+sha256(model name + chunk text). Re-ingesting a PDF, or retrying one that failed
+halfway, only pays for the chunks that were never extracted.
+
+Cache layout: cfg.KG_CACHE_DIR/<key[:2]>/<key>.json  ({"nodes": [...], "relationships": [...]})
+"""
+
+import hashlib
+import json
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_community.graphs.graph_document import GraphDocument, Node, Relationship
+from langchain_core.documents import Document
+
+import config as cfg
+
+CACHE_VERSION = 1   # bump if the cached JSON shape or the transformer prompt changes
+
+
+# ============================================
+# Cache
+# ============================================
+def _model_name(llm) -> str:
+    return (getattr(llm, "model_name", None) or getattr(llm, "model", None)
+            or getattr(llm, "model_id", None) or type(llm).__name__)
+
+
+def _cache_key(model_name: str, text: str) -> str:
+    return hashlib.sha256(f"v{CACHE_VERSION}|{model_name}|{text}".encode("utf-8")).hexdigest()
+
+
+def _cache_path(cache_dir: Path, key: str) -> Path:
+    return cache_dir / key[:2] / f"{key}.json"
+
+
+def _node_to_dict(n: Node) -> Dict[str, Any]:
+    return {"id": n.id, "type": n.type, "properties": n.properties}
+
+
+def _to_json(gd: GraphDocument) -> Dict[str, Any]:
+    return {"nodes": [_node_to_dict(n) for n in gd.nodes],
+            "relationships": [{"source": _node_to_dict(r.source), "target": _node_to_dict(r.target),
+                               "type": r.type, "properties": r.properties} for r in gd.relationships]}
+
+
+def _from_json(data: Dict[str, Any], source: Document) -> GraphDocument:
+    return GraphDocument(
+        nodes=[Node(**n) for n in data["nodes"]],
+        relationships=[Relationship(source=Node(**r["source"]), target=Node(**r["target"]),
+                                    type=r["type"], properties=r.get("properties") or {})
+                       for r in data["relationships"]],
+        source=source,   # always the chunk being ingested now (fresh metadata)
+    )
+
+
+def _read_cache(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_cache(path: Path, data: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+# ============================================
+# Extraction
+# ============================================
+def _extract_one(transformer, chunk: Document, max_retries: int, backoff_s: float) -> GraphDocument:
+    for attempt in range(max_retries + 1):
+        try:
+            return transformer.process_response(chunk)
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff_s * (2 ** attempt) * (0.5 + random.random())   # exponential + jitter
+            print(f"Graph extraction failed ({e}); retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def extract_graph_documents(
+    transformer,
+    chunks: List[Document],
+    *,
+    llm,
+    max_workers: int = cfg.KG_EXTRACT_WORKERS,
+    max_retries: int = cfg.KG_EXTRACT_RETRIES,
+    backoff_s: float = cfg.KG_EXTRACT_BACKOFF_S,
+    cache_dir: Path = cfg.KG_CACHE_DIR,
+) -> Tuple[List[GraphDocument], Dict[str, Any]]:
+    """Same result as transformer.convert_to_graph_documents(chunks), in chunk order.
+
+    Raises RuntimeError if any chunk still fails after retries; every chunk that did
+    succeed is already cached, so a retry only re-extracts the failed ones.
+    """
+    t0 = time.perf_counter()
+    cache_dir = Path(cache_dir)
+    model = _model_name(llm)
+    keys = [_cache_key(model, c.page_content) for c in chunks]
+
+    results: List[Optional[GraphDocument]] = [None] * len(chunks)
+    todo = []
+    for i, (chunk, key) in enumerate(zip(chunks, keys)):
+        cached = _read_cache(_cache_path(cache_dir, key))
+        if cached is not None:
+            results[i] = _from_json(cached, chunk)
+        else:
+            todo.append(i)
+
+    def _work(i: int) -> GraphDocument:
+        gd = _extract_one(transformer, chunks[i], max_retries, backoff_s)
+        _write_cache(_cache_path(cache_dir, keys[i]), _to_json(gd))
+        return gd
+
+    errors: Dict[int, str] = {}
+    if todo:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="kg-extract") as ex:
+            futures = {i: ex.submit(_work, i) for i in todo}
+            for i, fut in futures.items():
+                try:
+                    results[i] = fut.result()
+                except Exception as e:
+                    errors[i] = str(e)
+
+    report = {"chunks": len(chunks), "cached": len(chunks) - len(todo),
+              "extracted": len(todo) - len(errors), "failed": len(errors),
+              "seconds": round(time.perf_counter() - t0, 2), "model": model}
+    print(f"Graph extraction: {report}")
+    if errors:
+        first = next(iter(errors.values()))
+        raise RuntimeError(f"Graph extraction failed for {len(errors)}/{len(chunks)} chunks "
+                           f"(successful chunks are cached; retry to resume). First error: {first}")
+    return results, report
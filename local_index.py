@@ -0,0 +1,428 @@
+"""
+Local (in-process) hybrid vector index — drop-in for the Pinecone Index object
+
+Takes the same payloads as `index.upsert(vectors=[{"id", "values", "sparse_values", "metadata"}])`
+and answers `index.query(vector=..., sparse_vector=..., top_k=..., include_metadata=True)` with the
+same {"matches": [{"id", "score", "metadata"}]} shape, so PineconeHybridSearchRetriever and
+ingest.create_and_upsert_vectors work unchanged.
+
+Storage (one folder per namespace):
+- dense.npy      float32 [capacity, dim] memory-mapped matrix (row = vector)
+- records.jsonl  append-only log of {id, row, sparse, metadata} / {id, deleted}; rewritten with
+                 only the live records once it holds more than _COMPACT_RATIO x the live count
+                 (overwrites / deletes otherwise grow the log and the startup replay forever)
+
+Sparse postings: a CSR "main" segment over all rows plus a small "delta" of rows written since
+it was built. Writes only touch the delta (rows in it are masked out of the main segment), and
+the two are merged once the delta outgrows _DELTA_MERGE_* — so a query after an upsert costs
+O(delta), not a rebuild of the whole inverted index.
+
+Scoring is Pinecone "dotproduct":
+    score = dense · q_dense  +  sparse · q_sparse
+The retriever already applies alpha (hybrid_convex_scale) to the query vectors.
+`hybrid_query_batch` applies alpha itself and scores many queries in one matrix product.
+
+Enable with VECTOR_BACKEND=local (see config.py).
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+# ============================================
+# Sparse postings (CSR by term)
+# ============================================
+_EMPTY_CSR = (np.zeros(0, dtype=np.uint32), np.zeros(1, dtype=np.int64),
+              np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))
+
+
+def _build_csr(rows_sparse: Iterable[Tuple[int, tuple]]) -> tuple:
+    """(terms, starts, rows, vals): postings of terms[i] are [starts[i], starts[i+1])."""
+    terms, rows, vals = [], [], []
+    for row, sp in rows_sparse:
+        terms.append(sp[0])
+        rows.append(np.full(len(sp[0]), row, dtype=np.int64))
+        vals.append(sp[1])
+    if not terms:
+        return _EMPTY_CSR
+    t = np.concatenate(terms)
+    order = np.argsort(t, kind="stable")
+    t = t[order]
+    uniq, first = np.unique(t, return_index=True)
+    return uniq, np.append(first, len(t)).astype(np.int64), np.concatenate(rows)[order], np.concatenate(vals)[order]
+
+
+def _add_csr_scores(csr: tuple, q_idx: np.ndarray, q_val: np.ndarray, out: np.ndarray) -> None:
+    terms, starts, post_rows, post_vals = csr
+    if len(terms) == 0:
+        return
+    pos = np.minimum(np.searchsorted(terms, q_idx), len(terms) - 1)
+    hit = terms[pos] == q_idx
+    for p, w in zip(pos[hit], q_val[hit]):
+        s, e = starts[p], starts[p + 1]
+        np.add.at(out, post_rows[s:e], post_vals[s:e] * w)
+
+
+# ============================================
+# Namespace store
+# ============================================
+class _NamespaceStore:
+    """Dense memmap + sparse inverted index for one namespace."""
+
+    _INITIAL_CAPACITY = 1024
+    _COMPACT_MIN_RECORDS = 1000       # never rewrite a log shorter than this
+    _COMPACT_RATIO = 2.0              # rewrite when log records > ratio * live vectors
+    _DELTA_MERGE_MIN = 20000          # merge the delta into the main postings above this many entries ...
+    _DELTA_MERGE_FRACTION = 0.2       # ... or above this fraction of the main segment, whichever is larger
+
+    def __init__(self, root: Path, dimension: Optional[int] = None):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.dense_path = self.root / "dense.npy"
+        self.log_path = self.root / "records.jsonl"
+        self.dimension = dimension
+
+        self._lock = threading.RLock()
+        self._dense: Optional[np.memmap] = None
+        self._n_rows = 0
+        self._id_to_row: Dict[str, int] = {}
+        self._row_ids: List[Optional[str]] = []
+        self._row_meta: List[Optional[dict]] = []
+        self._row_sparse: List[Optional[tuple]] = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._free_rows: List[int] = []
+        self._log_records = 0                            # lines in records.jsonl
+
+        # inverted index: main CSR segment + delta of rows written since it was built
+        self._main = _EMPTY_CSR
+        self._delta_rows: Dict[int, Optional[tuple]] = {}   # row -> current sparse (None = no sparse)
+        self._delta_nnz = 0
+        self._delta_csr: Optional[tuple] = None              # built lazily from _delta_rows
+
+        self._load()
+        self._merge_postings()
+        self._maybe_compact()
+
+    # ---------------- persistence ----------------
+    def _load(self) -> None:
+        if self.dense_path.exists():
+            self._dense = np.load(self.dense_path, mmap_mode="r+")
+            self.dimension = self._dense.shape[1]
+        if not self.log_path.exists():
+            return
+        with open(self.log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                self._log_records += 1
+                rec = json.loads(line)
+                if rec.get("deleted"):
+                    self._mark_deleted(rec["id"])
+                else:
+                    self._set_row(rec["row"], rec["id"], rec.get("metadata") or {}, rec.get("sparse"))
+        self._free_rows = [r for r in range(self._n_rows) if not self._alive[r]]
+
+    def _ensure_capacity(self, rows_needed: int) -> None:
+        cap = 0 if self._dense is None else self._dense.shape[0]
+        if rows_needed <= cap:
+            return
+        new_cap = max(self._INITIAL_CAPACITY, cap * 2)
+        while new_cap < rows_needed:
+            new_cap *= 2
+        tmp_path = self.root / "dense.tmp.npy"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32,
+                                          shape=(new_cap, self.dimension))
+        if self._dense is not None:
+            grown[:cap] = self._dense[:cap]
+        grown.flush()
+        del grown
+        self._dense = None
+        tmp_path.replace(self.dense_path)
+        self._dense = np.load(self.dense_path, mmap_mode="r+")
+
+    def _ensure_row_slots(self, row: int) -> None:
+        while len(self._row_ids) <= row:
+            self._row_ids.append(None)
+            self._row_meta.append(None)
+            self._row_sparse.append(None)
+        if len(self._alive) <= row:
+            alive = np.zeros(max(row + 1, len(self._alive) * 2), dtype=bool)
+            alive[:len(self._alive)] = self._alive
+            self._alive = alive
+        self._n_rows = max(self._n_rows, row + 1)
+
+    def _set_row(self, row: int, vid: str, metadata: dict, sparse: Optional[dict]) -> None:
+        self._ensure_row_slots(row)
+        old = self._id_to_row.get(vid)
+        if old is not None and old != row:
+            self._alive[old] = False
+        self._id_to_row[vid] = row
+        self._row_ids[row] = vid
+        self._row_meta[row] = metadata
+        self._row_sparse[row] = (
+            (np.asarray(sparse["indices"], dtype=np.uint32), np.asarray(sparse["values"], dtype=np.float32))
+            if sparse and len(sparse.get("indices", [])) else None
+        )
+        self._alive[row] = True
+        self._to_delta(row)
+
+    def _mark_deleted(self, vid: str) -> Optional[int]:
+        row = self._id_to_row.pop(vid, None)
+        if row is not None:
+            self._alive[row] = False                 # dead rows are masked with -inf at query time
+            self._row_meta[row] = None
+            self._row_sparse[row] = None
+            self._to_delta(row)
+        return row
+
+    def _to_delta(self, row: int) -> None:
+        old = self._delta_rows.get(row)
+        new = self._row_sparse[row]
+        self._delta_nnz += (len(new[0]) if new is not None else 0) - (len(old[0]) if old is not None else 0)
+        self._delta_rows[row] = new
+        self._delta_csr = None
+
+    def _merge_postings(self) -> None:
+        """Rebuild the main segment from every live row and empty the delta (O(total postings))."""
+        self._main = _build_csr((row, sp) for row, sp in enumerate(self._row_sparse[:self._n_rows])
+                                if sp is not None and self._alive[row])
+        self._delta_rows, self._delta_nnz, self._delta_csr = {}, 0, None
+
+    def _maybe_merge_postings(self) -> None:
+        if self._delta_nnz > max(self._DELTA_MERGE_MIN, self._DELTA_MERGE_FRACTION * len(self._main[2])):
+            self._merge_postings()
+
+    # ---------------- log compaction ----------------
+    def _record(self, row: int) -> dict:
+        sp = self._row_sparse[row]
+        sparse = {"indices": sp[0].tolist(), "values": sp[1].tolist()} if sp is not None else None
+        return {"id": self._row_ids[row], "row": row, "sparse": sparse, "metadata": self._row_meta[row] or {}}
+
+    def compact(self) -> None:
+        """Rewrite records.jsonl with one record per live vector (atomic replace)."""
+        with self._lock:
+            tmp = self.root / "records.jsonl.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for row in sorted(self._id_to_row.values()):
+                    f.write(json.dumps(self._record(row), ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.log_path)
+            self._log_records = len(self._id_to_row)
+
+    def _maybe_compact(self) -> None:
+        if self._log_records > max(self._COMPACT_MIN_RECORDS, self._COMPACT_RATIO * len(self._id_to_row)):
+            self.compact()
+
+    # ---------------- writes ----------------
+    def upsert(self, vectors: List[Dict[str, Any]]) -> int:
+        if not vectors:
+            return 0
+        vectors = list({v["id"]: v for v in vectors}.values())   # last write wins within a batch
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = len(vectors[0]["values"])
+            dense = np.asarray([v["values"] for v in vectors], dtype=np.float32)
+            if dense.shape[1] != self.dimension:
+                raise ValueError(f"Vector dimension {dense.shape[1]} does not match index dimension {self.dimension}")
+
+            rows = []
+            for v in vectors:
+                row = self._id_to_row.get(v["id"])
+                if row is None:
+                    row = self._free_rows.pop() if self._free_rows else self._n_rows
+                    self._ensure_row_slots(row)
+                rows.append(row)
+            self._ensure_capacity(self._n_rows)
+            self._dense[rows] = dense
+
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                for v, row in zip(vectors, rows):
+                    sparse = v.get("sparse_values")
+                    if sparse is not None:
+                        sparse = {"indices": [int(i) for i in sparse["indices"]],
+                                  "values": [float(x) for x in sparse["values"]]}
+                    metadata = v.get("metadata") or {}
+                    self._set_row(row, v["id"], metadata, sparse)
+                    f.write(json.dumps({"id": v["id"], "row": row, "sparse": sparse,
+                                        "metadata": metadata}, ensure_ascii=False) + "\n")
+                    self._log_records += 1
+            self._dense.flush()
+            self._maybe_compact()
+        return len(vectors)
+
+    def delete(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                for vid in ids:
+                    row = self._mark_deleted(vid)
+                    if row is not None:
+                        self._free_rows.append(row)
+                        f.write(json.dumps({"id": vid, "deleted": True}) + "\n")
+                        self._log_records += 1
+            self._maybe_compact()
+
+    # ---------------- inverted index ----------------
+    def _sparse_scores(self, sparse_queries: List[Optional[dict]]) -> np.ndarray:
+        """[n_queries, n_rows] sparse dot products: main segment (minus rows in the delta) + delta."""
+        out = np.zeros((len(sparse_queries), self._n_rows), dtype=np.float32)
+        self._maybe_merge_postings()
+        if self._delta_rows and self._delta_csr is None:
+            self._delta_csr = _build_csr((r, sp) for r, sp in self._delta_rows.items() if sp is not None)
+        overridden = np.fromiter(self._delta_rows, dtype=np.int64, count=len(self._delta_rows))
+        for qi, sq in enumerate(sparse_queries):
+            if not sq or not len(sq.get("indices", [])):
+                continue
+            q_idx = np.asarray(sq["indices"], dtype=np.uint32)
+            q_val = np.asarray(sq["values"], dtype=np.float32)
+            _add_csr_scores(self._main, q_idx, q_val, out[qi])
+            if len(overridden):
+                out[qi, overridden] = 0.0              # main-segment postings of these rows are stale
+                _add_csr_scores(self._delta_csr, q_idx, q_val, out[qi])
+        return out
+
+    # ---------------- reads ----------------
+    def score(self, dense_queries: np.ndarray, sparse_queries: List[Optional[dict]],
+              dense_weight: float = 1.0, sparse_weight: float = 1.0) -> np.ndarray:
+        """[n_queries, n_rows] hybrid dotproduct scores; deleted rows get -inf."""
+        with self._lock:
+            n = self._n_rows
+            if n == 0:
+                return np.zeros((len(dense_queries), 0), dtype=np.float32)
+            scores = np.asarray(dense_queries, dtype=np.float32) @ self._dense[:n].T
+            if dense_weight != 1.0:
+                scores *= dense_weight
+            if any(sparse_queries):
+                scores += sparse_weight * self._sparse_scores(sparse_queries)
+            scores[:, ~self._alive[:n]] = -np.inf
+            return scores
+
+    def matches(self, scores: np.ndarray, top_k: int, include_metadata: bool,
+                include_values: bool, flt: Optional[dict] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            if flt:
+                keep = np.array([self._alive[r] and _match_filter(self._row_meta[r], flt)
+                                 for r in range(len(scores))], dtype=bool)
+                scores = np.where(keep, scores, -np.inf)
+            k = min(top_k, int(np.isfinite(scores).sum()))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            out = []
+            for row in top:
+                m: Dict[str, Any] = {"id": self._row_ids[row], "score": float(scores[row])}
+                if include_metadata:
+                    m["metadata"] = dict(self._row_meta[row] or {})
+                if include_values:
+                    m["values"] = self._dense[row].tolist()
+                    sp = self._row_sparse[row]
+                    if sp is not None:
+                        m["sparse_values"] = {"indices": sp[0].tolist(), "values": sp[1].tolist()}
+                out.append(m)
+            return out
+
+    def fetch(self, ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            out = {}
+            for vid in ids:
+                row = self._id_to_row.get(vid)
+                if row is not None:
+                    out[vid] = {"id": vid, "values": self._dense[row].tolist(),
+                                "metadata": dict(self._row_meta[row] or {})}
+            return out
+
+    def count(self) -> int:
+        return len(self._id_to_row)
+
+
+def _match_filter(metadata: Optional[dict], flt: dict) -> bool:
+    """Tiny subset of Pinecone metadata filters: {"k": v}, {"k": {"$eq": v}}, {"k": {"$in": [...]}}."""
+    metadata = metadata or {}
+    for key, cond in flt.items():
+        val = metadata.get(key)
+        if isinstance(cond, dict):
+            for op, arg in cond.items():
+                if op == "$eq" and val != arg:
+                    return False
+                if op == "$ne" and val == arg:
+                    return False
+                if op == "$in" and val not in arg:
+                    return False
+                if op not in ("$eq", "$ne", "$in"):
+                    raise ValueError(f"Unsupported filter operator for local index: {op}")
+        elif val != cond:
+            return False
+    return True
+
+
+# ============================================
+# Pinecone-compatible Index
+# ============================================
+class LocalHybridIndex:
+    """In-process replacement for `pinecone.Index` (dotproduct metric, dense + sparse)."""
+
+    def __init__(self, path: str | Path, dimension: Optional[int] = None):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.dimension = dimension
+        self._lock = threading.Lock()
+        self._namespaces: Dict[str, _NamespaceStore] = {}
+        for p in self.path.iterdir():
+            if p.is_dir():
+                self._namespaces[p.name] = _NamespaceStore(p, dimension)
+
+    def _ns(self, namespace: Optional[str]) -> _NamespaceStore:
+        name = namespace or "__default__"
+        with self._lock:
+            if name not in self._namespaces:
+                self._namespaces[name] = _NamespaceStore(self.path / name, self.dimension)
+            return self._namespaces[name]
+
+    # --- Pinecone Index API ---
+    def upsert(self, vectors: List[Dict[str, Any]], namespace: Optional[str] = None, **kwargs) -> Dict[str, int]:
+        return {"upserted_count": self._ns(namespace).upsert(vectors)}
+
+    def query(self, vector: List[float], sparse_vector: Optional[dict] = None, top_k: int = 10,
+              include_metadata: bool = False, include_values: bool = False,
+              namespace: Optional[str] = None, filter: Optional[dict] = None, **kwargs) -> Dict[str, Any]:
+        ns = self._ns(namespace)
+        scores = ns.score(np.asarray([vector], dtype=np.float32), [sparse_vector])
+        matches = ns.matches(scores[0], top_k, include_metadata, include_values, filter) if scores.size else []
+        return {"matches": matches, "namespace": namespace or ""}
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: bool = False,
+               namespace: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        ns = self._ns(namespace)
+        if delete_all:
+            ids = list(ns._id_to_row)
+        ns.delete(ids or [])
+        return {}
+
+    def fetch(self, ids: List[str], namespace: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        return {"vectors": self._ns(namespace).fetch(ids), "namespace": namespace or ""}
+
+    def describe_index_stats(self, **kwargs) -> Dict[str, Any]:
+        namespaces = {name: {"vector_count": ns.count()} for name, ns in self._namespaces.items()}
+        return {"dimension": self.dimension or next((ns.dimension for ns in self._namespaces.values()
+                                                     if ns.dimension), None),
+                "namespaces": namespaces,
+                "total_vector_count": sum(v["vector_count"] for v in namespaces.values())}
+
+    # --- batch API (no Pinecone equivalent) ---
+    def hybrid_query_batch(self, dense_queries: List[List[float]], sparse_queries: List[Optional[dict]],
+                           alpha: float = 0.7, top_k: int = 10, include_metadata: bool = True,
+                           namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Score many queries at once: alpha * dense + (1 - alpha) * sparse (one matrix product)."""
+        if not 0 <= alpha <= 1:
+            raise ValueError("Alpha must be between 0 and 1")
+        ns = self._ns(namespace)
+        scores = ns.score(np.asarray(dense_queries, dtype=np.float32), list(sparse_queries),
+                          dense_weight=alpha, sparse_weight=1 - alpha)
+        return [{"matches": ns.matches(row, top_k, include_metadata, False) if scores.size else [],
+                 "namespace": namespace or ""} for row in scores]
@@ -2,15 +2,27 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 from pydantic import BaseModel
 from config import DATA_DIR, TMP_DIR
-from data_process import parse_single_pdf_to_md, load_markdown_to_documents, chunk_documents
+from data_process import parse_single_pdf_to_md, load_markdown_to_documents, chunk_documents, iter_markdown_chunks
 from ingest import get_pinecone_index, create_and_upsert_vectors, upsert_knowledge_graph_from_chunks
 from uuid import uuid4
 from pathlib import Path
 from config import llm_gen
+import config as cfg
 from fastapi.middleware.cors import CORSMiddleware
-from agent import get_agent_runnable
-from langchain_core.messages import HumanMessage
+from agent import get_agent_runnable, tool_pool_stats, tools_dict
+from langchain_core.messages import HumanMessage, AIMessage
 from typing import List, Any, Dict
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+import json
+import os
+import time
+import hashlib
+import tempfile
+import importlib.util
+from resource_pool import pool
+from jobs import IngestJobManager, QueueFull, JobNotFound, save_chunks, load_chunks
+from semantic_cache import SemanticCache
 
 
 app = FastAPI(title="RAG Ingest API")
@@ -21,6 +33,18 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],)
 
+
+@app.on_event("startup")
+async def warm_resource_pool():
+    # Build Pinecone client, BM25 encoder, Cohere reranker once, before the first query
+    await run_in_threadpool(pool.warm)
+
+
+@app.on_event("shutdown")
+def persist_semantic_cache():
+    semantic_cache.save()   # no-op unless SEMANTIC_CACHE_PATH is set
+    ingest_jobs.shutdown()  # queued jobs stay on disk and can be resumed after restart
+
 ################################################################################################################
 # # 1. INGEST (with marker enabled)
 # @app.post("/ingest")
@@ -69,67 +93,169 @@ DATA_DIR = Path("/app/data")
 TMP_DIR = Path("/app/tmp")
 TMP_DIR.mkdir(parents=True, exist_ok=True)
 
-@app.post("/ingest")
+# -----------------------------------------------------------------------------
+# Ingest pipeline stages (run by the job workers, see jobs.py)
+# -----------------------------------------------------------------------------
+def _run_ingest_stage(stage: str, job: Dict[str, Any], job_dir: Path) -> Dict[str, Any]:
+    params = job["params"]
+    chunks_path = job_dir / "chunks.jsonl"
+
+    if stage == "save":
+        # normally recorded by the request; reached on resume when the server stopped before that
+        pdf_path = Path(params["pdf_path"])
+        if not pdf_path.exists():
+            raise FileNotFoundError(f"upload missing: {pdf_path}")
+        return {"pdf_path": str(pdf_path), "bytes": pdf_path.stat().st_size, "sha256": params["sha256"]}
+
+    if stage == "parse":
+        # Parse directly into TMP_DIR so .md lives there
+        parsed = parse_single_pdf_to_md(params["pdf_path"], TMP_DIR)
+        return {"parsed_saved_dir": str(TMP_DIR), "parsed_files": parsed}
+
+    if stage == "chunk":
+        parsed = job["stages"]["parse"]["details"]["parsed_files"]
+        # markdown read lazily and chunks streamed to disk; the vectors/graph stages (and resume) read them back
+        n_chunks = save_chunks(iter_markdown_chunks(parsed), chunks_path)
+        return {"doc_count": len(parsed), "chunk_count": n_chunks}
+
+    if stage == "vectors":
+        chunks = load_chunks(chunks_path)
+        index = get_pinecone_index()
+        report = create_and_upsert_vectors(index, chunks, namespace=params["namespace"])
+        pool.refresh_bm25()  # new BM25 model on disk -> rebuild the cached retriever
+        semantic_cache.invalidate()  # cached answers may be stale for the new corpus (again after "graph")
+        return {"vector_count": len(chunks), "namespace": params["namespace"], "upsert": report}
+
+    if stage == "graph":
+        if not params["enable_graph"]:
+            return {"skipped": True, "enabled": False}
+        report = upsert_knowledge_graph_from_chunks(load_chunks(chunks_path), llm=llm_gen)
+        # answers cached between the two stages were built on the old KG facts
+        semantic_cache.invalidate()
+        return report
+
+    return {}
+
+
+ingest_jobs = IngestJobManager(_run_ingest_stage)
+
+
+async def _stream_upload(file: UploadFile, dest_dir: Path):
+    """Copy the upload to a temp file in dest_dir chunk by chunk; returns (path, sha256 hex, bytes)."""
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    sha = hashlib.sha256()
+    size = 0
+    fd, tmp = tempfile.mkstemp(dir=dest_dir, prefix=".upload-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(cfg.UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha.update(chunk)
+                size += len(chunk)
+                await run_in_threadpool(out.write, chunk)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return Path(tmp), sha.hexdigest(), size
+
+
+@app.post("/ingest", status_code=202)
 async def run_ingest(
     file: UploadFile = File(...),
     enable_graph: bool = Form(True),
     namespace: str = Form("default_namespace_1"),
 ):
     """
-    Save the uploaded PDF into TMP_DIR, parse to Markdown in TMP_DIR, then index.
+    Save the uploaded PDF and queue an ingest job (parse -> chunk -> vectors -> graph).
+    Returns right away with the job id; poll GET /ingest/jobs/{job_id} for per-stage progress.
     """
-    # Import only when endpoint is called (so marker-pdf can be absent online)
-    try:
-        from data_process import (
-            parse_single_pdf_to_md,
-            load_markdown_to_documents,
-            chunk_documents,
-        )
-        from vectors import get_pinecone_index, create_and_upsert_vectors
-        from kg import upsert_knowledge_graph_from_chunks, llm_gen  # adjust paths/names as in your repo
-    except Exception:
-        # marker-pdf or other ingest deps not installed in this deployment
+    # marker-pdf is optional so the API can run without it online
+    if importlib.util.find_spec("marker") is None:
         raise HTTPException(status_code=403, detail="Online ingest is disabled in this demo (No Marker Installed).")
 
-    upload_id = str(uuid4())
+    # Stream to disk in fixed-size chunks while hashing (memory stays flat for any PDF size)
+    t0 = time.perf_counter()
+    try:
+        tmp_path, digest, size = await _stream_upload(file, DATA_DIR)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    save_s = time.perf_counter() - t0
+
     safe_stem = Path(file.filename).stem
-    pdf_path = DATA_DIR / f"{safe_stem}_{upload_id}.pdf"
+    pdf_path = DATA_DIR / f"{safe_stem}_{digest[:16]}.pdf"   # content-addressed name
 
+    # Byte-identical PDF already ingested (or in flight) into this namespace -> reuse that job
     try:
-        data = await file.read()
-        pdf_path.write_bytes(data)
-
-        # Parse directly into TMP_DIR so .md lives there
-        parsed = parse_single_pdf_to_md(pdf_path, TMP_DIR)
-        docs = load_markdown_to_documents(parsed)
-        chunks = chunk_documents(docs)
+        job, created = ingest_jobs.find_or_create({"filename": file.filename, "pdf_path": str(pdf_path),
+                                                   "sha256": digest, "namespace": namespace,
+                                                   "enable_graph": enable_graph})
+    except QueueFull as e:
+        tmp_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=429, detail=str(e))
+    if not created:
+        tmp_path.unlink(missing_ok=True)
+        if job["status"] == "failed":
+            try:
+                job = ingest_jobs.resume(job["id"])   # continue from its last finished stage
+            except QueueFull as e:
+                raise HTTPException(status_code=429, detail=str(e))
+        return {"job_id": job["id"], "status": job["status"], "deduplicated": True,
+                "sha256": digest, "status_url": f"/ingest/jobs/{job['id']}", "result": job["result"]}
 
-        index = get_pinecone_index()
-        create_and_upsert_vectors(index, chunks, namespace=namespace)
-
-        kg = {"enabled": False}
-        if enable_graph:
-            kg = upsert_knowledge_graph_from_chunks(chunks, llm=llm_gen)
-
-        return {
-            "doc_count": len(docs),
-            "chunk_count": len(chunks),
-            "namespace": namespace,
-            "parsed_saved_dir": str(TMP_DIR),
-            "parsed_files": [str(p) for p in parsed],
-            "kg": kg,
-        }
-    except HTTPException:
-        raise
+    try:
+        os.replace(tmp_path, pdf_path)
+        ingest_jobs.complete_stage(job["id"], "save", save_s,
+                                   {"pdf_path": str(pdf_path), "bytes": size, "sha256": digest})
     except Exception as e:
+        ingest_jobs.fail(job["id"], f"save: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    job = ingest_jobs.submit(job["id"])
+    return {"job_id": job["id"], "status": job["status"], "deduplicated": False,
+            "sha256": digest, "status_url": f"/ingest/jobs/{job['id']}"}
+
+
+@app.get("/ingest/jobs")
+def list_ingest_jobs(limit: int = 50):
+    return ingest_jobs.list(limit)
+
+
+@app.get("/ingest/jobs/{job_id}")
+def get_ingest_job(job_id: str):
+    """Job status with per-stage status, timings (seconds) and details; `result` once done."""
+    try:
+        return ingest_jobs.status(job_id)
+    except JobNotFound:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+
+
+@app.post("/ingest/jobs/{job_id}/resume", status_code=202)
+def resume_ingest_job(job_id: str):
+    """Re-queue a failed job from its first unfinished stage."""
+    try:
+        return ingest_jobs.resume(job_id)
+    except JobNotFound:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
 
 ################################################################################################################
 # 2. QUERRY 
 # Build once at import (re-uses the same MemorySaver for thread checkpoints)
 rag_agent = get_agent_runnable()
 
+# Answers to near-identical past questions (see semantic_cache.py)
+semantic_cache = SemanticCache(
+    threshold=cfg.SEMANTIC_CACHE_THRESHOLD,
+    max_size=cfg.SEMANTIC_CACHE_MAX_SIZE,
+    path=cfg.SEMANTIC_CACHE_PATH,
+)
+
 # -----------------------------------------------------------------------------
 # Schemas
 # -----------------------------------------------------------------------------
@@ -165,27 +291,22 @@ from langchain_core.messages import HumanMessage
 
 def extract_tool_messages_last_turn(resp: Dict[str, Any]) -> List[Dict[str, Any]]:
     """
-    Return ONLY tool messages that occurred after the most recent HumanMessage.
-    This isolates the tools for the latest user question.
+    Return ONLY tool messages of the latest user question.
+    Uses the turn_start offset recorded by the agent, so the cost depends on this turn's
+    messages, not on how long the thread is. Without it, walk back to the last HumanMessage.
     """
     msgs = resp.get("messages", []) or []
 
-    # find the index of the last human message
-    last_human_idx = -1
-    for i, m in enumerate(msgs):
-        # works for dict or BaseMessage
-        t = m.get("type") if isinstance(m, dict) else getattr(m, "type", None)
-        if t == "human" or isinstance(m, HumanMessage):
-            last_human_idx = i
-
-    if last_human_idx == -1:
-        return []  # no human found; be safe
+    turn_start = resp.get("turn_start")
+    if turn_start is None:
+        turn_start = next((i for i in range(len(msgs) - 1, -1, -1) if _msg_type(msgs[i]) == "human"), None)
+        if turn_start is None:
+            return []  # no human found; be safe
 
     # collect tool messages AFTER that human
     out: List[Dict[str, Any]] = []
-    for m in msgs[last_human_idx + 1:]:
-        t = m.get("type") if isinstance(m, dict) else getattr(m, "type", None)
-        if t == "tool":
+    for m in msgs[turn_start + 1:]:
+        if _msg_type(m) == "tool":
             name = (
                 m.get("name", "unknown_tool")
                 if isinstance(m, dict)
@@ -196,6 +317,11 @@ def extract_tool_messages_last_turn(resp: Dict[str, Any]) -> List[Dict[str, Any]
     return out
 
 
+def _msg_type(m) -> str:
+    # works for dict or BaseMessage
+    return m.get("type") if isinstance(m, dict) else getattr(m, "type", None)
+
+
 
 # -----------------------------------------------------------------------------
 # Endpoint
@@ -216,13 +342,125 @@ def extract_tool_messages_last_turn(resp: Dict[str, Any]) -> List[Dict[str, Any]
 
 #     return AskResponse(answer=answer, tool_results=tool_info)
 
+def _cache_lookup(query: str, config: Dict[str, Any]):
+    """Return (cache_key, cached_hit). A hit is also written into the thread's history.
+
+    The cache only serves (and _cache_store only fills it from) the FIRST question of a thread:
+    a follow-up like "and who owns it?" depends on the thread's earlier turns, so another
+    conversation's answer to the same words would be wrong. cache_key is None when the cache
+    does not apply; otherwise (query embedding, cache generation at lookup time).
+    """
+    if not cfg.SEMANTIC_CACHE_ENABLED:
+        return None, None
+    if rag_agent.get_state(config).values.get("messages"):
+        return None, None
+    key = (cfg.embeddings.embed_query(query), semantic_cache.generation)
+    hit = semantic_cache.lookup(key[0])
+    if hit:
+        # keep the thread consistent with what the user saw (follow-ups still have context)
+        rag_agent.update_state(
+            config,
+            {"messages": [HumanMessage(content=query), AIMessage(content=hit["answer"])]},
+            as_node="llm_with_tool",
+        )
+    return key, hit
+
+
+def _cache_store(query: str, key, answer: str, tool_info: List[Dict[str, Any]]) -> None:
+    # don't cache answers built on failed/timed-out tools
+    if key is None or any(str(t.get("content", "")).startswith("Tool error") for t in tool_info):
+        return
+    q_emb, generation = key
+    semantic_cache.add(query, q_emb, answer, tool_info, generation=generation)   # skipped if invalidated meanwhile
+
+
 @app.post("/ask", response_model=AskResponse)
 def ask(req: AskRequest):
     initial = {"messages": [HumanMessage(content=req.query)]}
     config = {"configurable": {"thread_id": req.thread_id}}
+
+    cache_key, hit = _cache_lookup(req.query, config)
+    if hit:
+        return AskResponse(answer=hit["answer"], tool_results=hit["tool_results"])
+
     response = rag_agent.invoke(initial, config=config)
 
     answer = response["messages"][-1].content
     tool_info = extract_tool_messages_last_turn(response)  # <-- use new extractor
 
-    return AskResponse(answer=answer, tool_results=tool_info)
\ No newline at end of file
+    _cache_store(req.query, cache_key, answer, tool_info)
+    return AskResponse(answer=answer, tool_results=tool_info)
+
+
+# -----------------------------------------------------------------------------
+# Streaming endpoint (Server-Sent Events)
+# -----------------------------------------------------------------------------
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+@app.post("/ask/stream")
+async def ask_stream(req: AskRequest):
+    """
+    Same as /ask but streams Server-Sent Events while the agent runs:
+      tool_start {name, query} -> tool_end {name, content} -> token {text} ... -> done {answer, tool_results}
+    `error {detail}` is sent instead of `done` if the run fails.
+    done.tool_results (and what gets cached) come from this turn's ToolMessages in the final
+    state, like /ask: tool errors/timeouts included, late output of an abandoned tool excluded.
+    """
+    initial = {"messages": [HumanMessage(content=req.query)]}
+    config = {"configurable": {"thread_id": req.thread_id}}
+
+    async def event_stream():
+        answer_parts: List[str] = []
+        try:
+            cache_key, hit = await run_in_threadpool(_cache_lookup, req.query, config)
+            if hit:
+                yield _sse("done", {"answer": hit["answer"], "tool_results": hit["tool_results"], "cached": True})
+                return
+
+            async for ev in rag_agent.astream_events(initial, config=config, version="v2"):
+                kind, name = ev["event"], ev.get("name")
+
+                if kind == "on_tool_start" and name in tools_dict:
+                    query = ev["data"].get("input") or req.query   # tools are called with the user query
+                    yield _sse("tool_start", {"name": name, "query": query})
+
+                elif kind == "on_tool_end" and name in tools_dict:
+                    output = ev["data"].get("output")
+                    content = str(getattr(output, "content", output))
+                    yield _sse("tool_end", {"name": name, "content": content})
+
+                elif kind == "on_chat_model_start":
+                    answer_parts = []            # only the last LLM call is the final answer
+
+                elif kind == "on_chat_model_stream":
+                    chunk = ev["data"]["chunk"]
+                    if chunk.content and not getattr(chunk, "tool_call_chunks", None):
+                        answer_parts.append(chunk.content)
+                        yield _sse("token", {"text": chunk.content})
+
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+
+        state = await rag_agent.aget_state(config)
+        messages = state.values.get("messages") or []
+        answer = messages[-1].content if messages else "".join(answer_parts)
+        tool_results = extract_tool_messages_last_turn(state.values)
+        await run_in_threadpool(_cache_store, req.query, cache_key, answer, tool_results)
+        yield _sse("done", {"answer": answer, "tool_results": tool_results})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # no proxy buffering
+    )
+
+
+@app.get("/stats")
+def stats():
+    """Cache counters: shared retriever resources (hits vs rebuilds), the semantic answer cache, rerank cache, conversation memory."""
+    return {"resource_pool": pool.stats(), "semantic_cache": semantic_cache.stats(),
+            "memory": rag_agent.checkpointer.stats(), "rerank_cache": pool.get_rerank_cache().stats(),
+            "tools": tool_pool_stats()}
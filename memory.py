@@ -0,0 +1,323 @@
+"""
+Bounded, persistent conversation memory for the agent
+
+get_agent_runnable used to compile the graph with a plain MemorySaver: every thread's
+full history stayed in RAM forever, was lost on restart, and call_llm_with_tools sent
+all of it to the model on every call. Two pieces fix that:
+
+1. Checkpointer (build_checkpointer, cfg.MEMORY_BACKEND)
+   - "sqlite": BoundedSqliteSaver, checkpoints in cfg.MEMORY_PATH (WAL), survives restarts.
+     Only the newest cfg.MEMORY_KEEP_CHECKPOINTS checkpoints of a thread are kept.
+   - "memory": BoundedMemorySaver, in-process like before (dev / tests)
+   Both record when each thread was last written and, at most every
+   cfg.MEMORY_SWEEP_INTERVAL_S, delete threads idle for more than cfg.MEMORY_THREAD_TTL_S
+   and the least recently used ones above cfg.MEMORY_MAX_THREADS.
+
+2. History policy (compact_messages, cfg.HISTORY_POLICY), run at the start of each turn
+   - "window" : keep the last cfg.HISTORY_MAX_TURNS turns, drop older ones
+   - "summary": once there are more than HISTORY_MAX_TURNS turns, fold the older half
+                into a running summary (one LLM call every ~HISTORY_MAX_TURNS/2 turns)
+   - "none"   : keep everything (old behaviour)
+   A turn = a user message plus everything after it (tool calls, tool results, answer),
+   so an AIMessage with tool_calls is never separated from its ToolMessages.
+"""
+
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, RemoveMessage, SystemMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+import config as cfg
+
+
+# ============================================
+# Thread eviction (shared by both backends)
+# ============================================
+class _ThreadEviction(ABC):
+    """TTL + LRU eviction of whole threads; subclasses say how activity is stored."""
+
+    def _init_eviction(self, ttl_s: float, max_threads: int, sweep_interval_s: float) -> None:
+        self.ttl_s = ttl_s
+        self.max_threads = max_threads
+        self.sweep_interval_s = sweep_interval_s
+        self._last_sweep = time.monotonic()
+        self._sweep_lock = threading.Lock()
+        self.evicted = 0
+
+    @abstractmethod
+    def _touch(self, thread_id: str) -> None:
+        """Record a write to thread_id now."""
+
+    @abstractmethod
+    def _evictable(self, idle_before: float, max_threads: int) -> List[str]:
+        """Threads last used before idle_before, plus the oldest ones above max_threads."""
+
+    @abstractmethod
+    def _forget(self, thread_ids: List[str]) -> None:
+        """Drop the activity records of deleted threads."""
+
+    def _after_put(self, thread_id: str) -> None:
+        self._touch(thread_id)
+        if time.monotonic() - self._last_sweep >= self.sweep_interval_s:
+            self.sweep()
+
+    def sweep(self) -> int:
+        """Delete idle / least recently used threads now; returns how many were deleted."""
+        if not self._sweep_lock.acquire(blocking=False):
+            return 0                                   # another request is already sweeping
+        try:
+            self._last_sweep = time.monotonic()
+            idle_before = time.time() - self.ttl_s if self.ttl_s > 0 else 0.0
+            victims = self._evictable(idle_before, self.max_threads)
+            for thread_id in victims:
+                self.delete_thread(thread_id)
+            self._forget(victims)
+            self.evicted += len(victims)
+            if victims:
+                print(f"Memory: evicted {len(victims)} idle threads")
+            return len(victims)
+        finally:
+            self._sweep_lock.release()
+
+
+class BoundedMemorySaver(_ThreadEviction, MemorySaver):
+    """In-process checkpointer with TTL/LRU thread eviction."""
+
+    def __init__(self, ttl_s: float = cfg.MEMORY_THREAD_TTL_S, max_threads: int = cfg.MEMORY_MAX_THREADS,
+                 sweep_interval_s: float = cfg.MEMORY_SWEEP_INTERVAL_S):
+        super().__init__()
+        self._init_eviction(ttl_s, max_threads, sweep_interval_s)
+        self._activity: "OrderedDict[str, float]" = OrderedDict()   # thread_id -> last write, oldest first
+        self._activity_lock = threading.Lock()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        out = super().put(config, checkpoint, metadata, new_versions)
+        self._after_put(str(config["configurable"]["thread_id"]))
+        return out
+
+    def _touch(self, thread_id: str) -> None:
+        with self._activity_lock:
+            self._activity[thread_id] = time.time()
+            self._activity.move_to_end(thread_id)
+
+    def _evictable(self, idle_before: float, max_threads: int) -> List[str]:
+        with self._activity_lock:
+            ids = list(self._activity)
+            n_idle = next((i for i, t in enumerate(ids) if self._activity[t] >= idle_before), len(ids))
+            n_over = max(0, len(ids) - max_threads) if max_threads > 0 else 0
+            return ids[:max(n_idle, n_over)]
+
+    def _forget(self, thread_ids: List[str]) -> None:
+        with self._activity_lock:
+            for t in thread_ids:
+                self._activity.pop(t, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "threads": len(self._activity), "evicted": self.evicted}
+
+
+def _sqlite_saver_base():
+    # optional dependency: only needed for MEMORY_BACKEND=sqlite
+    from langgraph.checkpoint.sqlite import SqliteSaver
+    return SqliteSaver
+
+
+def _make_sqlite_saver_class():
+    SqliteSaver = _sqlite_saver_base()
+
+    class BoundedSqliteSaver(_ThreadEviction, SqliteSaver):
+        """SqliteSaver (WAL) with TTL/LRU thread eviction, checkpoint pruning and async methods.
+
+        SqliteSaver is sync-only; the async methods (used by /ask/stream) run the sync ones in a
+        worker thread. The saver serializes access to its connection with its own lock.
+        """
+
+        def __init__(self, path: Path, keep_checkpoints: int = cfg.MEMORY_KEEP_CHECKPOINTS,
+                     ttl_s: float = cfg.MEMORY_THREAD_TTL_S, max_threads: int = cfg.MEMORY_MAX_THREADS,
+                     sweep_interval_s: float = cfg.MEMORY_SWEEP_INTERVAL_S):
+            import sqlite3
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            super().__init__(conn)
+            self.path = path
+            self.keep_checkpoints = keep_checkpoints
+            self._init_eviction(ttl_s, max_threads, sweep_interval_s)
+
+        def setup(self) -> None:
+            if self.is_setup:
+                return
+            super().setup()
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS thread_activity (
+                    thread_id TEXT PRIMARY KEY,
+                    last_used REAL NOT NULL
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS thread_activity_last_used ON thread_activity (last_used);
+            """)
+            # threads written before eviction existed start their TTL now
+            self.conn.execute("INSERT OR IGNORE INTO thread_activity (thread_id, last_used) "
+                              "SELECT DISTINCT thread_id, ? FROM checkpoints", (time.time(),))
+            self.conn.commit()
+
+        def put(self, config, checkpoint, metadata, new_versions):
+            out = super().put(config, checkpoint, metadata, new_versions)
+            thread_id = str(config["configurable"]["thread_id"])
+            if self.keep_checkpoints > 0:
+                self._prune(thread_id, config["configurable"]["checkpoint_ns"])
+            self._after_put(thread_id)
+            return out
+
+        def _prune(self, thread_id: str, checkpoint_ns: str) -> None:
+            # only the latest checkpoints are ever read back (no time travel in this app)
+            with self.cursor() as cur:
+                row = cur.execute(
+                    "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+                    (thread_id, checkpoint_ns, self.keep_checkpoints - 1),
+                ).fetchone()
+                if row is None:
+                    return
+                for table in ("checkpoints", "writes"):
+                    cur.execute(f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                                (thread_id, checkpoint_ns, row[0]))
+
+        def _touch(self, thread_id: str) -> None:
+            with self.cursor() as cur:
+                cur.execute("INSERT OR REPLACE INTO thread_activity (thread_id, last_used) VALUES (?, ?)",
+                            (thread_id, time.time()))
+
+        def _evictable(self, idle_before: float, max_threads: int) -> List[str]:
+            with self.cursor(transaction=False) as cur:
+                idle = [r[0] for r in cur.execute(
+                    "SELECT thread_id FROM thread_activity WHERE last_used < ?", (idle_before,))]
+                total = cur.execute("SELECT COUNT(*) FROM thread_activity").fetchone()[0]
+                over = []
+                if max_threads > 0 and total - len(idle) > max_threads:
+                    over = [r[0] for r in cur.execute(
+                        "SELECT thread_id FROM thread_activity WHERE last_used >= ? ORDER BY last_used LIMIT ?",
+                        (idle_before, total - len(idle) - max_threads))]
+            return idle + over
+
+        def _forget(self, thread_ids: List[str]) -> None:
+            with self.cursor() as cur:
+                cur.executemany("DELETE FROM thread_activity WHERE thread_id = ?", [(t,) for t in thread_ids])
+
+        def stats(self) -> Dict[str, Any]:
+            with self.cursor(transaction=False) as cur:
+                threads = cur.execute("SELECT COUNT(*) FROM thread_activity").fetchone()[0]
+                checkpoints = cur.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+            return {"backend": "sqlite", "path": str(self.path), "threads": threads,
+                    "checkpoints": checkpoints, "evicted": self.evicted}
+
+        def close(self) -> None:
+            with self.lock:
+                self.conn.close()
+
+        # --- async API (run the sync methods off the event loop) ---
+        async def aget_tuple(self, config):
+            return await asyncio.to_thread(self.get_tuple, config)
+
+        async def alist(self, config, *, filter=None, before=None, limit=None):
+            items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+            for item in items:
+                yield item
+
+        async def aput(self, config, checkpoint, metadata, new_versions):
+            return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+        async def aput_writes(self, config, writes, task_id, task_path=""):
+            return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+        async def adelete_thread(self, thread_id):
+            return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    return BoundedSqliteSaver
+
+
+def build_checkpointer(backend: str = cfg.MEMORY_BACKEND):
+    if backend == "memory":
+        return BoundedMemorySaver()
+    if backend == "sqlite":
+        return _make_sqlite_saver_class()(cfg.MEMORY_PATH)
+    raise ValueError(f"Unknown MEMORY_BACKEND {backend!r} (expected 'sqlite' or 'memory')")
+
+
+# ============================================
+# History policy
+# ============================================
+SUMMARY_PROMPT = ("You maintain a running summary of a conversation between a user and a document Q&A "
+                  "assistant. Update the summary with the new messages. Keep names, numbers, dates, "
+                  "document sources and open questions; drop pleasantries. At most 200 words.")
+
+
+def turn_starts(messages: Sequence[BaseMessage], last: Optional[int] = None) -> List[int]:
+    """Index of every user message (each one starts a turn), oldest first.
+    With `last`, only the last `last` of them: the thread is walked back from the end and the
+    walk stops there, so the cost is the length of those turns, not of the whole thread."""
+    if last is None:
+        return [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+    starts: List[int] = []
+    for i in range(len(messages) - 1, -1, -1):
+        if len(starts) >= last:
+            break
+        if isinstance(messages[i], HumanMessage):
+            starts.append(i)
+    return starts[::-1]
+
+
+def _transcript(messages: Sequence[BaseMessage], max_chars: int = 1000) -> str:
+    lines = []
+    for m in messages:
+        if isinstance(m, HumanMessage):
+            lines.append(f"User: {str(m.content)[:max_chars]}")
+        elif isinstance(m, AIMessage) and m.content:          # answers only; tool rounds are not summarized
+            lines.append(f"Assistant: {str(m.content)[:max_chars]}")
+    return "\n".join(lines)
+
+
+def summarize(previous: str, messages: Sequence[BaseMessage]) -> str:
+    prompt = (f"Current summary:\n{previous or '(none)'}\n\nNew messages:\n{_transcript(messages)}")
+    return str(cfg.llm_gen.invoke([SystemMessage(content=SUMMARY_PROMPT), HumanMessage(content=prompt)]).content).strip()
+
+
+def compact_messages(messages: Sequence[BaseMessage], summary: str = "", policy: str = cfg.HISTORY_POLICY,
+                     max_turns: int = cfg.HISTORY_MAX_TURNS,
+                     summarize_fn: Callable[[str, Sequence[BaseMessage]], str] = summarize) -> Dict[str, Any]:
+    """State update that trims the thread to the history policy ({} if nothing to do)."""
+    if policy == "none" or max_turns <= 0:
+        return {}
+    starts = turn_starts(messages, last=max_turns + 1)     # enough to tell whether anything must go
+    if len(starts) <= max_turns:
+        return {}
+
+    if policy == "window":
+        cut = starts[-max_turns]
+        update: Dict[str, Any] = {}
+    elif policy == "summary":
+        cut = starts[-max(1, max_turns // 2)]                  # fold the older half; next fold in ~max_turns/2 turns
+        try:
+            update = {"summary": summarize_fn(summary, messages[:cut])}
+        except Exception as e:                                 # never fail the turn because of the summary
+            print(f"History summary failed ({e}); dropping old turns without summary")
+            update = {}
+    else:
+        raise ValueError(f"Unknown HISTORY_POLICY {policy!r} (expected 'window', 'summary' or 'none')")
+
+    update["messages"] = [RemoveMessage(id=m.id) for m in messages[:cut]]
+    print(f"History: dropped {cut} messages ({len(turn_starts(messages[:cut]))} turns), policy={policy}")
+    return update
+
+
+def with_summary(system_prompt: str, summary: Optional[str]) -> str:
+    if not summary:
+        return system_prompt
+    return f"{system_prompt}\n\nSummary of the earlier conversation:\n{summary}"
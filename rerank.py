@@ -0,0 +1,190 @@
+"""
+Pluggable reranking stage for build_pinecone_retriever
+
+Every query used to go through CohereRerank(model="rerank-v3.5"): one more network round
+trip per query, and retrieval failed outright when Cohere was unreachable.
+RerankingRetriever wraps the hybrid retriever and picks the backend with cfg.RERANK_BACKEND:
+
+- "cohere": the Cohere rerank API (as before)
+- "local" : no network. Re-scores the candidates with what the index query already
+            returned (stored dense values + BM25 sparse values):
+                fused = w * minmax(cosine(query, doc)) + (1 - w) * minmax(bm25(query, doc))
+            w = cfg.RERANK_DENSE_WEIGHT. With cfg.RERANK_MMR_LAMBDA set, the top_n are picked
+            by MMR on the candidate embeddings (less near-duplicate passages).
+- "none"  : keep the index order (hybrid score)
+
+Results are cached per (backend, BM25 model version, query, candidate ids) in an LRU
+(cfg.RERANK_CACHE_SIZE), so a repeated query with the same candidates skips the rerank and
+a newly ingested BM25 model does not serve scores computed with the old one. Each returned Document
+carries metadata["relevance_score"] like the Cohere compressor's output.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict, Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+import config as cfg
+
+BACKENDS = ("cohere", "local", "none")
+
+
+# ============================================
+# Scoring (vectorized over the candidates)
+# ============================================
+def _minmax(x: np.ndarray) -> np.ndarray:
+    lo, hi = float(x.min()), float(x.max())
+    return (x - lo) / (hi - lo) if hi > lo else np.ones_like(x)
+
+
+def cosine_scores(query: Sequence[float], docs: np.ndarray) -> np.ndarray:
+    q = np.asarray(query, dtype=np.float32)
+    norms = np.linalg.norm(docs, axis=1) * (np.linalg.norm(q) or 1.0)
+    return (docs @ q) / np.where(norms > 0, norms, 1.0)
+
+
+def sparse_dot(query: Dict[str, list], docs: List[Optional[Dict[str, list]]]) -> np.ndarray:
+    """Dot product of a BM25 query vector with each doc's sparse vector (missing -> 0)."""
+    q = dict(zip(query.get("indices", []), query.get("values", [])))
+    out = np.zeros(len(docs), dtype=np.float32)
+    for i, d in enumerate(docs):
+        if d:
+            out[i] = sum(q.get(t, 0.0) * v for t, v in zip(d["indices"], d["values"]))
+    return out
+
+
+def fuse_scores(dense: np.ndarray, sparse: np.ndarray, dense_weight: float) -> np.ndarray:
+    if not sparse.any():
+        return _minmax(dense)
+    return dense_weight * _minmax(dense) + (1 - dense_weight) * _minmax(sparse)
+
+
+def mmr(relevance: np.ndarray, doc_vecs: np.ndarray, top_n: int, lambda_: float) -> List[int]:
+    """Greedy maximal marginal relevance: lambda * relevance - (1 - lambda) * max similarity to picked."""
+    unit = doc_vecs / np.maximum(np.linalg.norm(doc_vecs, axis=1, keepdims=True), 1e-12)
+    sim = unit @ unit.T
+    picked: List[int] = []
+    max_sim = np.zeros(len(relevance), dtype=np.float32)
+    available = np.ones(len(relevance), dtype=bool)
+    for _ in range(min(top_n, len(relevance))):
+        gain = np.where(available, lambda_ * relevance - (1 - lambda_) * max_sim, -np.inf)
+        best = int(np.argmax(gain))
+        picked.append(best)
+        available[best] = False
+        max_sim = np.maximum(max_sim, sim[best])
+    return picked
+
+
+def local_rerank(docs: List[Document], vectors: Dict[str, Any], bm25, top_n: int,
+                 dense_weight: Optional[float] = None,
+                 mmr_lambda: Optional[float] = None) -> List[Tuple[int, float]]:
+    """[(candidate index, relevance score)] best first, using the candidates' stored vectors.
+    dense_weight None -> cfg.RERANK_DENSE_WEIGHT (read per call); mmr_lambda None -> no MMR."""
+    if not docs:
+        return []
+    if dense_weight is None:
+        dense_weight = cfg.RERANK_DENSE_WEIGHT
+    dense_vals = vectors["dense"]
+    if any(v is None for v in dense_vals):
+        raise RuntimeError("local rerank needs the candidates' dense values (index query without include_values?)")
+    doc_vecs = np.asarray(dense_vals, dtype=np.float32)
+
+    sparse_vals = vectors["sparse"]
+    missing = [i for i, v in enumerate(sparse_vals) if v is None]
+    if missing:                                       # e.g. a dense-only index: BM25-encode the texts locally
+        encoded = bm25.encode_documents([docs[i].page_content for i in missing])
+        sparse_vals = list(sparse_vals)
+        for i, enc in zip(missing, encoded):
+            sparse_vals[i] = enc
+
+    fused = fuse_scores(cosine_scores(vectors["query_dense"], doc_vecs),
+                        sparse_dot(vectors["query_sparse"], sparse_vals), dense_weight)
+    if mmr_lambda is not None:
+        order = mmr(fused, doc_vecs, top_n, mmr_lambda)
+    else:
+        order = [int(i) for i in np.argsort(-fused, kind="stable")[:top_n]]
+    return [(i, float(fused[i])) for i in order]
+
+
+# ============================================
+# Cache + retriever
+# ============================================
+def _doc_key(doc: Document) -> str:
+    return doc.metadata.get("chunk_id") or hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()[:32]
+
+
+class RerankCache:
+    """Small thread-safe LRU: (backend, version, query, candidate ids, top_n) -> [(index, score)]."""
+
+    def __init__(self, max_size: int = cfg.RERANK_CACHE_SIZE):
+        self.max_size = max_size
+        self._items: "OrderedDict[tuple, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counts: Counter = Counter()
+
+    def get(self, key: tuple) -> Optional[list]:
+        with self._lock:
+            hit = self._items.get(key)
+            if hit is not None:
+                self._items.move_to_end(key)
+            self.counts["hits" if hit is not None else "misses"] += 1
+            return hit
+
+    def put(self, key: tuple, value: list) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._items), "hits": self.counts["hits"], "misses": self.counts["misses"]}
+
+
+class RerankingRetriever(BaseRetriever):
+    """Hybrid retriever (ChunkStoreHybridRetriever) followed by the configured rerank backend."""
+
+    base_retriever: Any
+    backend: str = cfg.RERANK_BACKEND
+    top_n: int = 3
+    compressor: Any = None            # CohereRerank for backend="cohere"
+    cache: Any = None                 # RerankCache (None -> no caching)
+    cache_version: Any = None         # BM25 model version; part of the cache key
+
+    def _rank(self, query: str, docs: List[Document], vectors) -> List[Tuple[int, float]]:
+        if self.backend == "local":
+            return local_rerank(docs, vectors, self.base_retriever.sparse_encoder, self.top_n,
+                                dense_weight=cfg.RERANK_DENSE_WEIGHT, mmr_lambda=cfg.RERANK_MMR_LAMBDA)
+        if self.backend == "cohere":
+            results = self.compressor.rerank(docs, query, top_n=self.top_n)
+            return [(r["index"], float(r["relevance_score"])) for r in results]
+        return [(i, float(d.metadata.get("score", 0.0))) for i, d in enumerate(docs[:self.top_n])]
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None, **kwargs: Any) -> List[Document]:
+        docs, vectors = self.base_retriever.search(query, include_values=self.backend == "local", **kwargs)
+        if not docs:
+            return []
+
+        key = (self.backend, self.cache_version, query, tuple(_doc_key(d) for d in docs), self.top_n)
+        ranked = self.cache.get(key) if self.cache is not None else None
+        if ranked is None:
+            ranked = self._rank(query, docs, vectors)
+            if self.cache is not None:
+                self.cache.put(key, ranked)
+
+        out = []
+        for i, score in ranked:
+            d = docs[i]
+            out.append(Document(page_content=d.page_content, metadata={**d.metadata, "relevance_score": score}))
+        return out
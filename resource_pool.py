@@ -0,0 +1,280 @@
+"""
+Process-wide resource pool for the retriever tools
+
+Building the hybrid retriever is expensive: a new Pinecone client (TLS handshake),
+re-parsing bm25_values.json, a new Cohere client ... on EVERY tool call.
+This pool builds them once per process and hands out the same objects.
+
+- get_pinecone_index()      -> cached Pinecone Index (one client per process)
+- get_bm25_encoder()        -> cached BM25Encoder (bm25_values.bin mmap or JSON; reloaded when the file changes)
+- get_reranker()            -> cached CohereRerank compressor (RERANK_BACKEND=cohere)
+- get_rerank_cache()        -> per-query rerank result cache (rerank.RerankCache)
+- get_hybrid_retriever()    -> cached RerankingRetriever per (alpha, top_k, top_n)
+- get_neo4j_graph()         -> one long-lived Neo4jGraph (pooled driver) per process
+- get_neo4j_driver()        -> pool-owned neo4j Driver for ingest's bulk writes (no KG query timeout)
+- get_chunk_store()         -> SQLite chunk texts by chunk id (vector metadata no longer carries them)
+- get_document_embeddings() -> ingest embeddings behind the SQLite embedding cache
+- fulltext_online()/...     -> cached "fulltext index is ONLINE" flag (revalidated on failure/ingest)
+
+warm()        -> call at FastAPI startup so the first user doesn't pay the setup
+refresh_bm25()-> call after ingest dumps a new BM25 model
+mark_fulltext_stale() -> call after ingest rebuilds the fulltext index
+stats()       -> hits vs rebuilds counters
+"""
+
+import os
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable
+
+import config as cfg
+
+
+def _require_neo4j_env() -> None:
+    missing = [k for k in ("NEO4J_URI", "NEO4J_USERNAME", "NEO4J_PASSWORD") if not os.getenv(k)]
+    if missing:
+        raise RuntimeError(f"Missing Neo4j env vars: {', '.join(missing)}")
+
+
+class ResourcePool:
+    """Thread-safe, lazily built cache of the retriever's heavy objects."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._stats_lock = threading.Lock()
+        self._items: Dict[Hashable, Any] = {}
+        self._bm25_mtime: float | None = None
+        self._fulltext_online: set = set()
+        self.hits: Counter = Counter()
+        self.rebuilds: Counter = Counter()
+
+    # ------------------------------------------------------------------
+    # Core: build once, then serve from cache
+    # ------------------------------------------------------------------
+    def _count(self, counter: Counter, name: str) -> None:
+        with self._stats_lock:
+            counter[name] += 1
+
+    def _get_or_build(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        name = key[0] if isinstance(key, tuple) else key
+        item = self._items.get(key)              # fast path, no build lock
+        if item is not None:
+            self._count(self.hits, name)
+            return item
+        with self._lock:
+            item = self._items.get(key)          # another thread may have built it
+            if item is None:
+                item = factory()
+                self._items[key] = item
+                self._count(self.rebuilds, name)
+            else:
+                self._count(self.hits, name)
+            return item
+
+    def _drop(self, *names: str) -> None:
+        with self._lock:
+            for key in list(self._items):
+                name = key[0] if isinstance(key, tuple) else key
+                if name in names:
+                    del self._items[key]
+
+    # ------------------------------------------------------------------
+    # Resources
+    # ------------------------------------------------------------------
+    def get_pinecone_index(self):
+        """Return the Pinecone Index object (does not create it), or the local index."""
+        def _build():
+            if cfg.VECTOR_BACKEND == "local":
+                from local_index import LocalHybridIndex
+                return LocalHybridIndex(cfg.LOCAL_INDEX_DIR)
+            from pinecone import Pinecone
+            pc = Pinecone(api_key=cfg.PINECONE_API_KEY)
+            return pc.Index(cfg.PINECONE_INDEX_NAME)
+        return self._get_or_build("pinecone_index", _build)
+
+    def _bm25_model_path(self):
+        """bm25_values.bin unless it is missing or older than bm25_values.json (e.g. an ingest with BM25_FORMAT=json)."""
+        if cfg.BM25_FORMAT == "binary" and cfg.BM25_BIN_PATH.exists():
+            if not cfg.BM25_PATH.exists() or cfg.BM25_BIN_PATH.stat().st_mtime >= cfg.BM25_PATH.stat().st_mtime:
+                return cfg.BM25_BIN_PATH
+        return cfg.BM25_PATH
+
+    def _bm25_file_mtime(self) -> float | None:
+        try:
+            return self._bm25_model_path().stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def get_bm25_encoder(self):
+        """Return the BM25 encoder, reloading it if ingest wrote a new model file."""
+        mtime = self._bm25_file_mtime()
+        if mtime != self._bm25_mtime:
+            # someone (ingest, another process) dumped a new model -> rebuild dependents
+            with self._lock:
+                if mtime != self._bm25_mtime:
+                    self._drop("bm25_encoder", "hybrid_retriever")
+                    self._bm25_mtime = mtime
+
+        def _build():
+            path = self._bm25_model_path()
+            if path.suffix == ".bin":
+                from bm25_binary import load_bm25_binary
+                return load_bm25_binary(path)      # mmap'd, binary-search lookups
+            from pinecone_text.sparse import BM25Encoder
+            return BM25Encoder().load(str(path))
+        return self._get_or_build("bm25_encoder", _build)
+
+    def get_reranker(self, top_n: int = 3):
+        """Return the Cohere reranker used as compressor."""
+        def _build():
+            import cohere
+            from langchain_cohere import CohereRerank
+            client = cohere.ClientV2(os.getenv("COHERE_API_KEY"), client_name="langchain:partner",
+                                     timeout=cfg.TOOL_TIMEOUTS["build_pinecone_retriever"])
+            return CohereRerank(model="rerank-v3.5", top_n=top_n, client=client)
+        return self._get_or_build(("reranker", top_n), _build)
+
+    def get_rerank_cache(self):
+        def _build():
+            from rerank import RerankCache
+            return RerankCache(cfg.RERANK_CACHE_SIZE)
+        return self._get_or_build("rerank_cache", _build)
+
+    def get_hybrid_retriever(self, alpha: float = 0.7, top_k: int = 5, top_n: int = 3):
+        """Return Pinecone hybrid retriever followed by the reranker (cfg.RERANK_BACKEND)."""
+        sparse_encoder = self.get_bm25_encoder()   # also checks for a newer BM25 model
+        bm25_version = self._bm25_mtime
+
+        def _build():
+            from rerank import BACKENDS, RerankingRetriever
+            from retriever import ChunkStoreHybridRetriever
+            if cfg.RERANK_BACKEND not in BACKENDS:
+                raise ValueError(f"Unknown RERANK_BACKEND {cfg.RERANK_BACKEND!r} (expected one of {BACKENDS})")
+            retriever = ChunkStoreHybridRetriever(
+                embeddings=cfg.embeddings,              # dense
+                sparse_encoder=sparse_encoder,          # sparse (BM25)
+                index=self.get_pinecone_index(),        # Pinecone Index object
+                query_timeout=cfg.TOOL_TIMEOUTS["build_pinecone_retriever"],
+                chunk_store=self.get_chunk_store(),     # texts by chunk id (None -> metadata["context"])
+                namespace=cfg.PINECONE_NAMESPACE,
+                alpha=alpha,
+                top_k=top_k,
+            )
+            return RerankingRetriever(
+                base_retriever=retriever,
+                backend=cfg.RERANK_BACKEND,
+                top_n=top_n,
+                compressor=self.get_reranker(top_n) if cfg.RERANK_BACKEND == "cohere" else None,
+                cache=self.get_rerank_cache(),
+                cache_version=bm25_version)       # shared cache: entries of an older BM25 model no longer match
+        return self._get_or_build(("hybrid_retriever", float(alpha), int(top_k), int(top_n)), _build)
+
+    def get_neo4j_graph(self):
+        """Return the shared Neo4jGraph (one driver + connection pool per process)."""
+        def _build():
+            _require_neo4j_env()
+            from langchain_neo4j import Neo4jGraph
+            return Neo4jGraph(
+                url=os.environ["NEO4J_URI"],
+                username=os.environ["NEO4J_USERNAME"],
+                password=os.environ["NEO4J_PASSWORD"],
+                database=os.environ.get("NEO4J_DATABASE", "neo4j"),
+                refresh_schema=False,
+                timeout=cfg.NEO4J_QUERY_TIMEOUT_S,
+                driver_config=cfg.NEO4J_DRIVER_CONFIG,
+            )
+        return self._get_or_build("neo4j_graph", _build)
+
+    def get_neo4j_driver(self):
+        """Return the pool's neo4j Driver for bulk writes (graph_writer); built on first ingest.
+
+        Kept apart from the Neo4jGraph so large UNWIND batches do not inherit the KG tool's
+        transaction timeout (NEO4J_QUERY_TIMEOUT_S).
+        """
+        def _build():
+            _require_neo4j_env()
+            from neo4j import GraphDatabase
+            return GraphDatabase.driver(os.environ["NEO4J_URI"],
+                                        auth=(os.environ["NEO4J_USERNAME"], os.environ["NEO4J_PASSWORD"]),
+                                        **cfg.NEO4J_DRIVER_CONFIG)
+        return self._get_or_build("neo4j_driver", _build)
+
+    def get_chunk_store(self):
+        """Return the local chunk text store (None when CHUNK_STORE_ENABLED is off)."""
+        if not cfg.CHUNK_STORE_ENABLED:
+            return None
+        def _build():
+            from chunk_store import ChunkStore
+            return ChunkStore(cfg.CHUNK_STORE_PATH)
+        return self._get_or_build("chunk_store", _build)
+
+    def get_document_embeddings(self):
+        """Embeddings for ingest: cfg.embeddings behind the persistent embedding cache (if enabled)."""
+        if not cfg.EMBED_CACHE_ENABLED:
+            return cfg.embeddings
+        def _build():
+            from embedding_cache import CachedEmbeddings, EmbeddingCache
+            return CachedEmbeddings(cfg.embeddings, EmbeddingCache(cfg.EMBED_CACHE_PATH))
+        return self._get_or_build("document_embeddings", _build)
+
+    # --- fulltext index health (checked once, then trusted until a failure or an ingest) ---
+    def fulltext_online(self, index_name: str) -> bool:
+        online = index_name in self._fulltext_online
+        self._count(self.hits if online else self.rebuilds, "fulltext_check")
+        return online
+
+    def mark_fulltext_online(self, index_name: str) -> None:
+        with self._lock:
+            self._fulltext_online.add(index_name)
+
+    def mark_fulltext_stale(self, index_name: str | None = None) -> None:
+        with self._lock:
+            if index_name is None:
+                self._fulltext_online.clear()
+            else:
+                self._fulltext_online.discard(index_name)
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    def warm(self) -> Dict[str, Any]:
+        """Build the default objects up front (FastAPI startup). Never raises."""
+        warmed, errors = [], {}
+        for name, fn in (("pinecone_index", self.get_pinecone_index),
+                         ("bm25_encoder", self.get_bm25_encoder),
+                         *((("reranker", self.get_reranker),) if cfg.RERANK_BACKEND == "cohere" else ()),
+                         ("hybrid_retriever", self.get_hybrid_retriever),
+                         *((("neo4j_graph", self.get_neo4j_graph),) if cfg.USE_KNOWLEDGE_GRAPH else ())):
+            try:
+                fn()
+                warmed.append(name)
+            except Exception as e:
+                errors[name] = str(e)
+        if errors:
+            print(f"Resource pool warm-up incomplete: {errors}")
+        return {"warmed": warmed, "errors": errors}
+
+    def refresh_bm25(self) -> None:
+        """Drop the BM25 encoder and the retrievers built on it (call after ingest)."""
+        with self._lock:
+            self._drop("bm25_encoder", "hybrid_retriever")
+            self._bm25_mtime = self._bm25_file_mtime()
+
+    def clear(self) -> None:
+        with self._lock:
+            for name in ("neo4j_graph", "neo4j_driver"):
+                item = self._items.get(name)
+                if item is not None:
+                    item.close()
+            self._items.clear()
+            self._bm25_mtime = None
+            self._fulltext_online.clear()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._stats_lock:
+            names = sorted(set(self.hits) | set(self.rebuilds))
+            return {n: {"hits": self.hits[n], "rebuilds": self.rebuilds[n]} for n in names}
+
+
+# One pool per process
+pool = ResourcePool()
@@ -3,7 +3,7 @@ Retriver Toold for Langgraph
 
 [Tool 1] = retrieve_and_format_results
 - Pinecone Dense + Sparse Retriever (hybrid)
-- Cohere ReRank + Contextual Compression wrapper
+- Reranker: Cohere API, local dense+BM25 fusion or none (cfg.RERANK_BACKEND, see rerank.py)
 
 [Tool 2] = fetch_facts_for_question
 - Neo4j Knowledge Graph: fetch facts via full‑text index
@@ -15,32 +15,100 @@ Retriver Toold for Langgraph
 # --------------------------------------------
 # Create the hybrid retriever
 # ============================================
+import inspect
+import re
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional, List, Dict, Any
-from pinecone import Pinecone
 from pinecone_text.sparse import BM25Encoder
-from langchain_community.retrievers import PineconeHybridSearchRetriever
-from langchain_cohere import CohereRerank
-from langchain.retrievers.contextual_compression import ContextualCompressionRetriever
 import os
 import config as cfg
 from langchain.tools import tool
+from resource_pool import pool
+import time
 
 ###################################################################################
 # Helper
 def _load_bm25_encoder() -> BM25Encoder:
-    """Load BM25 values dumped during ingest (cfg.BM25_PATH or bm25_values.json)."""
-    enc = BM25Encoder()
-    bm25_path = Path("bm25_values.json")
-    return enc.load(str(bm25_path))
+    """Load BM25 values dumped during ingest (cfg.BM25_BIN_PATH or cfg.BM25_PATH). Cached in the resource pool."""
+    return pool.get_bm25_encoder()
 
 # Helper
 def _get_pinecone_index():
-    """Return a Pinecone Index object (does not create it)."""
-    pc = Pinecone(api_key=cfg.PINECONE_API_KEY)
-    return pc.Index(cfg.PINECONE_INDEX_NAME)
+    """Return a Pinecone Index object (does not create it). Cached in the resource pool."""
+    return pool.get_pinecone_index()
+
+# Helper
+@lru_cache(maxsize=None)
+def _timeout_param(index_type: type) -> str:
+    """Per-request timeout keyword of Index.query: `timeout` on newer pinecone clients,
+    the OpenAPI `_request_timeout` on 7.x (LocalHybridIndex takes and ignores either)."""
+    return "timeout" if "timeout" in inspect.signature(index_type.query).parameters else "_request_timeout"
 
 # Helper
+from langchain_community.retrievers import PineconeHybridSearchRetriever
+from langchain_core.documents import Document
+
+class ChunkStoreHybridRetriever(PineconeHybridSearchRetriever):
+    """PineconeHybridSearchRetriever that reads chunk texts from the local chunk store.
+
+    Vectors only carry {"chunk_id", "source"}; the texts of all top-k matches are read in one
+    batched lookup. Matches that still have metadata["context"] (older ingests) use it as is.
+    """
+    chunk_store: Any = None
+    query_timeout: Optional[float] = None     # seconds per index query (None -> client default)
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None, **kwargs: Any) -> List[Document]:
+        return self.search(query, **kwargs)[0]
+
+    def search(self, query: str, include_values: bool = False, **kwargs: Any):
+        """(docs, vectors). With include_values, vectors has the raw query embedding / BM25 vector and
+        each doc's stored dense + sparse values (for the local reranker); otherwise it is None."""
+        from pinecone_text.hybrid import hybrid_convex_scale
+
+        query_sparse = self.sparse_encoder.encode_queries(query)
+        query_dense = self.embeddings.embed_query(query)
+        dense_vec, sparse_vec = hybrid_convex_scale(query_dense, query_sparse, self.alpha)
+        sparse_vec["values"] = [float(s1) for s1 in sparse_vec["values"]]
+        if self.query_timeout is not None:
+            kwargs.setdefault(_timeout_param(type(self.index)), self.query_timeout)
+        result = self.index.query(
+            vector=dense_vec,
+            sparse_vector=sparse_vec,
+            top_k=self.top_k,
+            include_metadata=True,
+            include_values=include_values,
+            namespace=self.namespace,
+            **kwargs,
+        )
+        matches = result["matches"]
+
+        # one read for every match without inline text
+        ids = [m["metadata"].get("chunk_id") for m in matches if self.text_key not in m["metadata"]]
+        stored = self.chunk_store.get_many(ids) if (ids and self.chunk_store is not None) else {}
+
+        docs, dense, sparse = [], [], []
+        for m in matches:
+            metadata = dict(m["metadata"])
+            text = metadata.pop(self.text_key, None)
+            if text is None:
+                text, tokens = stored.get(metadata.get("chunk_id"), (None, None))
+                if tokens is not None:
+                    metadata["tokens"] = tokens
+            if text is None:
+                print(f"Chunk store: no text for {metadata.get('chunk_id')!r}, skipping match")
+                continue
+            if "score" not in metadata and "score" in m:
+                metadata["score"] = m["score"]
+            docs.append(Document(page_content=text, metadata=metadata))
+            dense.append(m.get("values") or None)
+            sparse.append(m.get("sparse_values") or None)
+
+        if not include_values:
+            return docs, None
+        return docs, {"query_dense": query_dense, "query_sparse": query_sparse, "dense": dense, "sparse": sparse}
+
+
 @tool
 def build_pinecone_retriever(
     query,
@@ -49,38 +117,25 @@ def build_pinecone_retriever(
     # text_key = 'context'
     ) -> List[Dict[str, Any]]:
 
-    """Hybrid Pinecone retriever wrapped with Cohere ReRanker compression.
-    Returns a `ContextualCompressionRetriever` so you can call `.invoke(q)`.
+    """Hybrid Pinecone retriever followed by a reranker (Cohere, or local with RERANK_BACKEND=local).
+    Returns the top passages with their relevance scores.
     """
 
-    # --- base hybrid retriever ---
-    retriever = PineconeHybridSearchRetriever(
-        embeddings=cfg.embeddings,                 # dense
-        sparse_encoder=_load_bm25_encoder(),       # sparse (BM25)
-        index=_get_pinecone_index(),               # Pinecone Index object
-        namespace=cfg.PINECONE_NAMESPACE,
-        alpha=alpha,
-        top_k=top_k,
-        # text_key=text_key,
-    )
-
-    # --- Cohere reranker as compressor ---
-    compressor = CohereRerank(model="rerank-v3.5", 
-                              top_n= 3)
-
-    hybrid_rerank_retriever = ContextualCompressionRetriever(
-        base_compressor=compressor,
-        base_retriever=retriever) 
+    # --- hybrid retriever + reranker (built once per process, see resource_pool.py) ---
+    hybrid_rerank_retriever = pool.get_hybrid_retriever(alpha=alpha, top_k=top_k, top_n=3)
     
     docs = hybrid_rerank_retriever.invoke(query)
     out = []
     for d in docs:
         score = d.metadata.get("relevance_score") 
-        out.append({
+        item = {
             "score": score,
             "content": d.page_content,
             # "source": d.metadata.get("source") or d.metadata.get("url"),
-        })
+        }
+        if d.metadata.get("tokens") is not None:
+            item["tokens"] = int(d.metadata["tokens"])   # chunker's count, saves re-tokenizing when packing
+        out.append(item)
     return out
 
 
@@ -92,30 +147,96 @@ from langchain_neo4j import Neo4jGraph
 
 # helpers
 def _get_neo4j_graph() -> Neo4jGraph:
-    req = ["NEO4J_URI", "NEO4J_USERNAME", "NEO4J_PASSWORD"]
-    missing = [k for k in req if not os.getenv(k)]
-    if missing:
-        raise RuntimeError(f"Missing Neo4j env vars: {', '.join(missing)}")
-    return Neo4jGraph(
-        url=os.environ["NEO4J_URI"],
-        username=os.environ["NEO4J_USERNAME"],
-        password=os.environ["NEO4J_PASSWORD"],
-        database=os.environ.get("NEO4J_DATABASE", "neo4j"),
-        refresh_schema=False,
-    )
-
-def _ensure_fulltext_exists(graph: Neo4jGraph, index_name: str = "entity_fulltext") -> None:
+    """Shared Neo4jGraph with a pooled driver (built once per process, see resource_pool.py)."""
+    return pool.get_neo4j_graph()
+
+def _ensure_fulltext_exists(graph: Neo4jGraph, index_name: str = "entity_fulltext", force: bool = False) -> bool:
+    """Raise if the index isn't ONLINE. The result is cached: SHOW INDEXES only runs on the first call,
+    after a failed query, or after ingest marks it stale. Returns True if it hit the database."""
+    if not force and pool.fulltext_online(index_name):
+        return False
     rows = graph.query(
         "SHOW INDEXES YIELD name, type, state WHERE name = $n RETURN name, type, state",
         params={"n": index_name},
     )
     if not rows or rows[0].get("state") != "ONLINE":
+        pool.mark_fulltext_stale(index_name)
         raise RuntimeError(f"Fulltext index '{index_name}' missing or not ONLINE. Run ingest to create it.")
+    pool.mark_fulltext_online(index_name)
+    return True
+
+_LUCENE_SPECIAL = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+def _escape_lucene(term: str) -> str:
+    # user text must not be parsed as Lucene syntax ("c++", "covid-19", "a/b", unbalanced quotes ...)
+    return _LUCENE_SPECIAL.sub(r"\\\1", term)
 
 def _normalize(q: str) -> str:
     q = q.lower().replace("?", " ")
     terms = [t for t in q.split() if len(t) > 2]
-    return " ".join(terms) or q
+    return " ".join(_escape_lucene(t) for t in (terms or q.split()))
+
+def _is_fulltext_index_error(e: Exception) -> bool:
+    """The fulltext index is gone or not usable (dropped/rebuilt since it was cached as ONLINE).
+    Anything else (timeouts, connection errors, Cypher bugs) is not an index problem."""
+    from neo4j.exceptions import Neo4jError
+    if not isinstance(e, Neo4jError):
+        return False
+    code, message = e.code or "", (e.message or "").lower()
+    # not the whole Neo.ClientError.Procedure.* family: a Lucene parse error is a ProcedureCallFailed too
+    return code == "Neo.ClientError.Schema.IndexNotFound" or "fulltext schema index" in message
+
+def _relaxed_query(q: str) -> str:
+    # fallback: OR-joined terms for Lucene ("" when there are no usable terms: no second lookup)
+    terms = sorted({t for t in q.split() if len(t) > 2})
+    return " OR ".join(terms)
+
+# (node, score) rows -> one `fact` map per non-structural relationship of the node (or the node alone)
+_FACTS_FOR_NODES = """
+  OPTIONAL MATCH (node)-[r]-(n2)
+  WITH node, score, r, n2
+  WHERE r IS NULL
+     OR (
+          type(r) <> 'MENTIONS'
+      AND (n2 IS NULL OR NOT any(l IN labels(n2) WHERE l IN ['Chunk','Paragraph','Page','Span']))
+     )
+  WITH {
+    subject: coalesce(node.name, node.id, node.title, node.value),
+    rel: CASE WHEN r IS NULL THEN null ELSE type(r) END,
+    object: CASE WHEN n2 IS NULL THEN null ELSE coalesce(n2.name, n2.id, n2.title, n2.value) END,
+    source: coalesce(r.source, node.source, CASE WHEN n2 IS NULL THEN null ELSE n2.source END),
+    score: score
+  } AS fact"""
+
+# Exact (tier 0) and relaxed OR-joined (tier 1) Lucene queries in ONE round trip.
+# Same result as two queries: facts from the exact query; the relaxed lookup only runs
+# (server side) when the exact one produced no facts and the relaxed query differs from it.
+_FACTS_CYPHER = f"""
+CALL {{
+  CALL db.index.fulltext.queryNodes('entity_fulltext', $q)
+  YIELD node, score
+  WITH node, score
+  ORDER BY score DESC
+  LIMIT $top_nodes
+  {_FACTS_FOR_NODES}
+  RETURN collect(fact) AS exact
+}}
+CALL {{
+  WITH exact
+  WITH exact WHERE size(exact) = 0 AND $q_relaxed <> '' AND $q_relaxed <> $q
+  CALL db.index.fulltext.queryNodes('entity_fulltext', $q_relaxed)
+  YIELD node, score
+  WITH node, score
+  ORDER BY score DESC
+  LIMIT $top_nodes
+  {_FACTS_FOR_NODES}
+  RETURN collect(fact) AS relaxed
+}}
+UNWIND exact + relaxed AS f
+RETURN f.subject AS subject, f.rel AS rel, f.object AS object, f.source AS source, f.score AS score
+ORDER BY score DESC
+LIMIT $max_facts
+"""
 
 # Enf of helpers code
 ##############################################################################
@@ -127,45 +248,37 @@ def fetch_facts_for_question(query: str,
 
     '''Use this tool for specific questions about entities and their relationships.'''
 
-    graph = _get_neo4j_graph()
-    _ensure_fulltext_exists(graph, "entity_fulltext")
-
-    cypher = """
-    CALL db.index.fulltext.queryNodes('entity_fulltext', $q)
-    YIELD node, score
-    WITH node, score
-    ORDER BY score DESC
-    LIMIT $top_nodes
-
-    OPTIONAL MATCH (node)-[r]-(n2)
-    WITH node, score, r, n2
-    WHERE r IS NULL
-       OR (
-            type(r) <> 'MENTIONS'
-        AND (n2 IS NULL OR NOT any(l IN labels(n2) WHERE l IN ['Chunk','Paragraph','Page','Span']))
-       )
-
-    WITH
-      coalesce(node.name, node.id, node.title, node.value) AS subject,
-      CASE WHEN r IS NULL THEN null ELSE type(r) END AS rel,
-      CASE WHEN n2 IS NULL THEN null ELSE coalesce(n2.name, n2.id, n2.title, n2.value) END AS object,
-      coalesce(r.source, node.source, CASE WHEN n2 IS NULL THEN null ELSE n2.source END) AS source,
-      score
-    RETURN subject, rel, object, source, score
-    ORDER BY score DESC
-    LIMIT $max_facts
-    """
-
     q1 = _normalize(query)
-    rows = graph.query(cypher, params={"q": q1, "top_nodes": int(top_nodes), "max_facts": int(max_facts)})
-
-    if not rows:
-        # fallback: OR-joined terms for Lucene
-        terms = list({t for t in q1.split() if len(t) > 2})
-        if terms:
-            q2 = " OR ".join(terms)
-            rows = graph.query(cypher, params={"q": q2, "top_nodes": int(top_nodes), "max_facts": int(max_facts)})
+    if not q1:                                   # e.g. "?": nothing to look up, and "" is not a Lucene query
+        return []
 
+    timings = {}
+    t0 = time.perf_counter()
+    graph = _get_neo4j_graph()
+    timings["connect_ms"] = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    checked = _ensure_fulltext_exists(graph, "entity_fulltext")
+    timings["index_check_ms"] = (time.perf_counter() - t0) * 1000
+
+    cypher = _FACTS_CYPHER
+    params = {"q": q1, "q_relaxed": _relaxed_query(q1),
+              "top_nodes": int(top_nodes), "max_facts": int(max_facts)}
+
+    t0 = time.perf_counter()
+    try:
+        rows = graph.query(cypher, params=params)
+    except Exception as e:
+        if not _is_fulltext_index_error(e):
+            raise
+        # index may have been dropped/rebuilt since we cached it as ONLINE -> revalidate, retry once
+        pool.mark_fulltext_stale("entity_fulltext")
+        checked = _ensure_fulltext_exists(graph, "entity_fulltext", force=True)
+        rows = graph.query(cypher, params=params)
+    timings["query_ms"] = (time.perf_counter() - t0) * 1000
+
+    print("KG latency: " + ", ".join(f"{k}={v:.1f}" for k, v in timings.items())
+          + f" (index check {'ran' if checked else 'cached'}, rows={len(rows)})")
     return rows
 
 # ======================================================
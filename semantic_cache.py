@@ -0,0 +1,200 @@
+"""
+Semantic answer cache in front of the agent
+
+Near-identical questions ("who is discaya?" / "Who is Discaya") skip the whole agent run
+(2 LLM calls, Pinecone, Cohere, Neo4j) when a past question's embedding is close enough.
+
+- lookup(embedding)  -> cached {"query", "answer", "tool_results"} if cosine >= threshold
+- add(...)           -> store a new answer (LRU eviction past max_size)
+- invalidate()       -> drop everything (call after /ingest changes the corpus)
+- generation         -> bumped by invalidate(); add(..., generation=g) is skipped when the answer
+                        was computed before the last invalidate (the corpus changed mid-run)
+- save()/load        -> optional persistence (.npz vectors + .json entries)
+- stats()            -> hits / misses / evictions / size
+
+Embeddings are L2-normalized here, so cosine = dot product (one matrix-vector product per lookup).
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+import numpy as np
+
+
+def _atomic_write(path: Path, write) -> None:
+    """write(binary file) into a temp file next to path, then rename it over path."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+class SemanticCache:
+    """Bounded LRU cache of answers keyed by question embedding."""
+
+    def __init__(self, threshold: float = 0.95, max_size: int = 1000,
+                 path: Optional[str | Path] = None, save_every: int = 20):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.path = Path(path) if path else None
+        self.save_every = save_every
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()   # LRU order, oldest first
+        self._vecs: Optional[np.ndarray] = None      # [max_size, dim], rows 0.._size-1 in use
+        self._row_ids: List[str] = []
+        self._unsaved = 0
+        self.generation = 0
+        self.hits = self.misses = self.evictions = self.invalidations = self.stale_skips = 0
+
+        if self.path:
+            self._load()
+
+    # ------------------------------------------------------------------
+    # Lookup / insert
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        v = np.asarray(embedding, dtype=np.float32)
+        n = np.linalg.norm(v)
+        return v / n if n else v
+
+    def lookup(self, embedding) -> Optional[Dict[str, Any]]:
+        q = self._normalize(embedding)
+        with self._lock:
+            if not self._row_ids or q.shape[0] != self._vecs.shape[1]:
+                self.misses += 1
+                return None
+            sims = self._vecs[:len(self._row_ids)] @ q
+            row = int(np.argmax(sims))
+            if sims[row] < self.threshold:
+                self.misses += 1
+                return None
+            entry_id = self._row_ids[row]
+            self._entries.move_to_end(entry_id)                # most recently used
+            self.hits += 1
+            entry = self._entries[entry_id]
+            return {"query": entry["query"], "answer": entry["answer"],
+                    "tool_results": entry["tool_results"], "similarity": float(sims[row])}
+
+    def add(self, query: str, embedding, answer: str, tool_results: List[Dict[str, Any]],
+            generation: Optional[int] = None) -> None:
+        if self.max_size <= 0:                               # SEMANTIC_CACHE_MAX_SIZE=0: cache disabled
+            return
+        v = self._normalize(embedding)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                self.stale_skips += 1
+                return
+            if self._vecs is None or self._vecs.shape[1] != v.shape[0]:
+                self._clear_locked()
+                self._vecs = np.zeros((self.max_size, v.shape[0]), dtype=np.float32)
+            if len(self._row_ids) >= self.max_size:
+                self._evict_lru_locked()
+            entry_id = uuid4().hex
+            row = len(self._row_ids)
+            self._vecs[row] = v
+            self._row_ids.append(entry_id)
+            self._entries[entry_id] = {"query": query, "answer": answer, "tool_results": tool_results,
+                                       "row": row, "created": time.time()}
+            self._unsaved += 1
+            should_save = self.path is not None and self._unsaved >= self.save_every
+        if should_save:
+            self.save()
+
+    def _evict_lru_locked(self) -> None:
+        entry_id, entry = self._entries.popitem(last=False)
+        row, last = entry["row"], len(self._row_ids) - 1
+        if row != last:                                      # swap-remove keeps rows dense
+            moved = self._row_ids[last]
+            self._vecs[row] = self._vecs[last]
+            self._row_ids[row] = moved
+            self._entries[moved]["row"] = row
+        self._row_ids.pop()
+        self.evictions += 1
+
+    # ------------------------------------------------------------------
+    # Invalidation / metrics
+    # ------------------------------------------------------------------
+    def _clear_locked(self) -> None:
+        self._entries.clear()
+        self._row_ids.clear()
+        self._vecs = None
+
+    def invalidate(self) -> None:
+        """Forget every cached answer (the corpus changed)."""
+        with self._lock:
+            self._clear_locked()
+            self.generation += 1
+            self.invalidations += 1
+            self._unsaved = 0
+        if self.path:
+            for p in (self.path.with_suffix(".npz"), self.path.with_suffix(".json")):
+                p.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"size": len(self._row_ids), "max_size": self.max_size, "threshold": self.threshold,
+                    "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                    "evictions": self.evictions, "invalidations": self.invalidations,
+                    "stale_skips": self.stale_skips}
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            n = len(self._row_ids)
+            vecs = self._vecs[:n].copy() if n else np.zeros((0, 0), dtype=np.float32)
+            entries = [{"id": eid, **{k: v for k, v in e.items() if k != "row"}}
+                       for eid, e in self._entries.items()]          # LRU order
+            row_ids = list(self._row_ids)
+            self._unsaved = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # each file is replaced atomically; a crash between the two leaves a mismatched pair,
+        # which _load tolerates (entries are joined to vector rows by id)
+        _atomic_write(self.path.with_suffix(".npz"),
+                      lambda f: np.savez(f, vecs=vecs, row_ids=np.array(row_ids, dtype=str)))
+        _atomic_write(self.path.with_suffix(".json"),
+                      lambda f: f.write(json.dumps(entries, ensure_ascii=False).encode("utf-8")))
+
+    def _load(self) -> None:
+        npz, js = self.path.with_suffix(".npz"), self.path.with_suffix(".json")
+        if self.max_size <= 0 or not (npz.exists() and js.exists()):
+            return
+        try:
+            data = np.load(npz)
+            vecs, row_ids = data["vecs"], [str(r) for r in data["row_ids"]]
+            entries = json.loads(js.read_text(encoding="utf-8"))
+        except Exception as e:
+            print(f"Semantic cache: ignoring unreadable cache files ({e})")
+            return
+        if not row_ids:
+            return
+        row_of = {eid: i for i, eid in enumerate(row_ids)}
+        self._vecs = np.zeros((self.max_size, vecs.shape[1]), dtype=np.float32)
+        for e in entries[-self.max_size:]:
+            old_row = row_of.get(e["id"])
+            if old_row is None:
+                continue
+            row = len(self._row_ids)
+            self._vecs[row] = vecs[old_row]
+            self._row_ids.append(e["id"])
+            self._entries[e["id"]] = {"query": e["query"], "answer": e["answer"],
+                                      "tool_results": e["tool_results"], "row": row,
+                                      "created": e.get("created", 0.0)}
@@ -0,0 +1,96 @@
+"""
+Shared test setup
+
+config.py builds the DeepInfra LLM / embedding clients at import time. They only need
+a model name to be constructed (no request is made), so dummy values are enough here.
+Tests never touch Pinecone, Neo4j, Cohere or DeepInfra.
+"""
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+for key in ("GEN_MODEL", "EMBED_MODEL", "DEEPINFRA_API_KEY"):
+    os.environ.setdefault(key, "test")
+os.environ.setdefault("MEMORY_BACKEND", "memory")     # agent graphs built in tests keep no sqlite file
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def bm25_encoder_cls():
+    """pinecone_text's BM25Encoder, or skip when its NLTK data (stopwords / punkt) is not installed."""
+    from pinecone_text.sparse import BM25Encoder
+    try:
+        BM25Encoder()
+    except LookupError as e:
+        pytest.skip(f"NLTK data missing: {str(e).strip().splitlines()[0]}")
+    return BM25Encoder
+
+
+@pytest.fixture
+def fake_encoding(monkeypatch):
+    """tiktoken's cl100k_base needs a download; use a byte-level encoding under the same name
+    (one token per UTF-8 byte) and reset the modules that cache the encoding / splitter."""
+    import tiktoken
+
+    import context_pack
+    import data_process
+    enc = tiktoken.Encoding(name="cl100k_base", pat_str=r"\s*\S+|\s+",
+                            mergeable_ranks={bytes([i]): i for i in range(256)}, special_tokens={})
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: enc)
+    for module, attr in ((data_process, "_ENCODING"), (data_process, "_SPLITTER"), (context_pack, "_ENCODING")):
+        monkeypatch.setattr(module, attr, None)
+    return enc
+
+
+class ScriptedModel:
+    """Chat model stand-in: asks for one `lookup` call per question, then answers from its result.
+    Records which API (invoke / ainvoke) ran on which thread."""
+
+    def __init__(self):
+        self.calls = []
+
+    def _reply(self, messages):
+        from langchain_core.messages import AIMessage, HumanMessage
+        last = messages[-1]
+        if isinstance(last, HumanMessage):
+            return AIMessage(content="", tool_calls=[
+                {"name": "lookup", "args": {"query": last.content}, "id": f"call-{len(self.calls)}", "type": "tool_call"}])
+        return AIMessage(content=f"answer from {last.content}")
+
+    def invoke(self, messages):
+        import threading
+        self.calls.append(("invoke", threading.current_thread().name))
+        return self._reply(messages)
+
+    async def ainvoke(self, messages):
+        import threading
+        self.calls.append(("ainvoke", threading.current_thread().name))
+        return self._reply(messages)
+
+
+class LookupTool:
+    name = "lookup"
+
+    def __init__(self, fn=None):
+        self.fn = fn or (lambda q: f"result for {q}")
+
+    def invoke(self, query):
+        return self.fn(query)
+
+
+@pytest.fixture
+def scripted_agent(monkeypatch):
+    """agent module with the LLM and tools replaced by ScriptedModel / LookupTool (no network).
+    Returns (agent module, model, tools dict); build graphs with agent.get_agent_runnable()."""
+    pytest.importorskip("langchain")
+    import agent
+    model = ScriptedModel()
+    tools = {"lookup": LookupTool()}
+    monkeypatch.setattr(agent, "model", model)
+    monkeypatch.setattr(agent, "tools_dict", tools)
+    monkeypatch.setattr(agent.cfg, "CONTEXT_PACKING", False)
+    return agent, model, tools
@@ -0,0 +1,71 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("langchain")
+
+from langchain_core.messages import HumanMessage, ToolMessage  # noqa: E402
+
+from conftest import LookupTool  # noqa: E402
+
+
+def test_sync_graph_runs_tools_and_answers(scripted_agent):
+    agent, model, _ = scripted_agent
+    rag_agent = agent.get_agent_runnable(prefetch=False)
+    out = rag_agent.invoke({"messages": [HumanMessage(content="q1")]}, {"configurable": {"thread_id": "t"}})
+    assert out["messages"][-1].content == "answer from result for q1"
+    assert [kind for kind, _ in model.calls] == ["invoke", "invoke"]
+    turn = agent.turn_messages(out)
+    assert isinstance(turn[0], HumanMessage) and turn[0].content == "q1"
+    assert [m.content for m in turn if isinstance(m, ToolMessage)] == ["result for q1"]
+
+
+def test_async_graph_awaits_the_model_on_the_event_loop(scripted_agent):
+    agent, model, _ = scripted_agent
+    rag_agent = agent.get_agent_runnable(prefetch=False)
+    config = {"configurable": {"thread_id": "t"}}
+
+    async def run():
+        await rag_agent.ainvoke({"messages": [HumanMessage(content="q1")]}, config)
+        return await rag_agent.ainvoke({"messages": [HumanMessage(content="q2")]}, config)
+
+    out = asyncio.run(run())
+    assert out["messages"][-1].content == "answer from result for q2"
+    assert {kind for kind, _ in model.calls} == {"ainvoke"}
+    assert {thread for _, thread in model.calls} == {threading.current_thread().name}
+    turn = agent.turn_messages(out)
+    assert turn[0].content == "q2" and len(out["messages"]) == 8
+
+
+def test_prefetch_runs_both_retrievers_before_the_first_model_call(scripted_agent, monkeypatch):
+    agent, model, tools = scripted_agent
+    seen = []
+    for name in agent.PREFETCH_TOOLS:
+        monkeypatch.setitem(tools, name, LookupTool(lambda q, name=name: seen.append(name) or f"{name}: {q}"))
+    rag_agent = agent.get_agent_runnable(prefetch=True)
+    out = rag_agent.invoke({"messages": [HumanMessage(content="q1")]}, {"configurable": {"thread_id": "t"}})
+
+    assert sorted(seen) == sorted(agent.PREFETCH_TOOLS)
+    assert len(model.calls) == 1                       # answered from the prefetched results
+    calls = out["messages"][1].tool_calls
+    assert [c["name"] for c in calls] == agent.PREFETCH_TOOLS
+    assert all(c["args"] == {"query": "q1"} for c in calls)
+    results = [m for m in agent.turn_messages(out) if isinstance(m, ToolMessage)]
+    assert [m.tool_call_id for m in results] == [c["id"] for c in calls]
+
+
+def test_turn_start_points_at_the_new_question_after_trimming(scripted_agent):
+    agent, _, _ = scripted_agent
+    rag_agent = agent.get_agent_runnable(prefetch=False)
+    config = {"configurable": {"thread_id": "t"}}
+    turns = agent.cfg.HISTORY_MAX_TURNS + 3
+    for t in range(turns):
+        out = rag_agent.invoke({"messages": [HumanMessage(content=f"q{t}")]}, config)
+
+    humans = [m.content for m in out["messages"] if isinstance(m, HumanMessage)]
+    if agent.cfg.HISTORY_POLICY == "window":
+        assert humans == [f"q{t}" for t in range(3, turns)]
+    turn = agent.turn_messages(out)
+    assert turn[0].content == f"q{turns - 1}" and len(turn) == 4
+    assert out["messages"][out["turn_start"]] is turn[0]
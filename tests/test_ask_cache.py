@@ -0,0 +1,90 @@
+import hashlib
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain")
+pytest.importorskip("fastapi")
+
+
+class FakeEmbeddings:
+    def embed_query(self, text):
+        v = np.zeros(64, dtype=np.float32)       # one-hot: same question (case / "?" aside) -> same vector
+        v[int(hashlib.md5(text.lower().strip(" ?").encode()).hexdigest(), 16) % 64] = 1.0
+        return v.tolist()
+
+
+@pytest.fixture
+def app(scripted_agent, monkeypatch):
+    import main
+    from semantic_cache import SemanticCache
+    agent, model, tools = scripted_agent
+    monkeypatch.setattr(main, "rag_agent", agent.get_agent_runnable(prefetch=False))
+    monkeypatch.setattr(main, "tools_dict", tools)
+    monkeypatch.setattr(main, "semantic_cache", SemanticCache(threshold=0.99))
+    monkeypatch.setattr(main.cfg, "SEMANTIC_CACHE_ENABLED", True)
+    monkeypatch.setattr(main.cfg, "embeddings", FakeEmbeddings())
+    return main, model, tools
+
+
+def stream(main, query, thread_id):
+    from fastapi.testclient import TestClient
+    with TestClient(main.app) as client:
+        body = client.post("/ask/stream", json={"query": query, "thread_id": thread_id}).text
+    events = [block.split("\n") for block in body.strip().split("\n\n")]
+    return {e[0][len("event: "):]: json.loads(e[1][len("data: "):]) for e in events}
+
+
+def test_first_question_is_cached_and_follow_ups_are_not(app):
+    main, model, _ = app
+    first = main.ask(main.AskRequest(query="who owns it?", thread_id="a"))
+    assert main.semantic_cache.stats()["size"] == 1
+
+    # same words as a follow-up in another thread: must not get thread "a"'s answer, and is not stored
+    main.ask(main.AskRequest(query="tell me about the senate", thread_id="b"))
+    calls = len(model.calls)
+    follow_up = main.ask(main.AskRequest(query="who owns it?", thread_id="b"))
+    assert len(model.calls) > calls                       # the agent ran
+    assert follow_up.answer == first.answer               # scripted model; what matters is the run above
+    assert main.semantic_cache.stats()["size"] == 2       # "a"'s question + "b"'s first question only
+
+    calls = len(model.calls)
+    hit = main.ask(main.AskRequest(query="Who owns it", thread_id="c"))   # new thread: served from cache
+    assert len(model.calls) == calls and hit.answer == first.answer
+    state = main.rag_agent.get_state({"configurable": {"thread_id": "c"}}).values
+    assert [m.content for m in state["messages"]] == ["Who owns it", first.answer]
+
+
+def test_answer_is_not_stored_when_the_cache_was_invalidated_meanwhile(app, monkeypatch):
+    main, _, tools = app
+    tools["lookup"].fn = lambda q: main.semantic_cache.invalidate() or f"result for {q}"   # ingest mid-run
+    main.ask(main.AskRequest(query="q", thread_id="a"))
+    assert main.semantic_cache.stats()["size"] == 0
+    assert main.semantic_cache.stats()["stale_skips"] == 1
+
+
+def test_stream_tool_results_come_from_the_final_state(app):
+    main, _, tools = app
+    tools["lookup"].fn = lambda q: 1 / 0
+    done = stream(main, "q", "s")["done"]
+    assert done["tool_results"] == [{"name": "lookup", "content": "Tool error: division by zero"}]
+    assert main.semantic_cache.stats()["size"] == 0       # answers built on tool errors are not cached
+
+    tools["lookup"].fn = lambda q: f"result for {q}"
+    done = stream(main, "q2", "s2")["done"]
+    assert done["tool_results"] == [{"name": "lookup", "content": "result for q2"}]
+    assert main.semantic_cache.stats()["size"] == 1
+
+
+def test_graph_stage_invalidates_answers_cached_after_the_vectors_stage(app, tmp_path, monkeypatch):
+    main, _, _ = app
+    monkeypatch.setattr(main, "load_chunks", lambda path: [])
+    monkeypatch.setattr(main, "upsert_knowledge_graph_from_chunks", lambda chunks, llm: {"nodes": 0})
+    main.semantic_cache.add("q", FakeEmbeddings().embed_query("q"), "old KG answer", [])
+    generation = main.semantic_cache.generation
+
+    job = {"params": {"enable_graph": True}}
+    assert main._run_ingest_stage("graph", job, tmp_path) == {"nodes": 0}
+    assert main.semantic_cache.lookup(FakeEmbeddings().embed_query("q")) is None
+    assert main.semantic_cache.generation == generation + 1
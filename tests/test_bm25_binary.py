@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from bm25_binary import MmapDocFreq, load_bm25_binary, read_bm25_header, write_bm25_binary
+
+PARAMS = {"n_docs": 4, "avgdl": 7.5, "b": 0.75, "k1": 1.2, "lower_case": True, "remove_punctuation": True,
+          "remove_stopwords": False, "stem": True, "language": "english",
+          "doc_freq": {"indices": [30, 10, 20], "values": [1.0, 3.0, 2.0]}}
+
+
+def test_header_round_trip(tmp_path):
+    path = write_bm25_binary(PARAMS, tmp_path / "bm25.bin")
+    h = read_bm25_header(path)
+    assert (h["n_docs"], h["avgdl"], h["n_terms"], h["language"]) == (4, 7.5, 3, "english")
+    assert h["remove_stopwords"] is False and h["stem"] is True
+
+
+def test_bad_magic_is_rejected(tmp_path):
+    path = tmp_path / "bm25.bin"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        read_bm25_header(path)
+
+
+def test_mmap_doc_freq_lookup():
+    df = MmapDocFreq(np.array([10, 20, 30], dtype=np.uint32), np.array([3, 2, 1], dtype=np.uint32))
+    assert df.lookup([20, 99, 10], default=1).tolist() == [2.0, 1.0, 3.0]
+    assert df[30] == 1 and 99 not in df
+    assert dict(df) == {10: 3, 20: 2, 30: 1}
+    assert MmapDocFreq(np.zeros(0, np.uint32), np.zeros(0, np.uint32)).lookup([5]).tolist() == [1.0]
+
+
+def test_mmap_encoder_matches_bm25_encoder(tmp_path, bm25_encoder_cls):
+    texts = ["the senate hearing on flood control", "flood control contracts were awarded",
+             "ghost flood control projects", "the public works secretary resigned"]
+    ref = bm25_encoder_cls().fit(texts)
+    enc = load_bm25_binary(write_bm25_binary(ref.get_params(), tmp_path / "bm25.bin"))
+    for q in ["flood control", "ghost projects in the senate", "unknownword"]:
+        got, want = enc.encode_queries(q), ref.encode_queries(q)
+        assert got["indices"] == want["indices"]
+        assert got["values"] == pytest.approx(want["values"])
+    doc = enc.encode_documents(texts[0])
+    assert doc == ref.encode_documents(texts[0])
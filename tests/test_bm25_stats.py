@@ -0,0 +1,102 @@
+import json
+from collections import Counter
+
+import pytest
+
+from bm25_stats import BM25Stats
+
+
+class WordCounter:
+    """Stands in for BM25Encoder._tf (whitespace tokens, term id = word length) so no NLTK data is needed."""
+
+    def _tf(self, text):
+        counts = Counter(len(w) for w in text.split())
+        return list(counts), list(counts.values())
+
+
+def new_stats(tmp_path, **kwargs):
+    stats = BM25Stats.load(tmp_path / "stats.json", tmp_path / "model.json", tmp_path / "sources", **kwargs)
+    stats._tf_encoder = WordCounter()
+    return stats
+
+
+def save(stats, tmp_path):
+    stats.save(tmp_path / "stats.json", tmp_path / "model.json")
+
+
+def test_add_and_remove_source(tmp_path):
+    stats = new_stats(tmp_path)
+    info = stats.add_texts(["a bb", "bb ccc ccc", ""], source="one.pdf")
+    assert info == {"source_docs": 2, "new_terms": 3, "corpus_docs": 2}
+    stats.add_texts(["a"], source="two.pdf")
+    assert (stats.n_docs, stats.sum_doc_len) == (3, 6.0)
+    assert stats.doc_freq == Counter({1: 2, 2: 2, 3: 1})
+    assert stats.avgdl == 2.0
+
+    assert stats.remove_source("one.pdf")
+    assert not stats.remove_source("one.pdf")
+    assert (stats.n_docs, stats.sum_doc_len, stats.doc_freq) == (1, 1.0, Counter({1: 1}))
+
+
+def test_readding_a_source_replaces_it(tmp_path):
+    stats = new_stats(tmp_path)
+    stats.add_texts(["a bb", "ccc"], source="one.pdf")
+    stats.add_texts(["dddd"], source="one.pdf")
+    assert (stats.n_docs, stats.doc_freq) == (1, Counter({4: 1}))
+
+
+def test_save_and_load_round_trip(tmp_path):
+    stats = new_stats(tmp_path)
+    stats.add_texts(["a bb", "bb ccc"], source="one.pdf")
+    stats.add_texts(["dddd"], source="two.pdf")
+    save(stats, tmp_path)
+
+    loaded = new_stats(tmp_path)
+    assert (loaded.n_docs, loaded.sum_doc_len, loaded.doc_freq) == (stats.n_docs, stats.sum_doc_len, stats.doc_freq)
+    assert loaded.to_params() == stats.to_params()
+    assert json.loads((tmp_path / "model.json").read_text()) == stats.to_params()
+
+    loaded.remove_source("one.pdf")                  # counts come from that source's own file
+    assert (loaded.n_docs, loaded.doc_freq) == (1, Counter({4: 1}))
+
+
+def test_save_writes_only_touched_sources(tmp_path):
+    stats = new_stats(tmp_path)
+    stats.add_texts(["a"], source="one.pdf")
+    stats.add_texts(["bb"], source="two.pdf")
+    save(stats, tmp_path)
+    files = {p.name: p.stat().st_mtime_ns for p in (tmp_path / "sources").iterdir()}
+    assert len(files) == 2
+
+    stats = new_stats(tmp_path)
+    stats.add_texts(["ccc"], source="three.pdf")
+    stats.add_texts(["dddd"], source="two.pdf")      # replaced: old file removed after the save
+    save(stats, tmp_path)
+    after = {p.name: p.stat().st_mtime_ns for p in (tmp_path / "sources").iterdir()}
+    assert len(after) == 3
+    one = stats.sources["one.pdf"]
+    assert after[one] == files[one]                  # untouched source is not rewritten
+
+    stats.remove_source("three.pdf")
+    save(stats, tmp_path)
+    assert len(list((tmp_path / "sources").iterdir())) == 2
+    assert new_stats(tmp_path).n_docs == 2
+
+
+def test_legacy_model_is_not_adopted(tmp_path):
+    (tmp_path / "model.json").write_text(json.dumps({"n_docs": 5, "avgdl": 3.0}))
+    stats = new_stats(tmp_path)
+    assert stats.n_docs == 0 and not stats.sources
+    stats.add_texts(["a bb"], source="one.pdf")
+    assert stats.n_docs == 1
+
+
+def test_encoder_matches_fitted_bm25(tmp_path, bm25_encoder_cls):
+    texts = ["the senate hearing on flood control", "flood control contracts were awarded", "ghost projects"]
+    stats = BM25Stats.load(tmp_path / "stats.json", tmp_path / "model.json", tmp_path / "sources")
+    stats.add_texts(texts[:2], source="one.pdf")
+    stats.add_texts(texts[2:], source="two.pdf")
+    fitted = bm25_encoder_cls().fit(texts)
+    got, want = stats.encoder().encode_queries("flood control"), fitted.encode_queries("flood control")
+    assert got["indices"] == want["indices"]
+    assert got["values"] == pytest.approx(want["values"])
@@ -0,0 +1,36 @@
+import pytest
+from langchain_core.embeddings import Embeddings as BaseEmbeddings
+
+pytest.importorskip("langchain")
+
+import retriever  # noqa: E402
+from chunk_store import ChunkStore  # noqa: E402
+from local_index import LocalHybridIndex  # noqa: E402
+
+
+class Embeddings(BaseEmbeddings):
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+
+class BM25:
+    def encode_queries(self, text):
+        return {"indices": [1], "values": [1.0]}
+
+
+def test_texts_and_token_counts_come_from_the_chunk_store(tmp_path):
+    index = LocalHybridIndex(tmp_path / "index")
+    index.upsert([{"id": "new", "values": [1.0, 0.0], "metadata": {"chunk_id": "new", "source": "a.pdf"}},
+                  {"id": "old", "values": [0.5, 0.0], "metadata": {"source": "b.pdf", "context": "inline text",
+                                                                   "tokens": 2.0}},
+                  {"id": "lost", "values": [0.2, 0.0], "metadata": {"chunk_id": "lost", "source": "c.pdf"}}])
+    store = ChunkStore(tmp_path / "chunks.sqlite")
+    store.put_many([("new", "a.pdf", "stored text", 7)])
+    r = retriever.ChunkStoreHybridRetriever(embeddings=Embeddings(), sparse_encoder=BM25(), index=index,
+                                            chunk_store=store, top_k=5)
+    docs = r.invoke("q")
+    assert [(d.page_content, d.metadata.get("tokens")) for d in docs] == [("stored text", 7), ("inline text", 2.0)]
+    store.close()
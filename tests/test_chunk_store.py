@@ -0,0 +1,72 @@
+import threading
+
+from chunk_store import ChunkStore
+
+
+def test_put_get_delete(tmp_path):
+    store = ChunkStore(tmp_path / "chunks.sqlite")
+    store.put_many([("a", "x.pdf", "text a", 2), ("b", "x.pdf", "text b", 2), ("c", "y.pdf", "text c", None)])
+    store.put_many([("a", "x.pdf", "text a2", 3)])
+    assert store.get_many(["a", "c", "missing", "", "a"]) == {"a": ("text a2", 3), "c": ("text c", None)}
+    assert store.get_many([]) == {}
+    assert store.delete_source("x.pdf") == 2
+    assert store.count() == 1
+    store.close()
+
+
+def test_threads_read_through_their_own_connections(tmp_path):
+    store = ChunkStore(tmp_path / "chunks.sqlite")
+    store.put_many([("a", "x.pdf", "committed", 1)])
+
+    writer = store._writer
+    writer.execute("BEGIN IMMEDIATE")                  # an ingest mid-transaction holds the write lock
+    writer.execute("INSERT INTO chunks (id, source, text) VALUES ('b', 'x.pdf', 'pending')")
+
+    seen, conns = [], []
+
+    def read():
+        conns.append(store._conn())
+        seen.append(store.get_many(["a", "b"]))
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for t in readers:
+        t.start()
+    for t in readers:
+        t.join(timeout=5)
+    assert seen == [{"a": ("committed", 1)}] * 4            # WAL: not blocked, and no uncommitted rows
+    assert len({id(c) for c in conns} | {id(writer)}) == 5
+    assert writer not in conns
+
+    writer.commit()
+    assert store.get_many(["b"]) == {"b": ("pending", None)}
+    store.close()
+
+
+def test_store_without_the_tokens_column_is_upgraded(tmp_path):
+    import sqlite3
+    path = tmp_path / "chunks.sqlite"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE chunks (id TEXT PRIMARY KEY, source TEXT NOT NULL, text TEXT NOT NULL) WITHOUT ROWID")
+    conn.execute("INSERT INTO chunks VALUES ('old', 'x.pdf', 'old text')")
+    conn.commit()
+    conn.close()
+
+    store = ChunkStore(path)
+    store.put_many([("new", "x.pdf", "new text", 2)])
+    assert store.get_many(["old", "new"]) == {"old": ("old text", None), "new": ("new text", 2)}
+    store.close()
+
+
+def test_writes_from_short_lived_threads_share_one_connection(tmp_path):
+    store = ChunkStore(tmp_path / "chunks.sqlite")
+    opened = len(store._conns)
+    for i in range(5):                                     # e.g. one encode thread per ingest
+        t = threading.Thread(target=store.put_many, args=([(f"c{i}", "x.pdf", "text", 1)],))
+        t.start()
+        t.join(timeout=5)
+        t = threading.Thread(target=store.delete_source, args=("y.pdf",))
+        t.start()
+        t.join(timeout=5)
+    assert len(store._conns) == opened
+    assert store.count() == 5
+    store.close()
@@ -0,0 +1,72 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import data_process
+from data_process import iter_chunks, iter_markdown_chunks
+from langchain_core.documents import Document
+
+
+def markdown(n_sections):
+    return "\n\n".join(f"## Section {i}\n\n" + f"word{i} " * 150 for i in range(n_sections))
+
+
+def test_chunks_carry_their_token_count(fake_encoding):
+    doc = Document(page_content=markdown(4), metadata={"source": "a.pdf"})
+    chunks = list(iter_chunks([doc]))
+    assert len(chunks) > 1
+    for c in chunks:
+        assert c.metadata["source"] == "a.pdf"
+        assert c.metadata["tokens"] == len(fake_encoding.encode(c.page_content)) <= 400
+
+
+class ThreadPool(ThreadPoolExecutor):
+    """ProcessPoolExecutor stand-in (the fake encoding isn't visible in spawned processes)."""
+
+    def __init__(self, max_workers, mp_context=None):
+        super().__init__(max_workers=max_workers)
+
+
+def test_parallel_chunking_keeps_order_and_bounds_the_window(tmp_path, fake_encoding, monkeypatch):
+    monkeypatch.setattr(data_process, "ProcessPoolExecutor", ThreadPool)
+    real = data_process._chunk_markdown_item
+
+    def slow_first(item):                       # the first file finishes last
+        if item["source_pdf"] == "f0.pdf":
+            time.sleep(0.2)
+        return real(item)
+    monkeypatch.setattr(data_process, "_chunk_markdown_item", slow_first)
+
+    items = []
+    for i in range(12):
+        path = tmp_path / f"f{i}.md"
+        path.write_text(markdown(1) + f" file{i}")
+        items.append({"markdown_path": str(path), "source_pdf": f"f{i}.pdf"})
+    pulled = []
+    lock = threading.Lock()
+
+    def parsed():
+        for item in items:
+            with lock:
+                pulled.append(item["source_pdf"])
+            yield item
+
+    chunks = iter_markdown_chunks(parsed(), max_workers=2)
+    first = next(chunks)
+    assert first.metadata["source"] == "f0.pdf"
+    assert len(pulled) == 4                     # 2 * max_workers files in flight, not the whole input
+    rest = [first, *chunks]
+    assert list(dict.fromkeys(c.metadata["source"] for c in rest)) == [f"f{i}.pdf" for i in range(12)]
+    assert len(pulled) == 12
+
+
+def test_sequential_chunking_matches_parallel(tmp_path, fake_encoding, monkeypatch):
+    monkeypatch.setattr(data_process, "ProcessPoolExecutor", ThreadPool)
+    items = []
+    for i in range(3):
+        path = tmp_path / f"f{i}.md"
+        path.write_text(markdown(3))
+        items.append({"markdown_path": str(path), "source_pdf": f"f{i}.pdf"})
+    one = [(c.page_content, c.metadata) for c in iter_markdown_chunks(items, max_workers=1)]
+    many = [(c.page_content, c.metadata) for c in iter_markdown_chunks(items, max_workers=3)]
+    assert one == many
@@ -0,0 +1,50 @@
+import context_pack
+from context_pack import pack_tool_results
+
+RETRIEVER = {"name": "build_pinecone_retriever"}
+
+
+def test_passage_token_count_from_the_chunk_store_is_used(fake_encoding, monkeypatch):
+    counted = []
+    real = context_pack.count_tokens
+    monkeypatch.setattr(context_pack, "count_tokens", lambda text: counted.append(text) or real(text))
+    passages = [{"content": "alpha " * 10, "score": 0.9, "tokens": 60},
+                {"content": "beta " * 10, "score": 0.5}]
+    [content] = pack_tool_results([RETRIEVER], [passages], budget=1000)
+    assert "[1] alpha" in content and "[2] beta" in content
+    assert counted == [("beta " * 10).strip()]           # only the passage without a stored count
+
+
+FACTS = {"name": "fetch_facts_for_question"}
+
+
+def test_duplicates_and_covered_facts_are_dropped(fake_encoding):
+    passages = [{"content": "Sarah Discaya owns St. Gerrard Construction.", "score": 0.9},
+                {"content": "  sarah discaya owns st. gerrard   construction. ", "score": 0.8},   # same text
+                {"content": "Discaya", "score": 0.1}]                                          # contained
+    facts = [{"subject": "Sarah Discaya", "rel": "OWNS", "object": "St. Gerrard Construction", "score": 5.0},
+             {"subject": "Sarah Discaya", "rel": "TESTIFIED_AT", "object": "Senate", "source": "a.pdf", "score": 3.0},
+             {"subject": "sarah discaya", "rel": "testified_at", "object": "senate", "score": 1.0}]
+    retrieved, kg = pack_tool_results([RETRIEVER, FACTS], [passages, facts], budget=1000)
+    assert retrieved == "[1] Sarah Discaya owns St. Gerrard Construction."
+    assert kg == "- Sarah Discaya -TESTIFIED_AT-> Senate [a.pdf]"
+
+
+def test_budget_keeps_the_best_items_and_cuts_the_last_passage(fake_encoding):
+    passages = [{"content": "a" * 100, "score": 3}, {"content": "b" * 300, "score": 2}, {"content": "c" * 50, "score": 1}]
+    [content] = pack_tool_results([RETRIEVER], [passages], budget=250)
+    first, second = content.split("\n\n")
+    assert first == "[1] " + "a" * 100
+    assert second.startswith("[2] bbb") and second.endswith(" …")
+    assert len(second) < 160 and "c" not in content
+
+
+def test_errors_and_empty_results(fake_encoding):
+    contents = pack_tool_results([RETRIEVER, FACTS, RETRIEVER], ["Error: timed out", [], [{"content": "x" * 500}]],
+                                 budget=100)
+    assert contents[0] == "Error: timed out"
+    assert contents[1] == "No results."
+    assert contents[2].startswith("[1] xxx")
+
+    [content] = pack_tool_results([RETRIEVER], [[{"content": "x" * 500}]], budget=10)
+    assert content == "No new results (duplicates or over the context budget)."
@@ -0,0 +1,44 @@
+from embedding_cache import CachedEmbeddings, EmbeddingCache, embedding_model_id
+
+
+class CountingEmbeddings:
+    def __init__(self, model="m1"):
+        self.model = model
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(t)), 0.5] for t in texts]
+
+    def embed_query(self, text):
+        return [0.0, 1.0]
+
+
+def test_only_new_texts_are_embedded_in_input_order(tmp_path):
+    inner = CountingEmbeddings()
+    cached = CachedEmbeddings(inner, EmbeddingCache(tmp_path / "emb.sqlite"))
+    assert cached.embed_documents(["a", "bb", "a"]) == [[1.0, 0.5], [2.0, 0.5], [1.0, 0.5]]
+    assert inner.batches == [["a", "bb"]]                         # duplicates embedded once
+    assert cached.embed_documents(["ccc", "bb"]) == [[3.0, 0.5], [2.0, 0.5]]
+    assert inner.batches[-1] == ["ccc"]
+    assert cached.last_stats == {"hits": 1, "misses": 1}
+    assert cached.embed_query("q") == [0.0, 1.0]
+
+
+def test_cache_persists_and_is_keyed_by_model(tmp_path):
+    path = tmp_path / "emb.sqlite"
+    CachedEmbeddings(CountingEmbeddings(), EmbeddingCache(path)).embed_documents(["a", "bb"])
+
+    same, other = CountingEmbeddings(), CountingEmbeddings(model="m2")
+    cache = EmbeddingCache(path)
+    CachedEmbeddings(same, cache).embed_documents(["a", "bb"])
+    CachedEmbeddings(other, cache).embed_documents(["a"])
+    assert same.batches == [] and other.batches == [["a"]]
+    assert (cache.count("m1"), cache.count()) == (2, 3)
+
+
+def test_model_id_includes_normalization():
+    emb = CountingEmbeddings()
+    assert embedding_model_id(emb) == "m1"
+    emb.normalize = True
+    assert embedding_model_id(emb) == "m1|normalize=True"
@@ -0,0 +1,60 @@
+from langchain_community.graphs.graph_document import GraphDocument, Node
+from langchain_core.documents import Document
+
+from ingest import ensure_fulltext_auto
+
+PROPS = ("name", "id")
+
+
+class IndexGraph:
+    """Neo4jGraph stand-in that knows one fulltext index (or none) and records DDL."""
+
+    def __init__(self, labels=None, props=PROPS, state="ONLINE"):
+        self.index = None if labels is None else {"labelsOrTypes": list(labels), "properties": list(props),
+                                                  "state": state}
+        self.ddl = []
+
+    def query(self, cypher, params=None):
+        if cypher.startswith("SHOW INDEXES"):
+            return [self.index] if self.index else []
+        self.ddl.append(" ".join(cypher.split()))
+        return []
+
+
+def docs(*types):
+    return [GraphDocument(nodes=[Node(id=f"n{i}", type=t) for i, t in enumerate(types)], relationships=[],
+                          source=Document(page_content="x"))]
+
+
+def test_covered_labels_do_not_rebuild():
+    graph = IndexGraph(labels=["__Entity__", "Document"])
+    out = ensure_fulltext_auto(graph, props=PROPS, graph_documents=docs("Person", "NewType"),
+                               base_entity_label="__Entity__")
+    assert out["rebuilt"] is False and graph.ddl == []
+
+
+def test_uncovered_label_grows_the_index():
+    graph = IndexGraph(labels=["Person"])
+    out = ensure_fulltext_auto(graph, props=PROPS, graph_documents=docs("Person", "Project"),
+                               base_entity_label=None, include_source=False)
+    assert out["rebuilt"] is True and out["labels"] == ["Person", "Project"]
+    assert graph.ddl[0] == "DROP INDEX entity_fulltext IF EXISTS;"
+    assert graph.ddl[1] == "CREATE FULLTEXT INDEX entity_fulltext FOR (n:`Person`|`Project`) ON EACH [n.name,n.id];"
+
+
+def test_missing_index_or_props_are_created():
+    graph = IndexGraph()
+    out = ensure_fulltext_auto(graph, props=PROPS, graph_documents=docs("Person"), base_entity_label="__Entity__")
+    assert out["labels"] == ["Document", "__Entity__"]
+
+    graph = IndexGraph(labels=["__Entity__", "Document"], props=("name",))
+    out = ensure_fulltext_auto(graph, props=PROPS, graph_documents=docs("Person"), base_entity_label="__Entity__")
+    assert out["rebuilt"] is True and out["labels"] == ["Document", "__Entity__"]
+
+
+def test_failed_index_is_recreated_even_when_it_covers_the_labels():
+    for state, rebuilt in (("FAILED", True), ("POPULATING", False)):
+        graph = IndexGraph(labels=["__Entity__", "Document"], state=state)
+        out = ensure_fulltext_auto(graph, props=PROPS, graph_documents=docs("Person"), base_entity_label="__Entity__")
+        assert out["rebuilt"] is rebuilt and out["labels"] == ["Document", "__Entity__"]
+        assert bool(graph.ddl) is rebuilt
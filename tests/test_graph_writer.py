@@ -0,0 +1,75 @@
+import pytest
+from langchain_core.documents import Document
+
+pytest.importorskip("langchain_community")
+
+from langchain_community.graphs.graph_document import GraphDocument, Node, Relationship  # noqa: E402
+
+from graph_writer import collect_graph_rows, write_graph_documents  # noqa: E402
+
+
+class FakeDriver:
+    """neo4j Driver stand-in: records (database, cypher, rows) per write transaction."""
+
+    def __init__(self):
+        self.writes = []
+        self.database = None
+
+    def session(self, database=None):
+        self.database = database
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute_write(self, fn):
+        return fn(self)
+
+    def run(self, cypher, rows):
+        self.writes.append((cypher, rows))
+        return self
+
+    def consume(self):
+        return None
+
+
+def graph_docs():
+    alice, acme = Node(id="alice", type="Person"), Node(id="acme", type="Organization", properties={"city": "x"})
+    acme_again = Node(id="acme", type="Company")
+    return [
+        GraphDocument(nodes=[alice, acme], relationships=[Relationship(source=alice, target=acme, type="works at")],
+                      source=Document(page_content="alice works at acme", metadata={"source": "a.pdf"})),
+        GraphDocument(nodes=[acme_again], relationships=[Relationship(source=alice, target=acme, type="works at")],
+                      source=Document(page_content="acme again", metadata={"source": "a.pdf", "id": "d2"})),
+    ]
+
+
+def test_collect_dedupes_nodes_rels_and_mentions():
+    groups = collect_graph_rows(graph_docs())
+    assert {label: set(by_id) for label, by_id in groups["nodes"].items()} == {
+        "Person": {"alice"}, "Organization": {"acme"}, "Company": {"acme"}}
+    assert groups["rels"] == {"WORKS_AT": {("alice", "acme"): {}}}
+    assert "d2" in groups["documents"] and len(groups["documents"]) == 2
+    assert ("d2", "acme") in groups["mentions"] and len(groups["mentions"]) == 3
+
+
+def test_collect_requires_sources():
+    with pytest.raises(TypeError):
+        collect_graph_rows([GraphDocument.model_construct(nodes=[Node(id="a")], relationships=[], source=None)])
+
+
+def test_write_batches_each_group():
+    driver = FakeDriver()
+    report = write_graph_documents(driver, graph_docs(), database="kg", batch_size=1)
+    assert driver.database == "kg"
+    assert (report["nodes"], report["rels"], report["documents"], report["mentions"]) == (2, 1, 2, 3)
+    assert report["statements"] == len(driver.writes) == 2 + 3 + 1 + 3
+    assert all(len(rows) == 1 for _, rows in driver.writes)
+    cyphers = [c for c, _ in driver.writes]
+    assert cyphers[0].startswith("UNWIND $rows AS row MERGE (d:Document")
+    assert any("SET n:`Company`" in c for c in cyphers)
+    assert any("MERGE (s)-[r:`WORKS_AT`]->(t)" in c for c in cyphers)
+    assert cyphers[-1].startswith("UNWIND $rows AS row MATCH (d:Document")
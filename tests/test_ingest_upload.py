@@ -0,0 +1,57 @@
+import hashlib
+import types
+
+import pytest
+
+pytest.importorskip("langchain")
+pytest.importorskip("fastapi")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from jobs import IngestJobManager  # noqa: E402
+
+PDF = b"%PDF-1.4 " + bytes(range(256)) * 40
+
+
+@pytest.fixture
+def ingest_app(tmp_path, monkeypatch):
+    """main with uploads saved under tmp_path and a job manager whose stages do nothing."""
+    import main
+    manager = IngestJobManager(lambda stage, job, job_dir: {}, jobs_dir=tmp_path / "jobs")
+    monkeypatch.setattr(main, "ingest_jobs", manager)
+    monkeypatch.setattr(main, "DATA_DIR", tmp_path / "data")
+    monkeypatch.setattr(main, "importlib", types.SimpleNamespace(
+        util=types.SimpleNamespace(find_spec=lambda name: object())))        # marker "installed"
+    monkeypatch.setattr(main.cfg, "UPLOAD_CHUNK_SIZE", 1000)                  # several reads per upload
+    yield main, TestClient(main.app), tmp_path / "data"
+    manager.shutdown()
+
+
+def upload(client, data=PDF, namespace="ns", name="report.pdf"):
+    res = client.post("/ingest", files={"file": (name, data, "application/pdf")},
+                      data={"namespace": namespace, "enable_graph": "false"})
+    assert res.status_code == 202, res.text
+    return res.json()
+
+
+def test_upload_is_streamed_to_a_content_addressed_file(ingest_app):
+    main, client, data_dir = ingest_app
+    body = upload(client)
+    digest = hashlib.sha256(PDF).hexdigest()
+    assert body["sha256"] == digest and body["deduplicated"] is False
+    saved = data_dir / f"report_{digest[:16]}.pdf"
+    assert saved.read_bytes() == PDF
+    assert [p.name for p in data_dir.iterdir()] == [saved.name]             # no leftover .part file
+    save = main.ingest_jobs.status(body["job_id"])["stages"]["save"]
+    assert save["status"] == "done" and save["details"]["bytes"] == len(PDF)
+
+
+def test_identical_upload_returns_the_earlier_job(ingest_app):
+    _, client, data_dir = ingest_app
+    first = upload(client)
+    again = upload(client, name="renamed.pdf")
+    assert again["deduplicated"] is True and again["job_id"] == first["job_id"]
+    assert len(list(data_dir.iterdir())) == 1
+
+    assert upload(client, namespace="other")["job_id"] != first["job_id"]
+    assert upload(client, data=PDF + b"x")["deduplicated"] is False
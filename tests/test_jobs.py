@@ -0,0 +1,113 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from jobs import STAGES, IngestJobManager, QueueFull, load_chunks, save_chunks
+
+
+class Stages:
+    """run_stage stand-in: records the stages it ran, fails the ones listed in `fail`."""
+
+    def __init__(self, fail=()):
+        self.ran = []
+        self.fail = set(fail)
+
+    def __call__(self, stage, job, job_dir):
+        self.ran.append(stage)
+        if stage in self.fail:
+            raise RuntimeError(f"{stage} broke")
+        return {"stage": stage}
+
+
+def params(sha="abc", **kw):
+    return {"filename": "a.pdf", "pdf_path": "a.pdf", "sha256": sha, "namespace": "ns", "enable_graph": True, **kw}
+
+
+def run(manager, job_id, start=None):
+    """Submit (or resume) and wait until the worker is finished with the job."""
+    (start or manager.submit)(job_id)
+    manager._executor.shutdown(wait=True)
+    manager._executor = ThreadPoolExecutor(max_workers=1)
+
+
+def test_failed_job_resumes_from_first_unfinished_stage(tmp_path):
+    stages = Stages(fail={"vectors"})
+    manager = IngestJobManager(stages, jobs_dir=tmp_path)
+    job = manager.create(params())
+    manager.complete_stage(job["id"], "save", 0.1, {})
+    run(manager, job["id"])
+    status = manager.status(job["id"])
+    assert status["status"] == "failed" and status["error"] == "vectors: vectors broke"
+
+    stages.fail.clear()
+    stages.ran.clear()
+    run(manager, job["id"], start=manager.resume)
+    assert stages.ran == ["vectors", "graph"]
+    assert manager.status(job["id"])["status"] == "done"
+    with pytest.raises(ValueError):
+        manager.resume(job["id"])
+
+
+@pytest.mark.parametrize("status", ["created", "queued", "running"])
+def test_interrupted_jobs_are_failed_on_startup_and_resumable(tmp_path, status):
+    manager = IngestJobManager(Stages(), jobs_dir=tmp_path)
+    job = manager.create(params())
+    path = tmp_path / job["id"] / "job.json"
+    saved = json.loads(path.read_text())
+    saved["status"] = status
+    path.write_text(json.dumps(saved))
+    manager.shutdown()
+
+    stages = Stages()
+    restarted = IngestJobManager(stages, jobs_dir=tmp_path)
+    assert restarted.status(job["id"])["status"] == "failed"
+    run(restarted, job["id"], start=restarted.resume)
+    assert stages.ran == STAGES                   # nothing was recorded: starts at "save"
+
+
+def test_find_or_create_dedupes_concurrent_uploads(tmp_path):
+    manager = IngestJobManager(Stages(), jobs_dir=tmp_path)
+    results = []
+    barrier = threading.Barrier(8)
+
+    def upload():
+        barrier.wait()
+        results.append(manager.find_or_create(params()))
+
+    threads = [threading.Thread(target=upload) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sum(created for _, created in results) == 1
+    assert len({job["id"] for job, _ in results}) == 1
+
+    other, created = manager.find_or_create(params(sha="def"))
+    assert created and other["id"] != results[0][0]["id"]
+    manager.shutdown()
+
+
+def test_graphless_job_does_not_stand_in_for_a_graph_run(tmp_path):
+    manager = IngestJobManager(Stages(), jobs_dir=tmp_path)
+    first, _ = manager.find_or_create(params(enable_graph=False))
+    assert manager.find_or_create(params(enable_graph=False)) == (manager.status(first["id"]), False)
+    _, created = manager.find_or_create(params(enable_graph=True))
+    assert created
+    manager.shutdown()
+
+
+def test_queue_limit(tmp_path):
+    manager = IngestJobManager(Stages(), jobs_dir=tmp_path, max_pending=1)
+    manager._jobs["x"] = {"status": "running", "params": {}, "created": 0}
+    with pytest.raises(QueueFull):
+        manager.create(params())
+    manager.shutdown()
+
+
+def test_chunks_round_trip(tmp_path):
+    from langchain_core.documents import Document
+    chunks = [Document(page_content=f"chunk {i}", metadata={"i": i}) for i in range(3)]
+    assert save_chunks(iter(chunks), tmp_path / "chunks.jsonl") == 3
+    assert load_chunks(tmp_path / "chunks.jsonl") == chunks
@@ -0,0 +1,64 @@
+import pytest
+from langchain_community.graphs.graph_document import GraphDocument, Node, Relationship
+from langchain_core.documents import Document
+
+from kg_extract import extract_graph_documents
+
+
+class Transformer:
+    """LLMGraphTransformer stand-in: one node per word; words in `flaky` fail that many times first."""
+
+    def __init__(self, flaky=None):
+        self.flaky = dict(flaky or {})
+        self.calls = []
+
+    def process_response(self, chunk):
+        self.calls.append(chunk.page_content)
+        if self.flaky.get(chunk.page_content, 0) > 0:
+            self.flaky[chunk.page_content] -= 1
+            raise RuntimeError("rate limited")
+        nodes = [Node(id=w, type="Word") for w in chunk.page_content.split()]
+        rels = [Relationship(source=a, target=b, type="NEXT") for a, b in zip(nodes, nodes[1:])]
+        return GraphDocument(nodes=nodes, relationships=rels, source=chunk)
+
+
+class LLM:
+    model_name = "test-model"
+
+
+def chunks(*texts):
+    return [Document(page_content=t, metadata={"i": i}) for i, t in enumerate(texts)]
+
+
+def extract(transformer, docs, tmp_path, **kw):
+    return extract_graph_documents(transformer, docs, llm=LLM(), max_workers=4, backoff_s=0,
+                                   cache_dir=tmp_path, **kw)
+
+
+def test_results_keep_chunk_order_and_are_cached(tmp_path):
+    docs = chunks("a b", "c d e", "f")
+    results, report = extract(Transformer(), docs, tmp_path)
+    assert [[n.id for n in gd.nodes] for gd in results] == [["a", "b"], ["c", "d", "e"], ["f"]]
+    assert [gd.source for gd in results] == docs
+    assert (report["cached"], report["extracted"]) == (0, 3)
+
+    again = Transformer()
+    fresh = chunks("a b", "c d e", "f", "g")
+    results, report = extract(again, fresh, tmp_path)
+    assert again.calls == ["g"]
+    assert (report["cached"], report["extracted"]) == (3, 1)
+    assert results[1].relationships[0].type == "NEXT" and results[1].source is fresh[1]
+
+
+def test_transient_failures_are_retried(tmp_path):
+    transformer = Transformer(flaky={"b": 2})
+    results, _ = extract(transformer, chunks("a", "b"), tmp_path, max_retries=2)
+    assert transformer.calls.count("b") == 3 and results[1].nodes[0].id == "b"
+
+
+def test_failed_chunks_raise_and_successes_stay_cached(tmp_path):
+    with pytest.raises(RuntimeError, match="1/2 chunks"):
+        extract(Transformer(flaky={"b": 5}), chunks("a", "b"), tmp_path, max_retries=1)
+    retry = Transformer()
+    extract(retry, chunks("a", "b"), tmp_path)
+    assert retry.calls == ["b"]
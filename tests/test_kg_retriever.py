@@ -0,0 +1,97 @@
+import pytest
+
+pytest.importorskip("langchain")
+
+from neo4j.exceptions import Neo4jError, ServiceUnavailable  # noqa: E402
+
+import retriever  # noqa: E402
+from resource_pool import pool  # noqa: E402
+
+
+def neo4j_error(code, message):
+    return Neo4jError._hydrate_neo4j(code=code, message=message)
+
+
+INDEX_GONE = neo4j_error("Neo.ClientError.Procedure.ProcedureCallFailed",
+                         "Failed to invoke procedure: There is no such fulltext schema index: entity_fulltext")
+
+
+class FakeGraph:
+    def __init__(self, *errors, rows=()):
+        self.errors = list(errors)
+        self.rows = list(rows)
+        self.queries = []
+        self.params = []
+
+    def query(self, cypher, params=None):
+        self.queries.append(cypher)
+        self.params.append(params)
+        if cypher.lstrip().startswith("SHOW INDEXES"):
+            return [{"name": "entity_fulltext", "type": "FULLTEXT", "state": "ONLINE"}]
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.rows
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    def use(g):
+        monkeypatch.setattr(retriever, "_get_neo4j_graph", lambda: g)
+        pool.mark_fulltext_online("entity_fulltext")
+        return g
+    yield use
+    pool.mark_fulltext_stale()
+
+
+def facts(query="who owns st. gerrard construction?"):
+    return retriever.fetch_facts_for_question.invoke({"query": query})
+
+
+def test_normalize_escapes_lucene_syntax():
+    assert retriever._normalize("What is C++ (really)?") == "what c\\+\\+ \\(really\\)"
+    assert retriever._normalize('covid-19 "ghost" a/b: x') == 'covid\\-19 \\"ghost\\" a\\/b\\:'
+    assert retriever._normalize("ai") == "ai"
+    assert retriever._relaxed_query(retriever._normalize("flood control projects")) == "control OR flood OR projects"
+    assert retriever._normalize("?") == "" and retriever._relaxed_query("ai") == ""
+
+
+def test_missing_index_is_revalidated_and_retried(graph):
+    g = graph(FakeGraph(INDEX_GONE, rows=[{"subject": "a"}]))
+    assert facts() == [{"subject": "a"}]
+    assert sum(q.lstrip().startswith("SHOW INDEXES") for q in g.queries) == 1
+
+
+@pytest.mark.parametrize("error", [
+    ServiceUnavailable("connection refused"),
+    neo4j_error("Neo.ClientError.Statement.SyntaxError", "Invalid input"),
+    neo4j_error("Neo.ClientError.Procedure.ProcedureCallFailed",
+                "Failed to invoke procedure `db.index.fulltext.queryNodes`: Caused by: "
+                "org.apache.lucene.queryparser.classic.ParseException: Cannot parse 'x'"),
+    neo4j_error("Neo.ClientError.Transaction.TransactionTimedOut", "timed out"),
+])
+def test_other_failures_are_not_treated_as_a_rebuilt_index(graph, error):
+    g = graph(FakeGraph(error, rows=[{"subject": "a"}]))
+    with pytest.raises(type(error)):
+        facts()
+    assert not any(q.lstrip().startswith("SHOW INDEXES") for q in g.queries)
+    assert pool.fulltext_online("entity_fulltext")
+
+
+def test_relaxed_lookup_only_runs_without_exact_facts(graph):
+    g = graph(FakeGraph(rows=[{"subject": "a"}]))
+    facts("flood control projects")
+    cypher, params = g.queries[-1], g.params[-1]
+    assert params["q"] == "flood control projects"
+    assert params["q_relaxed"] == "control OR flood OR projects"
+    exact, relaxed = cypher.split("WITH exact WHERE")
+    assert relaxed.split("\n", 1)[0] == " size(exact) = 0 AND $q_relaxed <> '' AND $q_relaxed <> $q"
+    assert [q.count("db.index.fulltext.queryNodes") for q in (exact, relaxed)] == [1, 1]
+    assert "$q_relaxed" in relaxed.split("queryNodes", 1)[1].split("\n", 1)[0]
+
+
+def test_query_without_terms_does_not_reach_the_database(graph):
+    g = graph(FakeGraph(rows=[{"subject": "a"}]))
+    assert facts("?") == []
+    assert g.queries == []
+    facts("ai")
+    assert g.params[-1]["q"] == "ai" and g.params[-1]["q_relaxed"] == ""
@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+from local_index import LocalHybridIndex, _NamespaceStore
+
+
+def vec(vid, dense, sparse=None, **metadata):
+    v = {"id": vid, "values": dense, "metadata": metadata}
+    if sparse is not None:
+        v["sparse_values"] = {"indices": list(sparse), "values": list(sparse.values())}
+    return v
+
+
+def ids(result):
+    return [m["id"] for m in result["matches"]]
+
+
+def brute_force(index, namespace, dense, sparse):
+    """Expected scores recomputed from each live row's stored vectors: dense dot + sparse dot."""
+    ns = index._ns(namespace)
+    out = {}
+    for vid, row in ns._id_to_row.items():
+        s = float(np.dot(ns._dense[row], dense))
+        sp = ns._row_sparse[row]
+        if sp is not None:
+            s += sum(sparse.get(int(t), 0.0) * float(x) for t, x in zip(*sp))
+        out[vid] = s
+    return out
+
+
+@pytest.fixture
+def index(tmp_path):
+    return LocalHybridIndex(tmp_path / "idx")
+
+
+def test_upsert_and_query_ranks_by_dense_plus_sparse(index):
+    index.upsert([vec("a", [1, 0], {1: 1.0}), vec("b", [0, 1], {2: 1.0}), vec("c", [0.5, 0.5])], namespace="ns")
+    assert ids(index.query([1, 0], top_k=3, namespace="ns")) == ["a", "c", "b"]
+    assert ids(index.query([0, 0], sparse_vector={"indices": [2], "values": [3.0]}, top_k=1, namespace="ns")) == ["b"]
+    assert index.describe_index_stats()["namespaces"]["ns"]["vector_count"] == 3
+
+
+def test_overwrite_and_delete_are_visible_to_the_next_query(index):
+    index.upsert([vec("a", [1, 0], {1: 1.0}), vec("b", [1, 0], {2: 1.0})])
+    q = {"indices": [1], "values": [1.0]}
+    assert ids(index.query([0, 0], sparse_vector=q, top_k=1)) == ["a"]
+
+    index.upsert([vec("a", [1, 0], {3: 1.0}), vec("b", [1, 0], {1: 2.0})])     # overwrite sparse terms
+    res = index.query([0, 0], sparse_vector=q, top_k=2)
+    assert ids(res) == ["b", "a"]
+    assert [m["score"] for m in res["matches"]] == [2.0, 0.0]
+
+    index.delete(ids=["b"])
+    assert ids(index.query([0, 0], sparse_vector=q, top_k=2)) == ["a"]
+    assert index.fetch(["b"])["vectors"] == {}
+
+
+def test_reused_row_does_not_keep_old_postings(index):
+    index.upsert([vec("a", [1, 0], {1: 5.0})])
+    ns = index._ns(None)
+    ns._merge_postings()                      # "a" now lives in the main segment
+    index.delete(ids=["a"])
+    index.upsert([vec("z", [1, 0], {2: 1.0})])   # takes the freed row
+    assert ns._id_to_row["z"] == 0
+    res = index.query([0, 0], sparse_vector={"indices": [1], "values": [1.0]}, top_k=1)
+    assert res["matches"][0]["score"] == 0.0
+
+
+def test_delta_merge_matches_brute_force(index, monkeypatch):
+    monkeypatch.setattr(_NamespaceStore, "_DELTA_MERGE_MIN", 8)
+    rng = np.random.default_rng(0)
+    for step in range(30):
+        batch = [vec(f"v{rng.integers(40)}", rng.random(4).tolist(),
+                     {int(t): float(rng.random()) for t in rng.integers(0, 20, 3)}) for _ in range(5)]
+        index.upsert(batch)
+        if step % 4 == 3:
+            index.delete(ids=[f"v{rng.integers(40)}"])
+        dense = rng.random(4).tolist()
+        sparse = {int(t): float(rng.random()) for t in rng.integers(0, 20, 4)}
+        res = index.query(dense, sparse_vector={"indices": list(sparse), "values": list(sparse.values())}, top_k=100)
+        expected = brute_force(index, None, dense, sparse)
+        assert {m["id"]: pytest.approx(m["score"], abs=1e-4) for m in res["matches"]} == expected
+
+
+def test_reload_from_disk(tmp_path):
+    path = tmp_path / "idx"
+    index = LocalHybridIndex(path)
+    index.upsert([vec("a", [1, 0], {1: 1.0}, source="x.pdf"), vec("b", [0, 1], {2: 1.0}, source="y.pdf")], namespace="ns")
+    index.upsert([vec("a", [0, 1], {2: 2.0}, source="x.pdf")], namespace="ns")
+    index.delete(ids=["b"], namespace="ns")
+
+    reloaded = LocalHybridIndex(path)
+    assert reloaded.describe_index_stats()["total_vector_count"] == 1
+    res = reloaded.query([0, 1], sparse_vector={"indices": [2], "values": [1.0]}, top_k=5,
+                         include_metadata=True, include_values=True, namespace="ns")
+    assert ids(res) == ["a"]
+    m = res["matches"][0]
+    assert m["score"] == pytest.approx(3.0)
+    assert m["metadata"] == {"source": "x.pdf"}
+    assert m["sparse_values"] == {"indices": [2], "values": [2.0]}
+    assert ids(reloaded.query([0, 1], top_k=5, namespace="ns", filter={"source": "y.pdf"})) == []
+
+
+def test_log_is_compacted_and_survives_reload(tmp_path, monkeypatch):
+    monkeypatch.setattr(_NamespaceStore, "_COMPACT_MIN_RECORDS", 10)
+    path = tmp_path / "idx"
+    index = LocalHybridIndex(path)
+    for i in range(20):
+        index.upsert([vec("a", [float(i), 1.0], {i: 1.0}), vec("b", [1.0, 0.0])])
+    log = path / "__default__" / "records.jsonl"
+    assert sum(1 for _ in open(log)) <= 10
+    index.delete(ids=["b"])
+
+    reloaded = LocalHybridIndex(path)
+    assert reloaded.fetch(["a", "b"])["vectors"].keys() == {"a"}
+    assert reloaded.fetch(["a"])["vectors"]["a"]["values"] == [19.0, 1.0]
+    res = reloaded.query([0, 0], sparse_vector={"indices": [19], "values": [1.0]}, top_k=1)
+    assert res["matches"][0]["score"] == 1.0
+
+
+def test_hybrid_query_batch_weights(index):
+    index.upsert([vec("dense", [1, 0]), vec("sparse", [0, 0], {7: 1.0})])
+    q_dense, q_sparse = [[1, 0]], [{"indices": [7], "values": [1.0]}]
+    assert ids(index.hybrid_query_batch(q_dense, q_sparse, alpha=0.9, top_k=1)[0]) == ["dense"]
+    assert ids(index.hybrid_query_batch(q_dense, q_sparse, alpha=0.1, top_k=1)[0]) == ["sparse"]
+    with pytest.raises(ValueError):
+        index.hybrid_query_batch(q_dense, q_sparse, alpha=1.5)
@@ -0,0 +1,133 @@
+import pytest
+from langgraph.graph import END, START, MessagesState, StateGraph
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage
+
+import memory
+from memory import BoundedMemorySaver, _ThreadEviction, compact_messages, turn_starts
+
+
+def echo_graph(checkpointer):
+    graph = StateGraph(MessagesState)
+    graph.add_node("echo", lambda state: {"messages": [AIMessage(content=f"echo {len(state['messages'])}")]})
+    graph.add_edge(START, "echo")
+    graph.add_edge("echo", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def say(app, thread_id, text="hi"):
+    return app.invoke({"messages": [("user", text)]}, {"configurable": {"thread_id": thread_id}})
+
+
+def test_eviction_hooks_are_abstract():
+    class Incomplete(_ThreadEviction):
+        def _touch(self, thread_id):
+            pass
+
+    with pytest.raises(TypeError, match="_evictable"):
+        Incomplete()
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def saver(request, tmp_path):
+    if request.param == "memory":
+        return lambda **kw: BoundedMemorySaver(**kw)
+    pytest.importorskip("langgraph.checkpoint.sqlite")
+    return lambda **kw: memory._make_sqlite_saver_class()(tmp_path / "checkpoints.sqlite", **kw)
+
+
+def test_least_recently_used_threads_are_evicted(saver):
+    cp = saver(ttl_s=0, max_threads=2, sweep_interval_s=3600)
+    app = echo_graph(cp)
+    for t in ("a", "b", "c"):
+        say(app, t)
+    say(app, "a")                                     # "b" is now the least recently used
+    assert cp.sweep() == 1
+    assert cp.get_tuple({"configurable": {"thread_id": "b"}}) is None
+    assert len(say(app, "a")["messages"]) == 6        # "a" kept its history
+    assert cp.stats()["threads"] == 2 and cp.evicted == 1
+
+
+def test_idle_threads_are_evicted(saver, monkeypatch):
+    cp = saver(ttl_s=60, max_threads=0, sweep_interval_s=3600)
+    app = echo_graph(cp)
+    now = memory.time.time()
+    monkeypatch.setattr(memory.time, "time", lambda: now - 120)
+    say(app, "old")
+    monkeypatch.setattr(memory.time, "time", lambda: now)
+    say(app, "new")
+    assert cp.sweep() == 1
+    assert cp.get_tuple({"configurable": {"thread_id": "old"}}) is None
+    assert cp.get_tuple({"configurable": {"thread_id": "new"}}) is not None
+
+
+def test_sqlite_keeps_only_the_newest_checkpoints(tmp_path):
+    pytest.importorskip("langgraph.checkpoint.sqlite")
+    cp = memory._make_sqlite_saver_class()(tmp_path / "checkpoints.sqlite", keep_checkpoints=2)
+    app = echo_graph(cp)
+    for _ in range(4):
+        say(app, "t")
+    assert len(list(cp.list({"configurable": {"thread_id": "t"}}))) == 2
+    assert len(say(app, "t")["messages"]) == 10
+
+
+def thread(turns):
+    msgs = []
+    for t in range(turns):
+        msgs += [HumanMessage(content=f"q{t}", id=f"h{t}"), AIMessage(content=f"a{t}", id=f"a{t}")]
+    return msgs
+
+
+class CountingList(list):
+    """Counts item reads, to check how much of the thread a scan touches."""
+
+    reads = 0
+
+    def __getitem__(self, i):
+        CountingList.reads += 1
+        return super().__getitem__(i)
+
+
+def test_turn_starts_last_walks_back_only_as_far_as_needed():
+    msgs = thread(5)
+    assert turn_starts(msgs) == [0, 2, 4, 6, 8]
+    assert turn_starts(msgs, last=2) == [6, 8]
+    assert turn_starts(msgs, last=10) == [0, 2, 4, 6, 8]
+
+    counted = CountingList(thread(1000))
+    CountingList.reads = 0
+    assert turn_starts(counted, last=3) == [1994, 1996, 1998]
+    assert CountingList.reads <= 6
+
+
+def test_compact_messages_window_keeps_the_last_turns():
+    msgs = thread(5)
+    assert compact_messages(msgs, policy="window", max_turns=5) == {}
+    assert compact_messages(msgs, policy="none", max_turns=1) == {}
+
+    update = compact_messages(msgs, policy="window", max_turns=3)
+    assert all(isinstance(m, RemoveMessage) for m in update["messages"])
+    assert [m.id for m in update["messages"]] == ["h0", "a0", "h1", "a1"]
+    assert "summary" not in update
+
+
+def test_compact_messages_summary_folds_the_older_half():
+    msgs = thread(5)
+    seen = []
+    update = compact_messages(msgs, "old", policy="summary", max_turns=4,
+                              summarize_fn=lambda prev, dropped: seen.append((prev, len(dropped))) or "new")
+    assert seen == [("old", 6)]                      # 3 of 5 turns folded, the last 2 kept
+    assert update["summary"] == "new" and len(update["messages"]) == 6
+
+    def failing(prev, dropped):
+        raise RuntimeError("llm down")
+
+    update = compact_messages(msgs, policy="summary", max_turns=4, summarize_fn=failing)
+    assert "summary" not in update and len(update["messages"]) == 6
+
+
+def test_compact_messages_finds_the_cut_from_the_end():
+    counted = CountingList(thread(1000))
+    CountingList.reads = 0
+    update = compact_messages(counted, policy="window", max_turns=3)
+    assert CountingList.reads <= 2 * 4 + 2            # the last max_turns + 1 turns, plus two slices
+    assert len(update["messages"]) == 2 * 997 and update["messages"][-1].id == "a996"
@@ -0,0 +1,57 @@
+import pytest
+
+import data_process
+from data_process import PARSE_CACHE_SUBDIR, parse_folder_to_md, parse_single_pdf_to_md
+
+
+@pytest.fixture
+def marker(monkeypatch):
+    """marker_parse stand-in: records the PDFs it was asked to parse."""
+    parsed = []
+
+    def fake_parse(pdf_path):
+        parsed.append(pdf_path)
+        return f"# parsed {open(pdf_path, 'rb').read().decode()}"
+    monkeypatch.setattr(data_process, "marker_parse", fake_parse)
+    monkeypatch.setattr(data_process, "parser_version", lambda: "marker-test.f1")
+    return parsed
+
+
+def write_pdf(folder, name, content):
+    folder.mkdir(parents=True, exist_ok=True)
+    (folder / name).write_bytes(content.encode())
+    return folder / name
+
+
+def test_same_bytes_are_parsed_once(tmp_path, marker):
+    a = write_pdf(tmp_path / "in", "a.pdf", "one")
+    copy = write_pdf(tmp_path / "in", "renamed.pdf", "one")
+    out = tmp_path / "out"
+
+    [first] = parse_single_pdf_to_md(a, out)
+    assert first == {"source_pdf": str(a), "markdown_path": str(out / "a.md")}
+    parse_single_pdf_to_md(copy, out)
+    assert (out / "renamed.md").read_text() == "# parsed one"
+    assert marker == [str(a)]
+    assert len(list((out / PARSE_CACHE_SUBDIR).iterdir())) == 1
+
+
+def test_new_parser_version_reparses(tmp_path, marker, monkeypatch):
+    a = write_pdf(tmp_path / "in", "a.pdf", "one")
+    parse_single_pdf_to_md(a, tmp_path / "out")
+    monkeypatch.setattr(data_process, "parser_version", lambda: "marker-next.f1")
+    parse_single_pdf_to_md(a, tmp_path / "out")
+    assert len(marker) == 2
+
+
+def test_folder_served_from_cache_skips_the_process_pool(tmp_path, marker, monkeypatch):
+    src, out = tmp_path / "in", tmp_path / "out"
+    for name in ("b.pdf", "a.pdf"):
+        parse_single_pdf_to_md(write_pdf(src, name, name), out)
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError("everything is cached; no worker should start")
+    monkeypatch.setattr(data_process, "ProcessPoolExecutor", no_pool)
+    parsed = parse_folder_to_md(src, out, max_workers=4)
+    assert [p["source_pdf"] for p in parsed] == [str(src / "a.pdf"), str(src / "b.pdf")]
+    assert (out / "a.md").read_text() == "# parsed a.pdf"
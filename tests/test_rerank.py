@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from rerank import RerankCache, RerankingRetriever, fuse_scores, local_rerank, mmr
+
+
+def test_cache_is_an_lru_with_hit_counts():
+    cache = RerankCache(max_size=2)
+    cache.put("a", [(0, 1.0)])
+    cache.put("b", [(1, 1.0)])
+    assert cache.get("a") == [(0, 1.0)]           # "a" is now the most recent
+    cache.put("c", [(2, 1.0)])
+    assert cache.get("b") is None
+    assert cache.stats() == {"size": 2, "hits": 1, "misses": 1}
+
+    off = RerankCache(max_size=0)
+    off.put("a", [(0, 1.0)])
+    assert off.get("a") is None
+
+
+def test_fuse_scores_normalizes_both_signals():
+    fused = fuse_scores(np.array([0.2, 0.4, 0.6]), np.array([3.0, 1.0, 2.0]), dense_weight=0.5)
+    assert fused == pytest.approx([0.5, 0.25, 0.75])
+    assert fuse_scores(np.array([0.2, 0.6]), np.zeros(2), 0.5) == pytest.approx([0.0, 1.0])   # no BM25 overlap
+    assert fuse_scores(np.array([0.3, 0.3]), np.zeros(2), 0.5) == pytest.approx([1.0, 1.0])
+
+
+def test_mmr_skips_near_duplicates():
+    vecs = np.array([[1.0, 0.0], [1.0, 0.01], [0.0, 1.0]])
+    relevance = np.array([1.0, 0.95, 0.6])
+    assert mmr(relevance, vecs, 2, lambda_=1.0) == [0, 1]          # pure relevance
+    assert mmr(relevance, vecs, 2, lambda_=0.5) == [0, 2]          # the duplicate of 0 is passed over
+    assert mmr(relevance, vecs, 5, lambda_=0.5) == [0, 2, 1]
+
+
+class BM25:
+    def encode_documents(self, texts):
+        return [{"indices": [1], "values": [float(len(t))]} for t in texts]
+
+
+def candidates():
+    docs = [Document(page_content=t, metadata={"chunk_id": t}) for t in ("aa", "b", "cccc")]
+    vectors = {"query_dense": [1.0, 0.0], "query_sparse": {"indices": [1], "values": [1.0]},
+               "dense": [[0.0, 1.0], [1.0, 0.0], [1.0, 1.0]],
+               "sparse": [{"indices": [1], "values": [1.0]}, None, {"indices": [2], "values": [5.0]}]}
+    return docs, vectors
+
+
+def test_local_rerank_fuses_dense_and_bm25():
+    docs, vectors = candidates()
+    assert [i for i, _ in local_rerank(docs, vectors, BM25(), 3, dense_weight=1.0, mmr_lambda=None)] == [1, 2, 0]
+    # doc 1 has no stored sparse values: BM25-encoded locally (len("b") = 1.0, same as doc 0);
+    # doc 2 shares no term with the query, so BM25 lifts doc 0 above it
+    ranked = local_rerank(docs, vectors, BM25(), 2, dense_weight=0.5, mmr_lambda=None)
+    assert ranked == [(1, pytest.approx(1.0)), (0, pytest.approx(0.5))]
+    assert local_rerank([], vectors, BM25(), 3) == []
+
+    vectors["dense"][0] = None
+    with pytest.raises(RuntimeError, match="dense values"):
+        local_rerank(docs, vectors, BM25(), 3)
+
+
+class Base:
+    def __init__(self):
+        self.sparse_encoder = BM25()
+
+    def search(self, query, include_values=False, **kwargs):
+        return candidates()
+
+
+def test_cache_key_includes_the_bm25_version():
+    cache = RerankCache()
+    calls = []
+
+    class Counting(RerankingRetriever):
+        def _rank(self, query, docs, vectors):
+            calls.append(self.cache_version)
+            return super()._rank(query, docs, vectors)
+
+    def retriever(version):
+        return Counting(base_retriever=Base(), backend="local", top_n=2, cache=cache, cache_version=version)
+
+    first = retriever(1.0).invoke("q")
+    assert [d.page_content for d in first] == ["b", "cccc"]
+    assert "relevance_score" in first[0].metadata
+    retriever(1.0).invoke("q")
+    assert calls == [1.0]                               # same model: served from the cache
+    retriever(2.0).invoke("q")
+    assert calls == [1.0, 2.0]                          # new BM25 model: ranked again
+
+
+def test_rank_reads_the_weights_from_cfg_at_call_time(monkeypatch):
+    import config as cfg
+    retriever = RerankingRetriever(base_retriever=Base(), backend="local", top_n=3)
+    monkeypatch.setattr(cfg, "RERANK_MMR_LAMBDA", None)
+    monkeypatch.setattr(cfg, "RERANK_DENSE_WEIGHT", 1.0)
+    assert [d.page_content for d in retriever.invoke("q")] == ["b", "cccc", "aa"]
+    monkeypatch.setattr(cfg, "RERANK_DENSE_WEIGHT", 0.5)
+    assert [d.page_content for d in retriever.invoke("q")] == ["b", "aa", "cccc"]
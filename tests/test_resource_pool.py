@@ -0,0 +1,103 @@
+import threading
+import time
+
+import config as cfg
+from resource_pool import ResourcePool
+
+
+def test_builds_once_and_counts_hits():
+    pool = ResourcePool()
+    calls = []
+    first = pool._get_or_build("thing", lambda: calls.append(1) or object())
+    assert pool._get_or_build("thing", lambda: calls.append(1) or object()) is first
+    assert len(calls) == 1
+    assert pool.stats()["thing"] == {"hits": 1, "rebuilds": 1}
+
+
+def test_concurrent_first_use_builds_once():
+    pool = ResourcePool()
+    calls = []
+
+    def slow_factory():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool._get_or_build("slow", slow_factory)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert len({id(r) for r in results}) == 1
+
+
+def test_drop_removes_every_key_of_a_name():
+    pool = ResourcePool()
+    pool._get_or_build(("hybrid_retriever", 0.7, 5), object)
+    pool._get_or_build(("hybrid_retriever", 0.5, 5), object)
+    pool._get_or_build("pinecone_index", object)
+    pool._drop("hybrid_retriever")
+    assert list(pool._items) == ["pinecone_index"]
+
+
+def test_bm25_encoder_reloads_when_model_file_changes(tmp_path, monkeypatch):
+    model = tmp_path / "bm25_values.json"
+    model.write_text("{}")
+    monkeypatch.setattr(cfg, "BM25_FORMAT", "json")
+    monkeypatch.setattr(cfg, "BM25_PATH", model)
+    pool = ResourcePool()
+    pool._items["bm25_encoder"] = "old encoder"
+    pool._items[("hybrid_retriever", 0.7, 5, 3)] = "retriever on old encoder"
+    pool._bm25_mtime = model.stat().st_mtime - 10          # the file on disk is newer
+
+    # don't really load a model (BM25Encoder needs NLTK data); just see what was dropped
+    monkeypatch.setattr(pool, "_get_or_build", lambda key, factory: pool._items.get(key, "new encoder"))
+    assert pool.get_bm25_encoder() == "new encoder"
+    assert "bm25_encoder" not in pool._items and ("hybrid_retriever", 0.7, 5, 3) not in pool._items
+
+
+def test_bm25_model_path_prefers_the_newer_file(tmp_path, monkeypatch):
+    import os
+    js, bin_ = tmp_path / "bm25_values.json", tmp_path / "bm25_values.bin"
+    js.write_text("{}")
+    bin_.write_bytes(b"")
+    monkeypatch.setattr(cfg, "BM25_PATH", js)
+    monkeypatch.setattr(cfg, "BM25_BIN_PATH", bin_)
+    monkeypatch.setattr(cfg, "BM25_FORMAT", "binary")
+    pool = ResourcePool()
+
+    os.utime(js, (100, 100))
+    os.utime(bin_, (200, 200))
+    assert pool._bm25_model_path() == bin_
+    os.utime(js, (300, 300))                 # e.g. an ingest with BM25_FORMAT=json
+    assert pool._bm25_model_path() == js
+    monkeypatch.setattr(cfg, "BM25_FORMAT", "json")
+    os.utime(js, (100, 100))
+    assert pool._bm25_model_path() == js
+
+
+def test_fulltext_flag_is_cached_until_marked_stale():
+    pool = ResourcePool()
+    assert not pool.fulltext_online("entity_fulltext")
+    pool.mark_fulltext_online("entity_fulltext")
+    assert pool.fulltext_online("entity_fulltext")
+    pool.mark_fulltext_stale()
+    assert not pool.fulltext_online("entity_fulltext")
+
+
+def test_clear_closes_the_neo4j_graph_and_driver():
+    class Closable:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    pool = ResourcePool()
+    graph, driver = Closable(), Closable()
+    pool._items.update({"neo4j_graph": graph, "neo4j_driver": driver, "pinecone_index": object()})
+    pool.clear()
+    assert graph.closed and driver.closed
+    assert pool._items == {}
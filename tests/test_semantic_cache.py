@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from semantic_cache import SemanticCache
+
+
+def unit(*xs):
+    return np.asarray(xs, dtype=np.float32)
+
+
+def test_lookup_hits_only_above_threshold():
+    cache = SemanticCache(threshold=0.9, max_size=10)
+    cache.add("who is discaya?", unit(1, 0, 0), "a contractor", [{"name": "t", "content": "c"}])
+    hit = cache.lookup(unit(0.99, 0.1, 0))
+    assert hit["answer"] == "a contractor" and hit["similarity"] > 0.9
+    assert cache.lookup(unit(0, 1, 0)) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_lru_eviction_keeps_recently_used():
+    cache = SemanticCache(threshold=0.99, max_size=2)
+    cache.add("a", unit(1, 0, 0), "A", [])
+    cache.add("b", unit(0, 1, 0), "B", [])
+    assert cache.lookup(unit(1, 0, 0))["answer"] == "A"        # "a" is now most recent
+    cache.add("c", unit(0, 0, 1), "C", [])
+    assert cache.lookup(unit(0, 1, 0)) is None
+    assert cache.lookup(unit(1, 0, 0))["answer"] == "A"
+    assert cache.lookup(unit(0, 0, 1))["answer"] == "C"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_answer_from_before_invalidate_is_not_stored():
+    cache = SemanticCache(threshold=0.9)
+    generation = cache.generation               # taken when the request looked the question up
+    cache.invalidate()                          # ingest finished while the agent was running
+    cache.add("q", unit(1, 0), "stale", [], generation=generation)
+    assert cache.lookup(unit(1, 0)) is None
+    assert cache.stats()["stale_skips"] == 1
+
+    cache.add("q", unit(1, 0), "fresh", [], generation=cache.generation)
+    assert cache.lookup(unit(1, 0))["answer"] == "fresh"
+
+
+def test_save_and_load(tmp_path):
+    cache = SemanticCache(threshold=0.9, path=tmp_path / "sem")
+    cache.add("q", unit(1, 0), "A", [{"name": "t", "content": "c"}])
+    cache.save()
+    loaded = SemanticCache(threshold=0.9, path=tmp_path / "sem")
+    assert loaded.lookup(unit(1, 0))["tool_results"] == [{"name": "t", "content": "c"}]
+    loaded.invalidate()
+    assert SemanticCache(threshold=0.9, path=tmp_path / "sem").lookup(unit(1, 0)) is None
+
+
+def test_max_size_zero_disables_the_cache(tmp_path):
+    SemanticCache(threshold=0.9, path=tmp_path / "sem").add("q", unit(1, 0), "A", [])
+    cache = SemanticCache(threshold=0.9, max_size=0, path=tmp_path / "sem")
+    cache.add("q", unit(1, 0), "A", [])
+    assert cache.lookup(unit(1, 0)) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_save_replaces_files_atomically(tmp_path, monkeypatch):
+    cache = SemanticCache(threshold=0.9, path=tmp_path / "sem")
+    cache.add("q", unit(1, 0), "A", [])
+    cache.save()
+
+    cache.add("q2", unit(0, 1), "B", [])
+    monkeypatch.setattr(np, "savez", lambda *a, **k: (_ for _ in ()).throw(OSError("disk full")))
+    with pytest.raises(OSError):
+        cache.save()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["sem.json", "sem.npz"]      # no temp files left
+    loaded = SemanticCache(threshold=0.9, path=tmp_path / "sem")
+    assert loaded.lookup(unit(1, 0))["answer"] == "A"                                 # previous save intact
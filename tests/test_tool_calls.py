@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("langchain")
+
+import agent  # noqa: E402
+import config as cfg  # noqa: E402
+
+
+class FakeTool:
+    def __init__(self, fn):
+        self.fn = fn
+
+    def invoke(self, query):
+        return self.fn(query)
+
+
+def call(name, query="q"):
+    return {"name": name, "args": {"query": query}, "id": f"{name}-{query}", "type": "tool_call"}
+
+
+@pytest.fixture
+def tools(monkeypatch):
+    registry = {}
+    monkeypatch.setattr(agent, "tools_dict", registry)
+    return registry
+
+
+def test_results_keep_call_order_and_errors_are_returned(tools):
+    tools["slow"] = FakeTool(lambda q: time.sleep(0.05) or [{"content": "slow"}])
+    tools["fast"] = FakeTool(lambda q: [{"content": "fast"}])
+    tools["broken"] = FakeTool(lambda q: 1 / 0)
+    out = agent.run_tool_calls([call("slow"), call("fast"), call("broken"), call("missing")])
+    assert out[:2] == [[{"content": "slow"}], [{"content": "fast"}]]
+    assert out[2].startswith("Tool error:")
+    assert out[3].startswith("Incorrect Tool Name")
+
+
+def test_timed_out_tool_is_tracked_until_its_thread_returns(tools, monkeypatch):
+    release = threading.Event()
+    tools["hung"] = FakeTool(lambda q: release.wait(5) and "late")
+    monkeypatch.setitem(cfg.TOOL_TIMEOUTS, "hung", 0.05)
+    before = agent.tool_pool_stats()
+
+    assert agent.run_tool_calls([call("hung")]) == ["Tool error: hung timed out after 0.05s"]
+    stats = agent.tool_pool_stats()
+    assert stats["abandoned"] == before["abandoned"] + 1
+    assert stats["timed_out"] == before["timed_out"] + 1
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while agent.tool_pool_stats()["in_flight"] != before["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert agent.tool_pool_stats()["abandoned"] == before["abandoned"]
+
+
+def test_calls_are_shed_when_the_pool_is_saturated(tools, monkeypatch):
+    release = threading.Event()
+    tools["hung"] = FakeTool(lambda q: release.wait(5) and "late")
+    tools["fast"] = FakeTool(lambda q: "ok")
+    monkeypatch.setitem(cfg.TOOL_TIMEOUTS, "hung", 0.05)
+    monkeypatch.setattr(agent, "_TOOL_CAPACITY", agent.tool_pool_stats()["in_flight"] + 1)
+    try:
+        agent.run_tool_calls([call("hung")])                  # times out, keeps the only slot
+        out = agent.run_tool_calls([call("fast")])
+        assert out[0].startswith("Tool error: fast not run")
+        assert agent.tool_pool_stats()["shed"] >= 1
+    finally:
+        release.set()
@@ -0,0 +1,122 @@
+import threading
+
+import pytest
+from langchain_core.documents import Document
+
+from vector_pipeline import SizeBatcher, chunk_id, record_bytes, upsert_chunks_pipelined
+
+
+class Embedder:
+    def embed_documents(self, texts):
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+class BM25:
+    def encode_documents(self, texts):
+        return [{"indices": [len(t)], "values": [1.0]} for t in texts]
+
+
+class Index:
+    """Records upserts; the first `fail` calls raise (a transient server error)."""
+
+    def __init__(self, fail=0):
+        self.fail = fail
+        self.calls = 0
+        self.upserts = []
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors, namespace):
+        with self._lock:
+            self.calls += 1
+            if self.calls <= self.fail:
+                raise ConnectionError("503")
+            self.upserts.append((namespace, vectors))
+
+
+class ChunkStore:
+    def __init__(self):
+        self.rows = []
+
+    def put_many(self, rows):
+        self.rows.extend(rows)
+
+
+def docs(n):
+    return [Document(page_content="x" * (i + 1), metadata={"source": "a.pdf", "page": i, "tokens": i + 1})
+            for i in range(n)]
+
+
+def run(index, chunks, **kw):
+    return upsert_chunks_pipelined(index, chunks, embedder=Embedder(), bm25=BM25(), namespace="ns",
+                                   embed_batch_size=4, embed_workers=3, upsert_workers=2, queue_size=2,
+                                   max_batch_vectors=5, backoff_s=0, **kw)
+
+
+def test_every_chunk_is_upserted_once():
+    chunks = docs(23)
+    index = Index()
+    report = run(index, chunks)
+    records = {r["id"]: r for ns, batch in index.upserts for r in batch}
+    assert {ns for ns, _ in index.upserts} == {"ns"}
+    assert len(records) == report["vectors"] == 23
+    doc = chunks[6]
+    r = records[chunk_id(doc)]
+    assert r["values"] == [7.0, 1.0] and r["sparse_values"] == {"indices": [7], "values": [1.0]}
+    assert r["metadata"] == {"source": "a.pdf", "page": 6, "tokens": 7, "context": doc.page_content}
+    assert all(len(batch) <= 5 for _, batch in index.upserts)
+
+
+def test_chunk_store_keeps_the_text_out_of_metadata():
+    store, index = ChunkStore(), Index()
+    run(index, docs(3), chunk_store=store)
+    assert sorted((text, tokens) for _, _, text, tokens in store.rows) == [("x", 1), ("xx", 2), ("xxx", 3)]
+    meta = index.upserts[0][1][0]["metadata"]
+    assert set(meta) == {"chunk_id", "source"}
+
+
+def test_transient_upsert_errors_are_retried():
+    index = Index(fail=2)
+    report = run(index, docs(10), retries=3)
+    assert report["vectors"] == 10 and report["retries"] == {"upsert": 2}
+
+
+def test_hard_failure_stops_the_pipeline_and_is_raised():
+    with pytest.raises(ConnectionError):
+        run(Index(fail=100), docs(40), retries=1)
+
+
+def record(i, text_len=10):
+    return {"id": f"v{i}", "values": [0.5] * 4, "metadata": {"context": "x" * text_len}}
+
+
+def test_size_batcher_cuts_by_bytes_and_by_count():
+    size = record_bytes(record(0)) + 1
+    batcher = SizeBatcher(max_bytes=size * 3, max_vectors=100)
+    full = [b for i in range(7) for b in batcher.add(record(i))] + batcher.flush()
+    assert [len(records) for records, _ in full] == [3, 3, 1]
+    assert all(nbytes <= size * 3 for _, nbytes in full)
+
+    batcher = SizeBatcher(max_bytes=10**6, max_vectors=2)
+    full = [b for i in range(5) for b in batcher.add(record(i))] + batcher.flush()
+    assert [[r["id"] for r in records] for records, _ in full] == [["v0", "v1"], ["v2", "v3"], ["v4"]]
+    assert batcher.flush() == []
+
+
+def test_oversized_record_is_sent_alone():
+    small = record_bytes(record(0)) + 1
+    batcher = SizeBatcher(max_bytes=small * 2, max_vectors=100)
+    assert batcher.add(record(0)) == []
+    flushed = batcher.add(record(1, text_len=small * 5))
+    assert [[r["id"] for r in records] for records, _ in flushed] == [["v0"]]
+    flushed = batcher.add(record(2))
+    assert [[r["id"] for r in records] for records, _ in flushed] == [["v1"]]
+    assert [r["id"] for r in batcher.flush()[0][0]] == ["v2"]
+
+
+def test_pipeline_requests_stay_under_the_byte_budget():
+    index = Index()
+    budget = 400
+    report = run(index, docs(30), max_batch_bytes=budget)
+    assert report["vectors"] == 30
+    assert all(sum(record_bytes(r) + 1 for r in batch) <= budget for _, batch in index.upserts)
+    assert report["max_request_bytes"] <= budget
@@ -0,0 +1,259 @@
+"""
+Pipelined embed -> encode -> upsert for ingest
+
+create_and_upsert_vectors used to run three full passes one after another: embed every
+chunk, BM25-encode every chunk, then upsert 32 vectors at a time. Ingest took the SUM of
+the three stages and every dense vector of the document sat in memory at once.
+
+Here the chunks flow through bounded queues instead:
+
+    chunk batches --q--> embed workers --q--> BM25 encode --q--> upsert workers
+                         (EMBED_CONCURRENCY)                     (UPSERT_CONCURRENCY)
+
+- queues hold at most PIPELINE_QUEUE_SIZE batches, so memory is bounded and a slow stage
+  back-pressures the ones before it (throughput ~ the slowest stage)
+- worker counts cap the in-flight embedding / upsert requests
+- remote calls are retried with exponential backoff (VECTOR_RETRIES, VECTOR_BACKOFF_S)
+- the first hard failure stops the pipeline and is re-raised to the caller
+- with a chunk store the text is written locally and metadata is just {chunk_id, source}
+- upsert batches are cut by serialized size AND vector count (UPSERT_MAX_BYTES,
+  UPSERT_MAX_VECTORS): each vector carries 1024 floats plus the chunk text, so a fixed
+  count gives either tiny requests or ones the server rejects as too large
+"""
+
+import hashlib
+import json
+import queue
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.documents import Document
+from tqdm import tqdm
+
+import config as cfg
+
+_DONE = object()   # end-of-stream marker passed between stages
+
+
+def chunk_id(doc: Document) -> str:
+    """Stable vector id: sha256(source | text), same as before the pipeline."""
+    return hashlib.sha256(f"{doc.metadata.get('source', '')}|{doc.page_content}".encode("utf-8")).hexdigest()[:32]
+
+
+def with_retries(fn: Callable[[], Any], what: str, retries: int, backoff_s: float,
+                 counter: Optional[Counter] = None, stop: Optional[threading.Event] = None):
+    """Call fn(); on an exception wait backoff_s * 2^attempt (jittered) and try again."""
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == retries or (stop is not None and stop.is_set()):
+                raise
+            delay = backoff_s * (2 ** attempt) * (0.5 + random.random())
+            if counter is not None:
+                counter[what] += 1
+            print(f"{what} failed ({e}); retry {attempt + 1}/{retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def record_bytes(record: Dict[str, Any]) -> int:
+    """Serialized (JSON) size of one upsert record."""
+    return len(json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+
+
+class SizeBatcher:
+    """Groups upsert records into batches under a byte budget and a vector count."""
+
+    def __init__(self, max_bytes: int, max_vectors: int):
+        self.max_bytes = max_bytes
+        self.max_vectors = max(1, max_vectors)
+        self._records: List[Dict[str, Any]] = []
+        self._bytes = 0
+
+    def add(self, record: Dict[str, Any]) -> List[tuple]:
+        """Add one record; returns the (records, bytes) batches that became full."""
+        size = record_bytes(record) + 1                      # + separator
+        out = []
+        if self._records and (self._bytes + size > self.max_bytes or len(self._records) >= self.max_vectors):
+            out.append(self.flush_one())
+        if size > self.max_bytes:
+            print(f"Vector {record['id']} is {size} bytes (> UPSERT_MAX_BYTES={self.max_bytes}); sending it alone")
+        self._records.append(record)
+        self._bytes += size
+        return out
+
+    def flush_one(self) -> tuple:
+        batch = (self._records, self._bytes)
+        self._records, self._bytes = [], 0
+        return batch
+
+    def flush(self) -> List[tuple]:
+        return [self.flush_one()] if self._records else []
+
+
+class _Pipeline:
+    """Tiny thread pipeline: each stage has N workers reading one bounded queue."""
+
+    def __init__(self, queue_size: int):
+        self.queue_size = max(1, queue_size)
+        self.stop = threading.Event()
+        self.errors: List[BaseException] = []
+        self.busy_s: Counter = Counter()       # seconds spent inside each stage's fn
+        self.retries: Counter = Counter()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def new_queue(self) -> queue.Queue:
+        return queue.Queue(maxsize=self.queue_size)
+
+    def put(self, q: queue.Queue, item) -> bool:
+        """Blocking put that gives up once the pipeline is stopping."""
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def fail(self, e: BaseException) -> None:
+        with self._lock:
+            self.errors.append(e)
+        self.stop.set()
+
+    def stage(self, name: str, fn: Callable, inq: queue.Queue, outq: Optional[queue.Queue], workers: int,
+              flush: Optional[Callable] = None) -> None:
+        """fn(item) -> iterable of items for outq (or None for the last stage).
+
+        flush() -> items still buffered inside the stage, sent after its input is exhausted.
+        """
+        remaining = [max(1, workers)]
+
+        def _run():
+            try:
+                while True:
+                    item = inq.get()
+                    if item is _DONE:
+                        inq.put(_DONE)                       # let sibling workers see it too
+                        break
+                    if self.stop.is_set():
+                        continue                             # drain so upstream never blocks
+                    t0 = time.perf_counter()
+                    try:
+                        out = fn(item)
+                    except BaseException as e:
+                        self.fail(e)
+                        continue
+                    finally:
+                        with self._lock:
+                            self.busy_s[name] += time.perf_counter() - t0
+                    if outq is not None:
+                        for o in out or ():
+                            if not self.put(outq, o):
+                                break
+            finally:
+                with self._lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last and outq is not None:
+                    if flush is not None and not self.stop.is_set():
+                        for o in flush():
+                            if not self.put(outq, o):
+                                break
+                    outq.put(_DONE)
+
+        for i in range(max(1, workers)):
+            t = threading.Thread(target=_run, name=f"{name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def join(self) -> None:
+        for t in self._threads:
+            t.join()
+
+
+def upsert_chunks_pipelined(
+    index,
+    chunks: List[Document],
+    *,
+    embedder,
+    bm25,
+    namespace: str,
+    chunk_store=None,
+    embed_batch_size: int = cfg.EMBED_BATCH_SIZE,
+    embed_workers: int = cfg.EMBED_CONCURRENCY,
+    max_batch_bytes: int = cfg.UPSERT_MAX_BYTES,
+    max_batch_vectors: int = cfg.UPSERT_MAX_VECTORS,
+    upsert_workers: int = cfg.UPSERT_CONCURRENCY,
+    queue_size: int = cfg.PIPELINE_QUEUE_SIZE,
+    retries: int = cfg.VECTOR_RETRIES,
+    backoff_s: float = cfg.VECTOR_BACKOFF_S,
+) -> Dict[str, Any]:
+    """Embed, BM25-encode and upsert `chunks` as overlapping stages; returns a timing report."""
+    t_start = time.perf_counter()
+    p = _Pipeline(queue_size)
+    embed_q, encode_q, upsert_q = p.new_queue(), p.new_queue(), p.new_queue()
+    progress = tqdm(total=len(chunks), desc="upsert")
+    sent = Counter()
+    batcher = SizeBatcher(max_batch_bytes, max_batch_vectors)   # only touched by the single encode thread
+
+    def _embed(batch: List[Document]):
+        texts = [d.page_content for d in batch]
+        dense = with_retries(lambda: embedder.embed_documents(texts), "embed", retries, backoff_s, p.retries, p.stop)
+        return [(batch, dense)]
+
+    def _encode(item):
+        batch, dense = item
+        sparse = bm25.encode_documents([d.page_content for d in batch])
+        ids = [chunk_id(doc) for doc in batch]
+        if chunk_store is not None:
+            # text goes to the local store (before the vector is visible); metadata keeps id + source
+            chunk_store.put_many((cid, str(doc.metadata.get("source", "")), doc.page_content,
+                                  doc.metadata.get("tokens")) for cid, doc in zip(ids, batch))
+            metas = [{"chunk_id": cid, "source": str(doc.metadata.get("source", ""))} for cid, doc in zip(ids, batch)]
+        else:
+            metas = [{**doc.metadata, "context": doc.page_content} for doc in batch]
+        full = []
+        for cid, dv, sv, meta in zip(ids, dense, sparse, metas):
+            full.extend(batcher.add({"id": cid, "values": dv, "sparse_values": sv, "metadata": meta}))
+        return full
+
+    def _upsert(item):
+        records, nbytes = item
+        with_retries(lambda: index.upsert(vectors=records, namespace=namespace), "upsert",
+                     retries, backoff_s, p.retries, p.stop)
+        with p._lock:
+            sent["requests"] += 1
+            sent["vectors"] += len(records)
+            sent["bytes"] += nbytes
+            sent["max_request_bytes"] = max(sent["max_request_bytes"], nbytes)
+        progress.update(len(records))
+
+    p.stage("embed", _embed, embed_q, encode_q, embed_workers)
+    p.stage("encode", _encode, encode_q, upsert_q, 1, flush=batcher.flush)   # CPU-bound; one thread is enough
+    p.stage("upsert", _upsert, upsert_q, None, upsert_workers)
+
+    for i in range(0, len(chunks), max(1, embed_batch_size)):
+        if not p.put(embed_q, chunks[i:i + embed_batch_size]):
+            break
+    embed_q.put(_DONE)
+    p.join()
+    progress.close()
+
+    if p.errors:
+        raise p.errors[0]
+
+    wall = time.perf_counter() - t_start
+    report = {"chunks": len(chunks), "vectors": sent["vectors"], "requests": sent["requests"],
+              "bytes": sent["bytes"], "max_request_bytes": sent["max_request_bytes"],
+              "avg_vectors_per_request": round(sent["vectors"] / sent["requests"], 1) if sent["requests"] else 0,
+              "seconds": round(wall, 3),
+              "vectors_per_s": round(sent["vectors"] / wall, 1) if wall > 0 else None,
+              "mb_per_s": round(sent["bytes"] / 1e6 / wall, 2) if wall > 0 else None,
+              "stage_busy_s": {k: round(v, 3) for k, v in p.busy_s.items()},
+              "retries": dict(p.retries)}
+    print(f"Vector pipeline: {report}")
+    return report